@@ -1,4 +1,5 @@
 import gradio as gr
+import logging
 import sys
 import os
 import pandas as pd
@@ -7,7 +8,8 @@ from datetime import datetime
 # Add src directory to path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-from rag_pipeline import RAGPipeline
+from inference_client import load_pipeline
+from metrics import start_metrics_server
 
 # Fix path for vector store
 import os
@@ -16,7 +18,18 @@ os.chdir(os.path.dirname(os.path.abspath(__file__)))
 class ComplaintChatInterface:
     def __init__(self):
         """Initialize the chat interface with RAG pipeline."""
-        self.rag = RAGPipeline()
+        # Optional load protection for the local pipeline (the daemon has its own flags)
+        latency_budget = os.environ.get('RAG_LATENCY_BUDGET')
+        max_inflight = os.environ.get('RAG_MAX_INFLIGHT')
+        shard_addresses = os.environ.get('RAG_SHARD_ADDRESSES')
+        # New vector store snapshots are picked up without restarting the app
+        self.rag = load_pipeline(
+            snapshot_poll_interval=float(os.environ.get('RAG_SNAPSHOT_POLL_INTERVAL', 30)),
+            latency_budget=float(latency_budget) if latency_budget else None,
+            max_inflight_generations=int(max_inflight) if max_inflight else None,
+            shard_addresses=shard_addresses.split(',') if shard_addresses else None,
+            diversify=os.environ.get('RAG_DIVERSIFY', '0') == '1'
+        )
         self.chat_history = []
         
     def format_sources(self, sources):
@@ -32,25 +45,43 @@ class ComplaintChatInterface:
             )
         return "\n---\n".join(formatted_sources)
     
-    def chat_with_rag(self, message, history):
+    def format_response(self, result):
+        """Format a RAG result as the chat reply."""
+        # Format the response
+        answer = result['answer']
+        sources = result['sources']
+        
+        # Create detailed response with sources
+        if result.get('mode') == 'aggregate':
+            # Counted over the whole dataset, so there are no individual sources
+            return f"📊 **Complaint Statistics:**\n{answer}\n\n_Computed from complaint counts across the full dataset._"
+        if result.get('mode') == 'topics':
+            # Themes from clustering every stored complaint chunk
+            return (f"🧩 **Complaint Themes:**\n{answer}\n\n"
+                    f"📚 **Representative Complaints:**\n{self.format_sources(sources)}")
+        if result.get('degraded'):
+            heading = "📚 **Sources Only:**"
+        elif result.get('mode') == 'extractive':
+            heading = "⚡ **Quick Summary:**"
+        else:
+            heading = "🤖 **AI Analysis:**"
+        if result.get('truncated'):
+            answer += " …\n\n_(Answer shortened to keep the response time low.)_"
+        response = f"{heading}\n{answer}\n\n"
+        response += f"📚 **Evidence Sources:**\n{self.format_sources(sources)}"
+        return response
+    
+    def chat_with_rag(self, message, history, mode='generative'):
         """Process user message and generate response using RAG."""
         if not message.strip():
             return "", history
         
         try:
             # Get RAG response
-            result = self.rag.answer_question(message)
-            
-            # Format the response
-            answer = result['answer']
-            sources = result['sources']
-            
-            # Create detailed response with sources
-            response = f"🤖 **AI Analysis:**\n{answer}\n\n"
-            response += f"📚 **Evidence Sources:**\n{self.format_sources(sources)}"
+            result = self.rag.answer_question(message, mode=mode)
             
             # Add to chat history
-            history.append((message, response))
+            history.append((message, self.format_response(result)))
             
             return "", history
             
@@ -59,6 +90,24 @@ class ComplaintChatInterface:
             history.append((message, error_msg))
             return "", history
     
+    async def chat_with_rag_async(self, message, history, mode='generative'):
+        """
+        Async variant used by the web UI: the Gradio worker is not blocked while
+        the answer is generated, and a cancelled request stops generating.
+        """
+        if not message.strip():
+            return "", history
+        
+        try:
+            result = await self.rag.answer_question_async(message, mode=mode)
+            history.append((message, self.format_response(result)))
+            return "", history
+            
+        except Exception as e:
+            error_msg = f"❌ **Error:** Sorry, I encountered an issue: {str(e)}"
+            history.append((message, error_msg))
+            return "", history
+    
     def clear_chat(self):
         """Clear the chat history."""
         return [], []
@@ -275,6 +324,13 @@ def create_interface():
                             elem_classes="submit-btn"
                         )
                     
+                    answer_mode = gr.Radio(
+                        choices=[("🤖 AI analysis (LLM)", "generative"),
+                                 ("⚡ Quick summary (extractive, no LLM)", "extractive")],
+                        value="generative",
+                        label="Answer mode"
+                    )
+                    
                     with gr.Row():
                         clear_btn = gr.Button(
                             "🗑️ Clear Chat", 
@@ -342,14 +398,14 @@ def create_interface():
         
         # Event handlers
         submit_btn.click(
-            chat_interface.chat_with_rag,
-            inputs=[msg, chatbot],
+            chat_interface.chat_with_rag_async,
+            inputs=[msg, chatbot, answer_mode],
             outputs=[msg, chatbot]
         )
         
         msg.submit(
-            chat_interface.chat_with_rag,
-            inputs=[msg, chatbot],
+            chat_interface.chat_with_rag_async,
+            inputs=[msg, chatbot, answer_mode],
             outputs=[msg, chatbot]
         )
         
@@ -412,6 +468,14 @@ def create_interface():
     return demo
 
 if __name__ == "__main__":
+    # One JSON line per answered question, plus Prometheus metrics on /metrics
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    metrics_port = int(os.environ.get('RAG_METRICS_PORT', 9100))
+    # Loopback only unless RAG_METRICS_HOST widens it (e.g. 0.0.0.0 for a remote scraper)
+    metrics_host = os.environ.get('RAG_METRICS_HOST', '127.0.0.1')
+    start_metrics_server(port=metrics_port, host=metrics_host)
+    print(f"Metrics available at http://{metrics_host}:{metrics_port}/metrics")
+    
     # Create and launch the interface
     demo = create_interface()
     demo.launch(
@@ -1,4 +1,5 @@
 import gradio as gr
+import logging
 import sys
 import os
 import pandas as pd
@@ -8,7 +9,8 @@ import time
 # Add src directory to path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-from rag_pipeline import RAGPipeline
+from inference_client import load_pipeline
+from metrics import start_metrics_server
 
 # Fix path for vector store
 import os
@@ -17,7 +19,7 @@ os.chdir(os.path.dirname(os.path.abspath(__file__)))
 class ComplaintChatInterface:
     def __init__(self):
         """Initialize the chat interface with RAG pipeline."""
-        self.rag = RAGPipeline()
+        self.rag = load_pipeline()
         self.chat_history = []
         
     def format_sources(self, sources):
@@ -260,6 +262,14 @@ def create_interface():
     return demo
 
 if __name__ == "__main__":
+    # One JSON line per answered question, plus Prometheus metrics on /metrics
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    metrics_port = int(os.environ.get('RAG_METRICS_PORT', 9100))
+    # Loopback only unless RAG_METRICS_HOST widens it (e.g. 0.0.0.0 for a remote scraper)
+    metrics_host = os.environ.get('RAG_METRICS_HOST', '127.0.0.1')
+    start_metrics_server(port=metrics_port, host=metrics_host)
+    print(f"Metrics available at http://{metrics_host}:{metrics_port}/metrics")
+    
     # Create and launch the interface
     demo = create_interface()
     demo.launch(
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Precomputed complaint counts for analytics questions.
+Builds a compact cube of complaint counts by product, issue, sub-issue, state
+and month from the filtered complaints, stored as Parquet next to the vector
+store. Questions like "How do complaints vary by product category?" are
+answered from the cube in milliseconds instead of from five retrieved chunks.
+
+Usage:
+    cd src
+    python aggregate_cube.py
+    python aggregate_cube.py --input ../data/synthetic/filtered_complaints.csv --output ../vector_store_synthetic/complaint_cube.parquet
+"""
+
+import argparse
+import os
+import re
+import time
+
+import pandas as pd
+
+CUBE_FILE = 'complaint_cube.parquet'
+
+# Source column -> cube dimension
+DIMENSIONS = {
+    'Product': 'product',
+    'Issue': 'issue',
+    'Sub-issue': 'sub_issue',
+    'State': 'state'
+}
+
+DIMENSION_LABELS = {
+    'product': 'product',
+    'issue': 'issue',
+    'sub_issue': 'sub-issue',
+    'state': 'state',
+    'month': 'month'
+}
+
+# An aggregate question needs one of these...
+AGGREGATE_PATTERN = re.compile(
+    r"\b(how many|number of|count|counts|vary|varies|variation|distribution|breakdown|break down|"
+    r"over time|trend|trends|per month|by month|monthly|by year|yearly|by state|per state|"
+    r"by product|per product|by issue|which states?|which products?|share of|percentage of|"
+    r"proportion of|volume)\b"
+)
+
+# ...and a dimension to group by; checked in order, first match wins
+DIMENSION_PATTERNS = [
+    ('month', re.compile(r"\b(over time|trends?|month|monthly|year|yearly|change|changed|seasonal)\b")),
+    ('state', re.compile(r"\b(states?|regions?|geograph\w*|where)\b")),
+    ('sub_issue', re.compile(r"\bsub[- ]?issues?\b")),
+    ('issue', re.compile(r"\b(issues?|problems?|reasons?)\b")),
+    ('product', re.compile(r"\b(products?|categor\w*)\b"))
+]
+
+# Question phrase -> text matched against product names
+PRODUCT_FILTERS = {
+    'credit card': 'credit card',
+    'prepaid': 'prepaid',
+    'personal loan': 'loan',
+    'consumer loan': 'loan',
+    'savings': 'savings',
+    'checking': 'checking',
+    'money transfer': 'money transfer',
+    'virtual currency': 'virtual currency',
+    'bnpl': 'bnpl'
+}
+
+# State name -> code stored in the cube's state dimension
+STATE_CODES = {
+    'alabama': 'AL', 'alaska': 'AK', 'arizona': 'AZ', 'arkansas': 'AR', 'california': 'CA',
+    'colorado': 'CO', 'connecticut': 'CT', 'delaware': 'DE', 'district of columbia': 'DC',
+    'florida': 'FL', 'georgia': 'GA', 'hawaii': 'HI', 'idaho': 'ID', 'illinois': 'IL',
+    'indiana': 'IN', 'iowa': 'IA', 'kansas': 'KS', 'kentucky': 'KY', 'louisiana': 'LA',
+    'maine': 'ME', 'maryland': 'MD', 'massachusetts': 'MA', 'michigan': 'MI', 'minnesota': 'MN',
+    'mississippi': 'MS', 'missouri': 'MO', 'montana': 'MT', 'nebraska': 'NE', 'nevada': 'NV',
+    'new hampshire': 'NH', 'new jersey': 'NJ', 'new mexico': 'NM', 'new york': 'NY',
+    'north carolina': 'NC', 'north dakota': 'ND', 'ohio': 'OH', 'oklahoma': 'OK', 'oregon': 'OR',
+    'pennsylvania': 'PA', 'rhode island': 'RI', 'south carolina': 'SC', 'south dakota': 'SD',
+    'tennessee': 'TN', 'texas': 'TX', 'utah': 'UT', 'vermont': 'VT', 'virginia': 'VA',
+    'washington': 'WA', 'west virginia': 'WV', 'wisconsin': 'WI', 'wyoming': 'WY'
+}
+
+# Year constraints the month dimension can express; any other year, month
+# name or relative date ("last year") is left over and sends the question to RAG
+YEAR_RANGE_PATTERN = re.compile(r"\b(?:between|from) ((?:19|20)\d{2}) (?:and|to|through) ((?:19|20)\d{2})\b")
+YEAR_PATTERN = re.compile(r"\b(in|during|since|after|before) ((?:19|20)\d{2})\b")
+
+# Words that carry no constraint; a question with any other word left after
+# the products, states and years are taken out needs the narratives
+GENERIC_WORDS = frozenset("""
+a an the of in on at for by per to and or with from across among between within about is are was were
+be been being do does did has have had get gets got there their they how many much what which where
+when who show me give list tell compare compared comparison all each every different overall total
+most least more fewer fewest highest lowest largest smallest biggest top
+number count counts vary varies varied variation distribution distributed breakdown break down
+over time trend trends pattern patterns change changes changed changing month months monthly year
+years yearly seasonal seasonality share percentage proportion volume volumes rate rates
+state states region regions geography geographic geographically product products category categories
+issue issues problem problems reason reasons sub subissue subissues type types
+complaint complaints customer customers consumer consumers people users filed received submitted reported
+""".split())
+
+
+def build_cube(df):
+    """
+    Count complaints by product, issue, sub-issue, state and month.
+
+    Args:
+        df: Complaints with 'Date received', 'Product', 'Issue', 'Sub-issue'
+            and 'State' columns
+
+    Returns:
+        DataFrame with one row per combination and a 'count' column
+    """
+    cube = pd.DataFrame({
+        dimension: df[column].fillna('Unknown').astype(str) if column in df.columns else 'Unknown'
+        for column, dimension in DIMENSIONS.items()
+    })
+    months = pd.to_datetime(df['Date received'], errors='coerce').dt.to_period('M')
+    cube['month'] = months.astype(str).where(months.notna(), 'Unknown')
+    return cube.groupby(list(cube.columns), observed=True).size().reset_index(name='count')
+
+
+def build_cube_from_csv(path, chunksize=200_000):
+    """
+    Build the cube from a complaints CSV without loading the narratives.
+
+    Args:
+        path: Complaints CSV (raw or filtered)
+        chunksize: Rows read per chunk
+
+    Returns:
+        Cube DataFrame, see build_cube()
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = [column for column in ['Date received', *DIMENSIONS] if column in header]
+
+    partial_cubes = [build_cube(chunk) for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunksize)]
+    cube = pd.concat(partial_cubes, ignore_index=True)
+    return cube.groupby(list(cube.columns[:-1]), observed=True)['count'].sum().reset_index()
+
+
+def write_cube(cube, path):
+    """
+    Save the cube as Parquet with dictionary-encoded dimensions.
+
+    Args:
+        cube: Cube DataFrame
+        path: Output .parquet path
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    cube = cube.astype({dimension: 'category' for dimension in cube.columns if dimension != 'count'})
+    cube.to_parquet(path, index=False)
+
+
+class AggregateCube:
+    def __init__(self, cube):
+        """
+        Wrap a cube DataFrame for question answering.
+
+        Args:
+            cube: DataFrame from build_cube() or read from Parquet
+        """
+        self.cube = cube
+        self.total = int(cube['count'].sum())
+
+    @classmethod
+    def load(cls, path):
+        """Read a cube written by write_cube()."""
+        return cls(pd.read_parquet(path))
+
+    def parse_question(self, question):
+        """
+        Detect whether a question asks for counts and how to group and filter them.
+
+        Every constraint in the question has to be expressible against the
+        cube (a product, a state name, years); questions with anything else
+        (issue text, month names, relative dates, several products) are left
+        to retrieval rather than answered with a filter silently dropped.
+        Questions that name nothing to group by ("How many complaints were
+        filed in 2023?") get the filtered total.
+
+        Args:
+            question: User's question
+
+        Returns:
+            (dimension, filters), where dimension is None for a plain total and
+            filters has 'product' (text product names must contain), 'state'
+            (code) and 'years' ((first, last) inclusive, either end may be
+            None), each None when unconstrained; or None for questions that
+            need the complaint narratives
+        """
+        # "What's the breakdown" -> "what the breakdown"; other apostrophes are dropped
+        text = re.sub(r"['’]s\b", ' ', question.lower())
+        text = re.sub(r"['’]", '', text)
+        if not AGGREGATE_PATTERN.search(text):
+            return None
+
+        dimension = next((name for name, pattern in DIMENSION_PATTERNS if pattern.search(text)), None)
+
+        products = []
+        for phrase, value in PRODUCT_FILTERS.items():
+            pattern = re.compile(rf"\b{re.escape(phrase)}s?(?: (?:accounts?|cards?))?\b")
+            if pattern.search(text):
+                products.append(value)
+                text = pattern.sub(' ', text)
+
+        states = []
+        for name, code in sorted(STATE_CODES.items(), key=lambda item: -len(item[0])):
+            pattern = re.compile(rf"\b{name}\b")
+            if pattern.search(text):
+                states.append(code)
+                text = pattern.sub(' ', text)
+
+        year_ranges = []
+        for match in YEAR_RANGE_PATTERN.finditer(text):
+            year_ranges.append((int(match.group(1)), int(match.group(2))))
+        text = YEAR_RANGE_PATTERN.sub(' ', text)
+        for match in YEAR_PATTERN.finditer(text):
+            word, year = match.group(1), int(match.group(2))
+            year_ranges.append({'in': (year, year), 'during': (year, year), 'since': (year, None),
+                                'after': (year + 1, None), 'before': (None, year - 1)}[word])
+        text = YEAR_PATTERN.sub(' ', text)
+
+        if len(set(products)) > 1 or len(states) > 1 or len(year_ranges) > 1:
+            return None
+        if any(word not in GENERIC_WORDS for word in re.findall(r"[a-z0-9]+", text)):
+            return None
+
+        filters = {
+            'product': products[0] if products else None,
+            'state': states[0] if states else None,
+            'years': year_ranges[0] if year_ranges else None
+        }
+        return dimension, filters
+
+    def summarize(self, dimension, product_filter=None, top_n=10, state=None, years=None):
+        """
+        Group the counts by one dimension, or total them.
+
+        Args:
+            dimension: Cube column to group by, or None for the total only
+            product_filter: Optional text that product names must contain
+            top_n: Rows kept for categorical dimensions (months keep the last 12)
+            state: Optional state code to count
+            years: Optional (first, last) years to count, inclusive; either end may be None
+
+        Returns:
+            Dictionary with the total, the table rows (none for a total) and
+            the answer text
+        """
+        cube = self.cube
+        scope = ""
+        if product_filter:
+            cube = cube[cube['product'].astype(str).str.lower().str.contains(product_filter, regex=False)]
+            scope += f" for {product_filter} products"
+        if state:
+            cube = cube[cube['state'].astype(str) == state]
+            scope += f" in {state}"
+        if years:
+            first, last = years
+            month = cube['month'].astype(str)
+            year = pd.to_numeric(month.str[:4], errors='coerce')
+            keep = year.notna()
+            if first is not None:
+                keep &= year >= first
+            if last is not None:
+                keep &= year <= last
+            cube = cube[keep]
+            if first == last:
+                scope += f" in {first}"
+            elif last is None:
+                scope += f" since {first}"
+            elif first is None:
+                scope += f" up to {last}"
+            else:
+                scope += f" from {first} to {last}"
+
+        if dimension is None:
+            total = int(cube['count'].sum())
+            if total == 0:
+                return {'total': 0, 'rows': [], 'answer': f"No complaints were found{scope}."}
+            noun = "complaint was" if total == 1 else "complaints were"
+            return {'total': total, 'rows': [], 'answer': f"{total:,} {noun} filed{scope}."}
+
+        counts = cube.groupby(dimension, observed=True)['count'].sum()
+        total = int(counts.sum())
+
+        if total == 0:
+            return {'total': 0, 'rows': [], 'answer': f"No complaints were found{scope}."}
+
+        if dimension == 'month':
+            counts = counts.drop('Unknown', errors='ignore').sort_index()
+            recent = counts.tail(12)
+            rows = [{'value': month, 'count': int(count), 'share': round(count / total, 4)}
+                    for month, count in recent.items()]
+            lines = [f"- {row['value']}: {row['count']:,}" for row in rows]
+            answer = (f"Monthly complaint counts{scope} ({total:,} complaints from "
+                      f"{counts.index[0]} to {counts.index[-1]}; last 12 months shown):\n" + "\n".join(lines))
+            answer += f"\n\nPeak month: {counts.idxmax()} with {int(counts.max()):,} complaints."
+            if len(counts) >= 6:
+                last, previous = counts.iloc[-3:].sum(), counts.iloc[-6:-3].sum()
+                if previous:
+                    answer += (f" The last three months had {(last - previous) / previous:+.1%} "
+                               f"complaints compared with the three months before.")
+        else:
+            counts = counts.sort_values(ascending=False)
+            rows = [{'value': value, 'count': int(count), 'share': round(count / total, 4)}
+                    for value, count in counts.head(top_n).items()]
+            lines = [f"- {row['value']}: {row['count']:,} ({row['share']:.1%})" for row in rows]
+            answer = (f"Complaints by {DIMENSION_LABELS[dimension]}{scope} "
+                      f"({total:,} complaints in total):\n" + "\n".join(lines))
+            if len(counts) > top_n:
+                other = int(counts.iloc[top_n:].sum())
+                answer += f"\n- {len(counts) - top_n} others: {other:,} ({other / total:.1%})"
+
+        return {'total': total, 'rows': rows, 'answer': answer}
+
+    def answer(self, question):
+        """
+        Answer an aggregate question from the cube.
+
+        Args:
+            question: User's question
+
+        Returns:
+            Dictionary with answer text, dimension, product/state/year filters
+            and table rows, or None if the question is not an aggregate question
+        """
+        parsed = self.parse_question(question)
+        if parsed is None:
+            return None
+        dimension, filters = parsed
+        summary = self.summarize(dimension, filters['product'], state=filters['state'], years=filters['years'])
+        return dict(summary, dimension=dimension, product_filter=filters['product'],
+                    state_filter=filters['state'], year_range=filters['years'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the complaint count cube")
+    parser.add_argument('--input', default='../data/processed/filtered_complaints.csv', help="Complaints CSV")
+    parser.add_argument('--output', default=f'../vector_store/{CUBE_FILE}', help="Output Parquet file")
+    args = parser.parse_args()
+
+    print(f"📊 Building complaint cube from {args.input}...")
+    start_time = time.time()
+    cube = build_cube_from_csv(args.input)
+    write_cube(cube, args.output)
+    print(f"✅ {len(cube):,} cells covering {int(cube['count'].sum()):,} complaints "
+          f"in {time.time() - start_time:.1f}s")
+    print(f"💾 Saved to {args.output} ({os.path.getsize(args.output) / 1024:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Concurrent throughput of the async RAG API versus the sync path.
+Sends the same questions through answer_question from a thread pool and
+through answer_question_async from asyncio tasks at the same concurrency, and
+reports throughput and latency percentiles for both. Questions are answered
+in mode 'rag', so none of them short-circuit to the count cube or the topic
+clusters.
+
+Usage:
+    python src/async_throughput.py --concurrency 8 --requests 64
+    python src/async_throughput.py --concurrency 16 --requests 200 --stub-generator --stub-delay 1.5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.append(os.path.dirname(__file__))
+
+from rag_pipeline import RAGPipeline, create_evaluation_questions
+from load_test import STUB_ANSWER, percentiles
+
+
+def run_sync(rag, questions, concurrency):
+    """Answer all questions with answer_question from a thread pool."""
+    latencies = []
+
+    def answer(question):
+        start_time = time.perf_counter()
+        rag.answer_question(question, mode='rag')
+        latencies.append(time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(answer, questions))
+    return time.perf_counter() - start_time, latencies
+
+
+async def run_async(rag, questions, concurrency):
+    """Answer all questions with answer_question_async from asyncio tasks."""
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def answer(question):
+        async with semaphore:
+            start_time = time.perf_counter()
+            await rag.answer_question_async(question, mode='rag')
+            latencies.append(time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(answer(question) for question in questions))
+    return time.perf_counter() - start_time, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare async and sync RAG throughput")
+    parser.add_argument('--vector-store', default='vector_store/', help="Vector store directory")
+    parser.add_argument('--concurrency', type=int, default=8, help="Requests in flight")
+    parser.add_argument('--requests', type=int, default=64, help="Requests per path")
+    parser.add_argument('--retrieval-workers', type=int, default=2, help="Async retrieval pool size")
+    parser.add_argument('--generation-workers', type=int, default=1, help="Async generation pool size")
+    parser.add_argument('--stub-generator', action='store_true', help="Replace the LLM with a sleeping stub")
+    parser.add_argument('--stub-delay', type=float, default=1.0, help="Seconds the stub generator sleeps")
+    parser.add_argument('--output', default='reports/async_throughput.json', help="JSON report path")
+    args = parser.parse_args()
+
+    rag = RAGPipeline(vector_store_path=args.vector_store,
+                      retrieval_workers=args.retrieval_workers,
+                      generation_workers=args.generation_workers)
+    if args.stub_generator:
+        def stub_generate_answer(prompt, **kwargs):
+            time.sleep(args.stub_delay)
+            return STUB_ANSWER
+        rag.generate_answer = stub_generate_answer
+
+    base_questions = create_evaluation_questions()
+    questions = [base_questions[i % len(base_questions)] for i in range(args.requests)]
+
+    # Warm up models and caches so neither path pays first-call costs
+    rag.answer_question(questions[0], mode='rag')
+
+    print(f"🚀 {args.requests} requests at concurrency {args.concurrency}")
+    sync_time, sync_latencies = run_sync(rag, questions, args.concurrency)
+    print(f"   sync:  {args.requests / sync_time:.2f} requests/s")
+    async_time, async_latencies = asyncio.run(run_async(rag, questions, args.concurrency))
+    print(f"   async: {args.requests / async_time:.2f} requests/s")
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'settings': vars(args),
+        'sync': {'throughput_rps': round(args.requests / sync_time, 3),
+                 'latency': percentiles(sync_latencies)},
+        'async': {'throughput_rps': round(args.requests / async_time, 3),
+                  'latency': percentiles(async_latencies)},
+    }
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"💾 Report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Parallel, resumable evaluation runner for large question sets.
+Retrieval runs in batches, generation runs in a worker pool (or is skipped in
+retrieval-only mode) and every result is streamed to a JSONL file as soon as it
+is ready, so an interrupted run picks up where it stopped.
+
+Usage:
+    python src/batch_evaluation.py --questions questions.jsonl --output reports/eval_run.jsonl
+    python src/batch_evaluation.py --questions questions.txt --output reports/eval_run.jsonl --retrieval-only
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(__file__))
+
+from rag_pipeline import create_evaluation_questions
+from evaluation import RAGEvaluator
+from jsonl_store import JsonlResultWriter, latest_records, run_batches, split_pending
+from inference_client import load_pipeline
+
+
+def load_questions(path):
+    """
+    Load evaluation questions from a .jsonl, .csv or plain text file.
+
+    JSONL records need a 'question' field and may carry 'id' and
+    'expected_aspects'; CSV files need a 'question' column; text files hold one
+    question per line. Questions without an id are keyed by their position in
+    the file, so the same file always resumes cleanly.
+
+    Args:
+        path: Path to the question file
+
+    Returns:
+        List of dictionaries with question_id, question and expected_aspects
+    """
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == '.jsonl':
+        with open(path, 'r', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    elif extension == '.csv':
+        records = pd.read_csv(path).to_dict('records')
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            records = [{'question': line.strip()} for line in f if line.strip()]
+
+    questions = []
+    for position, record in enumerate(records):
+        question_id = record.get('id')
+        if question_id is None or (isinstance(question_id, float) and np.isnan(question_id)):
+            question_id = f"q{position}"
+        questions.append({
+            'question_id': str(question_id),
+            'question': record['question'],
+            'expected_aspects': record.get('expected_aspects')
+        })
+    return questions
+
+
+class BatchEvaluationRunner:
+    def __init__(self, rag_pipeline, output_file, k=5, retrieval_batch_size=64,
+                 num_workers=2, retrieval_only=False, store_text=False):
+        """
+        Initialize the runner.
+
+        Args:
+            rag_pipeline: Initialized RAGPipeline instance
+            output_file: JSONL file results are streamed to (and resumed from)
+            k: Number of chunks retrieved per question
+            retrieval_batch_size: Questions encoded and searched per batch
+            num_workers: Threads running prompt creation and generation
+            retrieval_only: Skip generation and score retrieval only
+            store_text: Keep the full chunk text of every source in the output
+        """
+        self.rag = rag_pipeline
+        self.evaluator = RAGEvaluator(rag_pipeline)
+        self.output_file = output_file
+        self.k = k
+        self.retrieval_batch_size = retrieval_batch_size
+        self.num_workers = num_workers
+        self.retrieval_only = retrieval_only
+        self.store_text = store_text
+
+    def _format_sources(self, sources):
+        """Reduce sources to what the results file needs."""
+        formatted = []
+        for source in sources:
+            entry = {
+                'complaint_id': source['complaint_id'],
+                'product': source['product'],
+                'similarity_score': round(float(source['similarity_score']), 4)
+            }
+            if self.store_text:
+                entry['text'] = source['text']
+            formatted.append(entry)
+        return formatted
+
+    def _retrieval_record(self, item, sources, retrieval_time):
+        """Build the result record shared by both modes."""
+        similarities = [s['similarity_score'] for s in sources]
+        return {
+            'question_id': item['question_id'],
+            'question': item['question'],
+            'source_count': len(sources),
+            'avg_similarity': float(np.mean(similarities)) if similarities else 0.0,
+            'top_similarity': float(max(similarities)) if similarities else 0.0,
+            'distinct_products': len(set(s['product'] for s in sources)),
+            'distinct_complaints': len(set(s['complaint_id'] for s in sources)),
+            'sources': self._format_sources(sources),
+            'retrieval_time': round(retrieval_time, 4)
+        }
+
+    def _generate_and_score(self, item, sources, record):
+        """Generate an answer for one question and add its scores to the record."""
+        start_time = time.time()
+        prompt = self.rag.create_prompt(item['question'], sources)
+        answer = self.rag.generate_answer(prompt)
+        evaluation = self.evaluator.build_evaluation(
+            item['question'], answer, sources, item['expected_aspects']
+        )
+
+        record['generated_answer'] = answer
+        record['quality_score'] = evaluation['quality_score']
+        record['comments'] = evaluation['comments']
+        record['generation_time'] = round(time.time() - start_time, 4)
+        return [record]
+
+    def run(self, questions):
+        """
+        Evaluate all questions not already present in the output file.
+
+        Questions whose earlier attempt failed (records with an 'error'
+        field) are evaluated again.
+
+        Args:
+            questions: List of question dictionaries from load_questions()
+
+        Returns:
+            Number of questions evaluated in this run
+        """
+        pending, done = split_pending(questions, self.output_file)
+
+        print(f"Questions: {len(questions):,} total, {done:,} already done, "
+              f"{len(pending):,} to evaluate")
+        if not pending:
+            return 0
+
+        mode = "retrieval-only" if self.retrieval_only else f"{self.num_workers} generation workers"
+        print(f"Mode: {mode}, retrieval batch size {self.retrieval_batch_size}, k={self.k}")
+
+        start_time = time.time()
+        with JsonlResultWriter(self.output_file) as writer:
+            if self.retrieval_only:
+                written, failed = self._run_batches(pending, writer, executor=None)
+            else:
+                with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+                    written, failed = self._run_batches(pending, writer, executor)
+
+        evaluated = written - failed
+        elapsed = time.time() - start_time
+        print(f"Evaluated {evaluated:,} questions in {elapsed:.1f}s "
+              f"({evaluated / max(elapsed, 1e-9):.1f} questions/s)")
+        if failed:
+            print(f"⚠️ {failed:,} questions failed; rerun to retry them")
+        return evaluated
+
+    def _run_batches(self, pending, writer, executor):
+        """Retrieve batch by batch and stream records as they complete."""
+        def retrieve(items):
+            return self.rag.retrieve_batch([item['question'] for item in items], k=self.k,
+                                           batch_size=self.retrieval_batch_size)
+
+        def evaluate(item, sources, retrieval_time):
+            record = self._retrieval_record(item, sources, retrieval_time)
+            if executor is None:
+                return [record]
+            return self._generate_and_score(item, sources, record)
+
+        def make_tasks(items, sources_list, retrieval_time):
+            # One task per question, so a failure only marks that question
+            return [([item], partial(evaluate, item, sources, retrieval_time))
+                    for item, sources in zip(items, sources_list)]
+
+        return run_batches(pending, writer, retrieve, make_tasks, self.retrieval_batch_size,
+                           executor=executor, max_backlog=self.num_workers * 4)
+
+
+def summarize_results(output_file, csv_file=None):
+    """
+    Print summary statistics for a results file and optionally export a CSV.
+
+    Args:
+        output_file: JSONL results file written by BatchEvaluationRunner
+        csv_file: Optional CSV path for a flat copy of the results
+
+    Returns:
+        DataFrame of results (without per-source detail)
+    """
+    # A retried question's latest record replaces its earlier error
+    records = latest_records(output_file)
+    failed = sum('error' in record for record in records)
+    records = [record for record in records if 'error' not in record]
+    if not records:
+        print("No evaluation results available.")
+        return pd.DataFrame()
+
+    df = pd.DataFrame(records).drop(columns=['sources'], errors='ignore')
+
+    print("\n" + "="*50)
+    print("BATCH EVALUATION SUMMARY")
+    print("="*50)
+    print(f"Total Questions: {len(df):,}")
+    if failed:
+        print(f"Failed Questions: {failed:,} (rerun to retry)")
+    print(f"Average Similarity: {df['avg_similarity'].mean():.3f}")
+    print(f"Average Distinct Complaints per Question: {df['distinct_complaints'].mean():.2f}")
+    print(f"Average Distinct Products per Question: {df['distinct_products'].mean():.2f}")
+    if 'quality_score' in df.columns:
+        print(f"Average Quality Score: {df['quality_score'].mean():.2f}")
+        print(f"Average Generation Time: {df['generation_time'].mean():.2f}s")
+
+    if csv_file:
+        os.makedirs(os.path.dirname(csv_file) or '.', exist_ok=True)
+        df.to_csv(csv_file, index=False)
+        print(f"\nFlat results saved to: {csv_file}")
+
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch RAG evaluation with resume support")
+    parser.add_argument('--questions', help="Question file (.jsonl, .csv or .txt); defaults to the built-in questions")
+    parser.add_argument('--output', default='reports/evaluation_run.jsonl', help="JSONL results file")
+    parser.add_argument('--csv', help="Also export a flat CSV summary to this path")
+    parser.add_argument('--vector-store', default='vector_store/', help="Vector store directory")
+    parser.add_argument('--k', type=int, default=5, help="Chunks retrieved per question")
+    parser.add_argument('--batch-size', type=int, default=64, help="Retrieval batch size")
+    parser.add_argument('--workers', type=int, default=2, help="Generation worker threads")
+    parser.add_argument('--retrieval-only', action='store_true', help="Skip LLM generation")
+    parser.add_argument('--store-text', action='store_true', help="Store full source text in the results")
+    args = parser.parse_args()
+
+    if args.questions:
+        questions = load_questions(args.questions)
+    else:
+        questions = [{'question_id': f"q{i}", 'question': q, 'expected_aspects': None}
+                     for i, q in enumerate(create_evaluation_questions())]
+
+    print("Initializing RAG pipeline...")
+    rag = load_pipeline(vector_store_path=args.vector_store)
+
+    runner = BatchEvaluationRunner(
+        rag, args.output, k=args.k, retrieval_batch_size=args.batch_size,
+        num_workers=args.workers, retrieval_only=args.retrieval_only,
+        store_text=args.store_text
+    )
+    runner.run(questions)
+    summarize_results(args.output, args.csv)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Standard versus assisted (speculative) generation on real RAG prompts.
+Builds prompts for the evaluation questions, generates each answer with and
+without the draft model, and reports tokens/sec, speed-up and the draft
+acceptance rate.
+
+Usage:
+    python src/benchmark_assisted.py --draft-model microsoft/DialoGPT-small
+    python src/benchmark_assisted.py --draft-model microsoft/DialoGPT-small --assistant-tokens 3 --max-new-tokens 128
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+from transformers import set_seed
+
+sys.path.append(os.path.dirname(__file__))
+
+from rag_pipeline import RAGPipeline, create_evaluation_questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark assisted generation")
+    parser.add_argument('--vector-store', default='vector_store/', help="Vector store directory")
+    parser.add_argument('--draft-model', default='microsoft/DialoGPT-small', help="Draft model name")
+    parser.add_argument('--assistant-tokens', type=int, default=5, help="Draft tokens per verification step")
+    parser.add_argument('--max-new-tokens', type=int, default=200, help="Generated tokens per answer")
+    parser.add_argument('--seed', type=int, default=42, help="Generation seed")
+    parser.add_argument('--output', default='reports/assisted_generation.json', help="JSON report path")
+    args = parser.parse_args()
+
+    rag = RAGPipeline(vector_store_path=args.vector_store, draft_model_name=args.draft_model,
+                      num_assistant_tokens=args.assistant_tokens)
+    draft_model = rag.draft_model
+
+    prompts = [rag.create_prompt(question, rag.retrieve(question))
+               for question in create_evaluation_questions()]
+
+    standard, assisted, acceptance = [], [], []
+    for i, prompt in enumerate(prompts, 1):
+        rag.draft_model = None
+        set_seed(args.seed)
+        start_time = time.perf_counter()
+        answer = rag.generate_answer(prompt, max_new_tokens=args.max_new_tokens)
+        standard.append(rag.count_tokens(answer) / (time.perf_counter() - start_time))
+
+        rag.draft_model = draft_model
+        set_seed(args.seed)
+        rag.generate_answer(prompt, max_new_tokens=args.max_new_tokens)
+        stats = rag.last_generation_stats
+        assisted.append(stats['tokens_per_second'])
+        acceptance.append(stats['acceptance_rate'])
+
+        print(f"   Prompt {i}/{len(prompts)}: standard {standard[-1]:.1f} tok/s, "
+              f"assisted {assisted[-1]:.1f} tok/s, acceptance {acceptance[-1]:.0%}")
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'settings': vars(args),
+        'standard_tokens_per_s': round(float(np.mean(standard)), 2),
+        'assisted_tokens_per_s': round(float(np.mean(assisted)), 2),
+        'speedup': round(float(np.mean(assisted) / np.mean(standard)), 3),
+        'mean_acceptance_rate': round(float(np.mean(acceptance)), 4)
+    }
+    print(f"\n✅ Speed-up {report['speedup']}x, mean acceptance {report['mean_acceptance_rate']:.0%}")
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"💾 Report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
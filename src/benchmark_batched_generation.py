@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tokens/sec of batched generation by batch size.
+Builds prompts for the evaluation questions (repeated to fill the batches),
+generates a fixed number of tokens per prompt at each batch size, and reports
+throughput so the sweet spot can be picked per machine.
+
+Usage:
+    python src/benchmark_batched_generation.py --batch-sizes 1 2 4 8 16
+    python src/benchmark_batched_generation.py --batch-sizes 1 8 32 --prompts 64 --max-new-tokens 64
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+from transformers import set_seed
+
+sys.path.append(os.path.dirname(__file__))
+
+from rag_pipeline import RAGPipeline, create_evaluation_questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched generation")
+    parser.add_argument('--vector-store', default='vector_store/', help="Vector store directory")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 2, 4, 8, 16], help="Batch sizes to try")
+    parser.add_argument('--prompts', type=int, default=32, help="Prompts generated per batch size")
+    parser.add_argument('--max-new-tokens', type=int, default=64, help="Generated tokens per prompt")
+    parser.add_argument('--seed', type=int, default=42, help="Generation seed")
+    parser.add_argument('--output', default='reports/batched_generation.json', help="JSON report path")
+    args = parser.parse_args()
+
+    rag = RAGPipeline(vector_store_path=args.vector_store)
+
+    questions = create_evaluation_questions()
+    base_prompts = [rag.create_prompt(q, rag.retrieve(q)) for q in questions]
+    prompts = [base_prompts[i % len(base_prompts)] for i in range(args.prompts)]
+
+    # Warm up so the first batch size does not pay one-off costs
+    rag.generate_answers(prompts[:2], batch_size=2, max_new_tokens=4)
+
+    results = []
+    for batch_size in args.batch_sizes:
+        set_seed(args.seed)
+        start_time = time.perf_counter()
+        # Fixed length, so every batch size generates the same number of tokens
+        _, stats = rag.generate_answers(prompts, batch_size=batch_size, max_new_tokens=args.max_new_tokens,
+                                        min_new_tokens=args.max_new_tokens, return_stats=True)
+        elapsed = time.perf_counter() - start_time
+        generated = sum(s['generated_tokens'] for s in stats)
+        results.append({
+            'batch_size': batch_size,
+            'tokens_per_s': round(generated / elapsed, 2),
+            'prompts_per_s': round(len(prompts) / elapsed, 3),
+            'mean_padding_ratio': round(sum(s['padding_ratio'] for s in stats) / len(stats), 4),
+            'seconds': round(elapsed, 2)
+        })
+        print(f"   batch {batch_size:>3}: {results[-1]['tokens_per_s']:.1f} tok/s, "
+              f"{results[-1]['prompts_per_s']:.2f} prompts/s")
+
+    best = max(results, key=lambda r: r['tokens_per_s'])
+    print(f"\n✅ Best batch size on this machine: {best['batch_size']} ({best['tokens_per_s']} tok/s)")
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'cpu_count': os.cpu_count(),
+        'settings': vars(args),
+        'best_batch_size': best['batch_size'],
+        'results': results
+    }
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"💾 Report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
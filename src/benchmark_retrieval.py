@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Retrieval benchmark across FAISS index configurations.
+Builds exact ground truth with a flat index for a query set made of the
+evaluation questions plus sampled chunk texts, then measures recall@k,
+single-query latency percentiles, QPS at several thread counts, build time and
+serialized index size for every candidate configuration. The JSON report is
+written with sorted keys so two runs can be diffed directly.
+
+Usage:
+    python src/benchmark_retrieval.py --vector-store vector_store/ --output reports/retrieval_benchmark.json
+    python src/benchmark_retrieval.py --configs "Flat" "HNSW32:efSearch=64" --baseline reports/old.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import faiss
+import numpy as np
+import pandas as pd
+from sentence_transformers import SentenceTransformer
+
+sys.path.append(os.path.dirname(__file__))
+
+from rag_pipeline import create_evaluation_questions
+from evaluation import create_custom_evaluation_questions
+from index_compression import load_store_embeddings
+from snapshots import resolve_store_path
+
+DEFAULT_CONFIGS = [
+    "Flat",
+    "IVF1024,Flat:nprobe=8",
+    "IVF1024,Flat:nprobe=32",
+    "HNSW32:efSearch=64",
+    "HNSW32:efSearch=128",
+    "IVF1024,PQ48:nprobe=16",
+]
+
+
+def load_base_vectors(vector_store_path):
+    """
+    Load the stored chunk vectors and their metadata.
+
+    Reads the CURRENT snapshot of a versioned store, and takes the
+    full-dimension vectors from embeddings.npy when present, so reduced
+    indexes and non-FAISS backends are benchmarked on the original vectors.
+
+    Args:
+        vector_store_path: Vector store directory or versioned root
+
+    Returns:
+        Tuple of (float32 vector matrix, metadata DataFrame)
+    """
+    path, _ = resolve_store_path(vector_store_path)
+    metadata = pd.read_csv(os.path.join(path, 'metadata.csv'))
+    vectors = load_store_embeddings(path)
+    return np.ascontiguousarray(vectors, dtype=np.float32), metadata
+
+
+def build_query_set(metadata, model, num_sampled=1000, seed=42):
+    """
+    Encode the evaluation questions plus a random sample of chunk texts.
+
+    Args:
+        metadata: Vector store metadata with a 'chunk' column
+        model: SentenceTransformer used to encode the queries
+        num_sampled: Number of chunk texts sampled as queries
+        seed: Random seed for the sample
+
+    Returns:
+        Tuple of (query texts, float32 query matrix)
+    """
+    questions = list(dict.fromkeys(create_evaluation_questions() + create_custom_evaluation_questions()))
+    sample_size = min(num_sampled, len(metadata))
+    sampled = metadata['chunk'].sample(n=sample_size, random_state=seed).tolist()
+
+    texts = questions + sampled
+    queries = model.encode(texts, batch_size=64, show_progress_bar=False)
+    return texts, np.ascontiguousarray(queries, dtype=np.float32)
+
+
+def parse_config(config):
+    """Split 'FACTORY:param=value,...' into the factory string and search parameters."""
+    if ':' in config:
+        factory, params = config.split(':', 1)
+        return factory, params
+    return config, ''
+
+
+def build_index(factory, vectors, train_size=100000, seed=42):
+    """
+    Build and populate an index from a FAISS factory string.
+
+    Args:
+        factory: FAISS index factory string, e.g. 'IVF1024,Flat'
+        vectors: Base vectors to add
+        train_size: Maximum number of vectors used for training
+        seed: Random seed for the training sample
+
+    Returns:
+        Tuple of (index, build time in seconds)
+    """
+    start_time = time.time()
+    index = faiss.index_factory(vectors.shape[1], factory)
+    if not index.is_trained:
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(len(vectors), size=min(train_size, len(vectors)), replace=False)]
+        index.train(sample)
+    index.add(vectors)
+    return index, time.time() - start_time
+
+
+def recall_at_k(retrieved, ground_truth, k):
+    """Average fraction of the exact top-k found in the retrieved top-k."""
+    hits = [len(set(r[:k]) & set(g[:k])) / k for r, g in zip(retrieved, ground_truth)]
+    return float(np.mean(hits))
+
+
+def measure_latency(index, queries, k):
+    """Time single-query searches on one thread and return percentiles in ms."""
+    faiss.omp_set_num_threads(1)
+    latencies = []
+    for i in range(len(queries)):
+        start_time = time.perf_counter()
+        index.search(queries[i:i + 1], k)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+
+    return {
+        'p50_ms': round(float(np.percentile(latencies, 50)), 4),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 4),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 4),
+        'mean_ms': round(float(np.mean(latencies)), 4)
+    }
+
+
+def measure_qps(index, queries, k, num_threads):
+    """
+    Measure throughput with several client threads issuing single-query searches.
+    FAISS releases the GIL during search, so this models concurrent requests.
+    """
+    faiss.omp_set_num_threads(1)
+    parts = np.array_split(np.arange(len(queries)), num_threads)
+
+    def worker(rows):
+        for i in rows:
+            index.search(queries[i:i + 1], k)
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        list(executor.map(worker, parts))
+    elapsed = time.perf_counter() - start_time
+    return round(len(queries) / elapsed, 2)
+
+
+def benchmark_config(config, vectors, queries, ground_truth, ks, thread_counts, train_size):
+    """
+    Build one configuration and collect all of its measurements.
+
+    Returns:
+        Dictionary with build, size, recall, latency and QPS results
+    """
+    factory, params = parse_config(config)
+    index, build_time = build_index(factory, vectors, train_size)
+    if params:
+        faiss.ParameterSpace().set_index_parameters(index, params)
+
+    max_k = max(ks)
+    faiss.omp_set_num_threads(os.cpu_count() or 1)
+    _, retrieved = index.search(queries, max_k)
+
+    return {
+        'factory': factory,
+        'search_params': params,
+        'build_time_s': round(build_time, 3),
+        'index_size_mb': round(len(faiss.serialize_index(index)) / (1024 * 1024), 3),
+        'recall': {f"recall@{k}": round(recall_at_k(retrieved, ground_truth, k), 4) for k in ks},
+        'latency': measure_latency(index, queries, max_k),
+        'qps': {str(t): measure_qps(index, queries, max_k, t) for t in thread_counts}
+    }
+
+
+def compare_reports(report, baseline):
+    """Print per-configuration differences against an earlier report."""
+    print("\n📊 Comparison with baseline")
+    for config, result in report['configs'].items():
+        old = baseline.get('configs', {}).get(config)
+        if old is None or 'error' in result or 'error' in old:
+            print(f"   {config}: no comparable baseline")
+            continue
+        print(f"   {config}:")
+        for name, value in result['recall'].items():
+            print(f"      {name}: {old['recall'].get(name, float('nan')):.4f} -> {value:.4f}")
+        print(f"      p95: {old['latency']['p95_ms']:.3f}ms -> {result['latency']['p95_ms']:.3f}ms")
+        print(f"      size: {old['index_size_mb']:.1f}MB -> {result['index_size_mb']:.1f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall/latency benchmark across FAISS index configurations")
+    parser.add_argument('--vector-store', default='vector_store/', help="Vector store directory")
+    parser.add_argument('--output', default='reports/retrieval_benchmark.json', help="JSON report path")
+    parser.add_argument('--configs', nargs='+', default=DEFAULT_CONFIGS,
+                        help="FAISS factory strings with optional ':param=value' search settings")
+    parser.add_argument('--k', type=int, nargs='+', default=[1, 5, 10], help="Recall cut-offs")
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8], help="Client thread counts for QPS")
+    parser.add_argument('--num-sampled', type=int, default=1000, help="Chunk texts sampled as queries")
+    parser.add_argument('--train-size', type=int, default=100000, help="Vectors used to train IVF/PQ indexes")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed for sampling")
+    parser.add_argument('--baseline', help="Earlier report to compare against")
+    args = parser.parse_args()
+
+    print("🚀 Retrieval Benchmark")
+    print("=" * 50)
+
+    print("📖 Loading vector store...")
+    vectors, metadata = load_base_vectors(args.vector_store)
+    print(f"✅ {len(vectors):,} vectors, dimension {vectors.shape[1]}")
+
+    print("🔧 Encoding query set...")
+    model = SentenceTransformer('all-MiniLM-L6-v2')
+    texts, queries = build_query_set(metadata, model, args.num_sampled, args.seed)
+    print(f"✅ {len(texts):,} queries")
+
+    print("🎯 Computing exact ground truth...")
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, ground_truth = exact.search(queries, max(args.k))
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'num_vectors': int(len(vectors)),
+        'dimension': int(vectors.shape[1]),
+        'num_queries': int(len(queries)),
+        'k': args.k,
+        'thread_counts': args.threads,
+        'configs': {}
+    }
+
+    for config in args.configs:
+        print(f"\n🏗️ Benchmarking {config}...")
+        try:
+            result = benchmark_config(config, vectors, queries, ground_truth,
+                                      args.k, args.threads, args.train_size)
+        except RuntimeError as e:
+            # e.g. too few vectors to train the requested number of IVF lists
+            print(f"❌ {config} failed: {e}")
+            report['configs'][config] = {'error': str(e)}
+            continue
+
+        report['configs'][config] = result
+        recall_text = ", ".join(f"{name}={value:.3f}" for name, value in result['recall'].items())
+        print(f"   {recall_text}")
+        print(f"   p50={result['latency']['p50_ms']:.3f}ms p95={result['latency']['p95_ms']:.3f}ms "
+              f"p99={result['latency']['p99_ms']:.3f}ms")
+        print(f"   QPS by threads: {result['qps']}")
+        print(f"   build {result['build_time_s']:.1f}s, size {result['index_size_mb']:.1f}MB")
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"\n💾 Report saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare_reports(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the vector store backends (FAISS, Chroma, NumPy).
+Builds the same store with every backend, then loads each one in a fresh
+process and measures load time, single-query and batched search latency,
+filtered search latency (one product) and resident memory. Recall@k is
+measured against exact NumPy search, so approximate backends (Chroma's HNSW)
+show what they trade for speed.
+
+Usage:
+    python src/benchmark_vector_stores.py --vectors 200000
+    python src/benchmark_vector_stores.py --vector-store vector_store/ --backends faiss numpy
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(__file__))
+
+from index_io import memory_usage
+from vector_stores import BACKENDS, NumpyVectorStore, load_vector_store, write_vector_store
+
+
+def synthetic_store(num_vectors, dimension=384, seed=42):
+    """Clustered unit-norm vectors with per-product metadata (see synthetic_data.py)."""
+    from synthetic_data import PRODUCT_MIX, SyntheticEmbeddings
+    rng = np.random.default_rng(seed)
+    products = list(PRODUCT_MIX)
+    weights = np.array([share for share, _ in PRODUCT_MIX.values()])
+    metadata = pd.DataFrame({
+        'complaint_id': np.arange(num_vectors) // 2 + 1000000,
+        'product': rng.choice(products, size=num_vectors, p=weights / weights.sum()),
+        'chunk': 'synthetic chunk'
+    })
+    embeddings = SyntheticEmbeddings(dimension, 'clustered', seed=seed).generate(metadata['product'].tolist())
+    return embeddings, metadata
+
+
+def latency_stats(samples):
+    """Median and p95 of per-call timings in milliseconds."""
+    samples = np.asarray(samples) * 1000
+    return {'p50_ms': round(float(np.median(samples)), 3), 'p95_ms': round(float(np.percentile(samples, 95)), 3)}
+
+
+def _measure_backend(store_dir, queries, where, k, results):
+    """Load one store in this (fresh) process and time its searches."""
+    baseline = memory_usage()
+    start_time = time.perf_counter()
+    store = load_vector_store(store_dir)
+    load_seconds = time.perf_counter() - start_time
+
+    def timed(fn, count):
+        samples = []
+        for i in range(count):
+            start_time = time.perf_counter()
+            fn(i)
+            samples.append(time.perf_counter() - start_time)
+        return samples
+
+    store.search(queries[:1], k)
+    single = timed(lambda i: store.search(queries[i:i + 1], k), len(queries))
+    batch_size = 32
+    batched = timed(lambda i: store.search(queries[i * batch_size:(i + 1) * batch_size], k),
+                    max(len(queries) // batch_size, 1))
+    filtered = timed(lambda i: store.search(queries[i:i + 1], k, where=where), len(queries))
+
+    _, indices = store.search(queries, k)
+    _, filtered_indices = store.search(queries, k, where=where)
+    usage = memory_usage()
+    results.put({
+        'load_seconds': round(load_seconds, 3),
+        'search': latency_stats(single),
+        'search_batch32_ms_per_query': round(float(np.median(batched)) * 1000 / batch_size, 4),
+        'filtered_search': latency_stats(filtered),
+        'rss_mb': usage.get('rss_mb'),
+        'rss_growth_mb': round(usage.get('rss_mb', 0) - baseline.get('rss_mb', 0), 1),
+        'rss_file_mb': usage.get('rss_file_mb'),
+        'indices': indices,
+        'filtered_indices': filtered_indices
+    })
+
+
+def recall(exact, found, k):
+    """Mean fraction of the exact top-k present in the found top-k."""
+    return float((found[:, :k, None] == exact[:, None, :k]).any(axis=1).mean())
+
+
+def directory_mb(path):
+    return sum(os.path.getsize(os.path.join(directory, name))
+               for directory, _, names in os.walk(path) for name in names) / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare vector store backends")
+    parser.add_argument('--backends', nargs='+', choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument('--vector-store', help="Benchmark on this store's embeddings instead of synthetic ones")
+    parser.add_argument('--vectors', type=int, default=100000, help="Synthetic vectors")
+    parser.add_argument('--queries', type=int, default=200, help="Query vectors")
+    parser.add_argument('--k', type=int, default=5, help="Results per query")
+    parser.add_argument('--output', default='reports/vector_store_backends.json', help="Report file")
+    args = parser.parse_args()
+
+    if args.vector_store:
+        from index_compression import load_store_embeddings
+        from snapshots import resolve_store_path
+        path, _ = resolve_store_path(args.vector_store)
+        metadata = pd.read_csv(os.path.join(path, 'metadata.csv'))
+        embeddings = np.asarray(load_store_embeddings(path), dtype=np.float32)
+    else:
+        embeddings, metadata = synthetic_store(args.vectors)
+
+    rng = np.random.default_rng(0)
+    queries = embeddings[rng.choice(len(embeddings), size=args.queries, replace=False)]
+    queries = queries + rng.normal(scale=0.05, size=queries.shape).astype(np.float32)
+    # Filter on the least common product, the case where post-filtering does worst
+    where = {'product': metadata['product'].value_counts().index[-1]}
+
+    exact_store = NumpyVectorStore(metadata=metadata, embeddings=embeddings)
+    _, exact = exact_store.search(queries, args.k)
+    _, exact_filtered = exact_store.search(queries, args.k, where=where)
+    print(f"📦 {len(embeddings):,} vectors, {args.queries} queries, filter {where}")
+
+    rows = {}
+    context = mp.get_context('spawn')
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for backend in args.backends:
+            store_dir = os.path.join(temp_dir, backend)
+            start_time = time.perf_counter()
+            write_vector_store(backend, embeddings, metadata, store_dir)
+            build_seconds = time.perf_counter() - start_time
+
+            results = context.Queue()
+            worker = context.Process(target=_measure_backend, args=(store_dir, queries, where, args.k, results))
+            worker.start()
+            row = results.get()
+            worker.join()
+
+            row.update({
+                'build_seconds': round(build_seconds, 2),
+                'disk_mb': round(directory_mb(store_dir), 1),
+                f"recall@{args.k}": round(recall(exact, row.pop('indices'), args.k), 4),
+                f"filtered_recall@{args.k}": round(recall(exact_filtered, row.pop('filtered_indices'), args.k), 4)
+            })
+            rows[backend] = row
+            print(f"   {backend:<7} build {row['build_seconds']:.1f}s, load {row['load_seconds']:.2f}s, "
+                  f"search p50 {row['search']['p50_ms']:.2f}ms, filtered p50 {row['filtered_search']['p50_ms']:.2f}ms, "
+                  f"recall@{args.k} {row[f'recall@{args.k}']:.3f}, RSS +{row['rss_growth_mb']:.0f} MB")
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'num_vectors': int(len(embeddings)),
+        'dimension': int(embeddings.shape[1]),
+        'num_queries': args.queries,
+        'k': args.k,
+        'filter': where,
+        'backends': rows
+    }
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True, default=str)
+    print(f"💾 Report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
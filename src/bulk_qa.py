@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Offline bulk question answering over a question file.
+Questions are retrieved in batches and answered with batched generation on a
+pool of workers. Every answer (with its sources and timings) is streamed to a
+JSONL file as soon as its batch finishes, and a restarted run skips the
+questions already answered.
+
+Usage:
+    python src/bulk_qa.py --questions weekly_questions.jsonl --output reports/weekly_answers.jsonl
+    python src/bulk_qa.py --output reports/custom_answers.jsonl --workers 2 --generation-batch-size 16
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+sys.path.append(os.path.dirname(__file__))
+
+from batch_evaluation import load_questions
+from evaluation import create_custom_evaluation_questions
+from jsonl_store import JsonlResultWriter, run_batches, split_pending
+from inference_client import load_pipeline
+
+
+class BulkQARunner:
+    def __init__(self, rag_pipeline, output_file, k=5, retrieval_batch_size=64,
+                 generation_batch_size=8, num_workers=1, max_new_tokens=200):
+        """
+        Initialize the runner.
+
+        Args:
+            rag_pipeline: Initialized RAGPipeline (or daemon client)
+            output_file: JSONL file answers are streamed to (and resumed from)
+            k: Number of chunks retrieved per question
+            retrieval_batch_size: Questions encoded and searched per batch
+            generation_batch_size: Prompts per generate_answers() batch
+            num_workers: Generation batches running at once
+            max_new_tokens: Upper bound on generated tokens per answer
+        """
+        self.rag = rag_pipeline
+        self.output_file = output_file
+        self.k = k
+        self.retrieval_batch_size = retrieval_batch_size
+        self.generation_batch_size = generation_batch_size
+        self.num_workers = num_workers
+        self.max_new_tokens = max_new_tokens
+
+    def _retrieve(self, items):
+        """Retrieve the sources of one batch of questions."""
+        return self.rag.retrieve_batch([item['question'] for item in items], k=self.k,
+                                       batch_size=self.retrieval_batch_size)
+
+    def _generation_tasks(self, items, sources_list, retrieval_time):
+        """Split a retrieved batch into generate_answers() batches."""
+        step = self.generation_batch_size
+        return [(items[offset:offset + step],
+                 partial(self._answer_batch, items[offset:offset + step], sources_list[offset:offset + step],
+                         retrieval_time))
+                for offset in range(0, len(items), step)]
+
+    def _answer_batch(self, items, sources_list, retrieval_time):
+        """Generate answers for one batch and build its result records."""
+        start_time = time.time()
+        prompts = [self.rag.create_prompt(item['question'], sources)
+                   for item, sources in zip(items, sources_list)]
+        answers = self.rag.generate_answers(prompts, batch_size=self.generation_batch_size,
+                                            max_new_tokens=self.max_new_tokens)
+        generation_time = (time.time() - start_time) / len(items)
+
+        records = []
+        for item, sources, answer in zip(items, sources_list, answers):
+            records.append({
+                'question_id': item['question_id'],
+                'question': item['question'],
+                'answer': answer,
+                'sources': [{
+                    'complaint_id': source['complaint_id'],
+                    'product': source['product'],
+                    'similarity_score': round(float(source['similarity_score']), 4),
+                    'text': source['text']
+                } for source in sources],
+                'timings': {
+                    'retrieval': round(retrieval_time, 4),
+                    'generation': round(generation_time, 4)
+                }
+            })
+        return records
+
+    def run(self, questions):
+        """
+        Answer all questions not already present in the output file.
+
+        Args:
+            questions: List of question dictionaries from load_questions()
+
+        Returns:
+            Number of questions answered in this run
+        """
+        pending, done = split_pending(questions, self.output_file)
+
+        print(f"Questions: {len(questions):,} total, {done:,} already answered, "
+              f"{len(pending):,} to answer")
+        if not pending:
+            return 0
+
+        start_time = time.time()
+        with JsonlResultWriter(self.output_file) as writer, \
+                ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            written, failed = run_batches(pending, writer, self._retrieve, self._generation_tasks,
+                                          self.retrieval_batch_size, executor=executor,
+                                          max_backlog=self.num_workers * 2)
+
+        answered = written - failed
+        elapsed = time.time() - start_time
+        print(f"Answered {answered:,} questions in {elapsed:.1f}s "
+              f"({answered / max(elapsed, 1e-9):.2f} questions/s)")
+        if failed:
+            print(f"⚠️ {failed:,} questions failed; rerun to retry them")
+        return answered
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a question file offline, with resume support")
+    parser.add_argument('--questions', help="Question file (.jsonl, .csv or .txt); defaults to the custom evaluation questions")
+    parser.add_argument('--output', default='reports/bulk_answers.jsonl', help="JSONL answers file")
+    parser.add_argument('--vector-store', default='vector_store/', help="Vector store directory")
+    parser.add_argument('--k', type=int, default=5, help="Chunks retrieved per question")
+    parser.add_argument('--retrieval-batch-size', type=int, default=64, help="Retrieval batch size")
+    parser.add_argument('--generation-batch-size', type=int, default=8, help="Prompts per generation batch")
+    parser.add_argument('--workers', type=int, default=1, help="Generation batches running in parallel")
+    parser.add_argument('--max-new-tokens', type=int, default=200, help="Generated tokens per answer")
+    args = parser.parse_args()
+
+    if args.questions:
+        questions = load_questions(args.questions)
+    else:
+        questions = [{'question_id': f"q{i}", 'question': q, 'expected_aspects': None}
+                     for i, q in enumerate(create_custom_evaluation_questions())]
+
+    print("Initializing RAG pipeline...")
+    rag = load_pipeline(vector_store_path=args.vector_store)
+
+    runner = BulkQARunner(
+        rag, args.output, k=args.k, retrieval_batch_size=args.retrieval_batch_size,
+        generation_batch_size=args.generation_batch_size, num_workers=args.workers,
+        max_new_tokens=args.max_new_tokens
+    )
+    runner.run(questions)
+    print(f"💾 Answers saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,62 +2,145 @@ import pandas as pd
 import numpy as np
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from sentence_transformers import SentenceTransformer
-import faiss
+import argparse
 import os
+import shutil
+
+from embedding_cache import encode_with_cache
+from index_compression import REDUCTION_METHODS, evaluate_reduction, print_report, train_transform, write_report
+from sharded_search import split_store
+from snapshots import create_build_dir, publish_snapshot
+from vector_stores import BACKENDS, write_vector_store
+from time_shards import METADATA_COLUMNS, normalize_dates, write_time_partitioned_store
 
 # Set paths
 input_file = '../data/processed/filtered_complaints.csv'
 chunks_file = '../data/processed/complaint_chunks.csv'
-index_file = '../vector_store/faiss_index.bin'
-metadata_file = '../vector_store/metadata.csv'
-
-# Create directories
-os.makedirs('../data/processed', exist_ok=True)
-os.makedirs('../vector_store', exist_ok=True)
-
-# Load filtered dataset
-print("Loading filtered complaints...")
-df = pd.read_csv(input_file)
-
-# Initialize text splitter
-splitter = RecursiveCharacterTextSplitter(
-    chunk_size=500,  # Based on typical narrative length
-    chunk_overlap=50,
-    length_function=lambda x: len(x.split())
-)
-
-# Split narratives into chunks
-print("Chunking narratives...")
-chunks = []
-for idx, row in df.iterrows():
-    splits = splitter.split_text(row['Consumer complaint narrative'])
-    for split in splits:
-        chunks.append({
-            'complaint_id': row['Complaint ID'],  # Adjust if column name differs
-            'product': row['Product'],
-            'chunk': split
-        })
-
-# Save chunks
-df_chunks = pd.DataFrame(chunks)
-df_chunks.to_csv(chunks_file, index=False)
-print(f"Created {len(df_chunks)} chunks, saved to {chunks_file}")
-
-# Generate embeddings
-print("Generating embeddings...")
-model = SentenceTransformer('all-MiniLM-L6-v2')
-embeddings = model.encode(df_chunks['chunk'].tolist(), batch_size=32, show_progress_bar=True)
-df_chunks['embedding'] = embeddings.tolist()
-
-# Create FAISS index
-print("Building FAISS index...")
-embeddings_np = np.array(df_chunks['embedding'].tolist(), dtype=np.float32)
-dimension = embeddings_np.shape[1]  # 384 for all-MiniLM-L6-v2
-index = faiss.IndexFlatL2(dimension)
-index.add(embeddings_np)
-
-# Save index and metadata
-faiss.write_index(index, index_file)
-df_chunks[['complaint_id', 'product', 'chunk']].to_csv(metadata_file, index=False)
-print(f"Saved FAISS index with {index.ntotal} vectors to {index_file}")
-print(f"Saved metadata to {metadata_file}")
\ No newline at end of file
+vector_store_dir = '../vector_store'
+
+
+def create_splitter(chunk_size=500, chunk_overlap=50):
+    """
+    Create the word-based recursive text splitter used for narratives.
+
+    Args:
+        chunk_size: Maximum words per chunk (based on typical narrative length)
+        chunk_overlap: Words shared between consecutive chunks
+
+    Returns:
+        Configured RecursiveCharacterTextSplitter
+    """
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=lambda x: len(x.split())
+    )
+
+
+def chunk_complaints(df, splitter):
+    """
+    Split every complaint narrative into chunks.
+
+    Args:
+        df: Filtered complaints with 'Complaint ID', 'Product', 'Issue', 'State',
+            'Date received' and narrative columns
+        splitter: Text splitter from create_splitter()
+
+    Returns:
+        DataFrame with one row per chunk
+    """
+    dates = normalize_dates(df['Date received']) if 'Date received' in df.columns else pd.Series(None, index=df.index)
+    chunks = []
+    for idx, row in df.iterrows():
+        splits = splitter.split_text(row['Consumer complaint narrative'])
+        for split in splits:
+            chunks.append({
+                'complaint_id': row['Complaint ID'],  # Adjust if column name differs
+                'product': row['Product'],
+                'issue': row.get('Issue'),
+                'state': row.get('State'),
+                'date_received': dates[idx],
+                'chunk': split
+            })
+    return pd.DataFrame(chunks, columns=METADATA_COLUMNS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunk, embed and index the filtered complaints")
+    parser.add_argument('--num-shards', type=int, default=0,
+                        help="Also split the index into this many shards for sharded_search.py")
+    parser.add_argument('--reduce-dim', type=int, default=0,
+                        help="Store vectors reduced to this many dimensions (0 keeps all 384)")
+    parser.add_argument('--reduce-method', choices=REDUCTION_METHODS, default='pca',
+                        help="Transform learned for --reduce-dim")
+    parser.add_argument('--backend', choices=list(BACKENDS), default='faiss',
+                        help="Vector store backend (date filters, --reduce-dim and --num-shards need faiss)")
+    parser.add_argument('--embedding-cache', default='../cache/embeddings',
+                        help="Embedding cache directory reused across re-chunking runs ('' disables it)")
+    args = parser.parse_args()
+    if args.backend != 'faiss' and (args.reduce_dim or args.num_shards):
+        parser.error("--reduce-dim and --num-shards need the faiss backend")
+
+    # Create directories
+    os.makedirs('../data/processed', exist_ok=True)
+    os.makedirs(vector_store_dir, exist_ok=True)
+
+    # Load filtered dataset
+    print("Loading filtered complaints...")
+    df = pd.read_csv(input_file)
+
+    # Split narratives into chunks
+    print("Chunking narratives...")
+    df_chunks = chunk_complaints(df, create_splitter())
+
+    # Save chunks
+    df_chunks.to_csv(chunks_file, index=False)
+    print(f"Created {len(df_chunks)} chunks, saved to {chunks_file}")
+
+    # Generate embeddings
+    print("Generating embeddings...")
+    model = SentenceTransformer('all-MiniLM-L6-v2')
+    # Only chunks whose text changed since an earlier run are encoded
+    embeddings, cache_stats = encode_with_cache(model, 'all-MiniLM-L6-v2', df_chunks['chunk'].tolist(),
+                                                args.embedding_cache or None, show_progress_bar=True)
+    if cache_stats:
+        print(f"Embedding cache hit rate: {cache_stats['hit_rate']:.1%} "
+              f"({cache_stats['hits']} reused, {cache_stats['misses']} encoded)")
+    df_chunks['embedding'] = embeddings.tolist()
+
+    embeddings_np = np.array(df_chunks['embedding'].tolist(), dtype=np.float32)
+    # Build into a fresh directory, so files of earlier builds are not published with it
+    build_dir = create_build_dir(vector_store_dir)
+    if args.backend != 'faiss':
+        print(f"Building {args.backend} vector store...")
+        write_vector_store(args.backend, embeddings_np, df_chunks[METADATA_COLUMNS], build_dir)
+        version = publish_snapshot(vector_store_dir, source_dir=build_dir, keep=3)
+        shutil.rmtree(build_dir)
+        print(f"Saved {len(embeddings_np)} vectors; published vector store snapshot {version}")
+        return
+
+    # Create FAISS index, with rows grouped by quarter for date-filtered retrieval
+    print("Building FAISS index...")
+    transform = None
+    if args.reduce_dim:
+        print(f"Learning {args.reduce_method.upper()} reduction to {args.reduce_dim} dimensions...")
+        report = evaluate_reduction(embeddings_np, [args.reduce_dim], args.reduce_method)
+        print_report(report)
+        write_report(report, '../reports/dimension_reduction.json')
+        transform = train_transform(embeddings_np, args.reduce_dim, args.reduce_method)
+    write_time_partitioned_store(embeddings_np, df_chunks[METADATA_COLUMNS], build_dir, transform)
+    print(f"Saved FAISS index with {len(embeddings_np)} vectors and metadata to {build_dir}")
+
+    if args.num_shards:
+        # Split the stored index, so shard rows follow the stored metadata order
+        split_store(build_dir, args.num_shards)
+        print(f"Split the index into {args.num_shards} search shards")
+
+    # Running apps switch to the new snapshot between requests
+    version = publish_snapshot(vector_store_dir, source_dir=build_dir, keep=3)
+    shutil.rmtree(build_dir)
+    print(f"Published vector store snapshot {version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,21 +4,40 @@ Complete Task 2: Generate embeddings and create FAISS vector store
 This script takes the existing complaint_chunks.csv and creates the vector store needed for Task 3.
 """
 
+import argparse
 import pandas as pd
 import numpy as np
-import faiss
 from sentence_transformers import SentenceTransformer
 import os
+import shutil
 import time
 
+from embedding_cache import EmbeddingCache, model_version
+from index_compression import REDUCTION_METHODS, build_index, evaluate_reduction, print_report, train_transform, write_report
+from snapshots import create_build_dir, publish_snapshot
+from time_shards import METADATA_COLUMNS, write_time_partitioned_store
+from vector_stores import BACKENDS, FaissVectorStore, load_vector_store, write_vector_store
+
 def main():
+    parser = argparse.ArgumentParser(description="Embed complaint_chunks.csv and build the vector store")
+    parser.add_argument('--reduce-dim', type=int, default=0,
+                        help="Store vectors reduced to this many dimensions (0 keeps all 384)")
+    parser.add_argument('--reduce-method', choices=REDUCTION_METHODS, default='pca',
+                        help="Transform learned for --reduce-dim")
+    parser.add_argument('--backend', choices=list(BACKENDS), default='faiss',
+                        help="Vector store backend (date filters and --reduce-dim need faiss)")
+    parser.add_argument('--embedding-cache', default='../cache/embeddings',
+                        help="Embedding cache directory reused across re-chunking runs ('' disables it)")
+    args = parser.parse_args()
+    if args.backend != 'faiss' and args.reduce_dim:
+        parser.error("--reduce-dim needs the faiss backend")
+    
     print("🚀 Completing Task 2: Generating Vector Store")
     print("=" * 50)
     
     # Paths
     chunks_file = '../data/processed/complaint_chunks.csv'
-    index_file = '../vector_store/faiss_index.bin'
-    metadata_file = '../vector_store/metadata.csv'
+    vector_store_dir = '../vector_store'
     
     # Check if chunks file exists
     if not os.path.exists(chunks_file):
@@ -32,7 +51,7 @@ def main():
     print(f"✅ Loaded {len(df_chunks)} chunks")
     
     # Create vector store directory
-    os.makedirs('../vector_store', exist_ok=True)
+    os.makedirs(vector_store_dir, exist_ok=True)
     
     # Generate embeddings
     print("\n🔧 Generating embeddings...")
@@ -43,18 +62,32 @@ def main():
     # Initialize model
     model = SentenceTransformer('all-MiniLM-L6-v2')
     
+    # Chunks whose text is unchanged since an earlier run come from the cache
+    cache = None
+    if args.embedding_cache:
+        cache = EmbeddingCache(args.embedding_cache, model_version(model, 'all-MiniLM-L6-v2'),
+                               model.get_sentence_embedding_dimension())
+    
+    def encode(texts):
+        return model.encode(texts, batch_size=32, show_progress_bar=False)
+    
     # Generate embeddings in batches to avoid memory issues
     batch_size = 1000
     all_embeddings = []
     
     for i in range(0, len(df_chunks), batch_size):
         batch = df_chunks['chunk'].iloc[i:i+batch_size].tolist()
-        batch_embeddings = model.encode(batch, batch_size=32, show_progress_bar=False)
+        batch_embeddings = cache.encode(batch, encode) if cache else encode(batch)
         all_embeddings.extend(batch_embeddings.tolist())
         
         if (i + batch_size) % 10000 == 0:
             print(f"   Processed {i + batch_size}/{len(df_chunks)} chunks...")
     
+    if cache:
+        stats = cache.summary()
+        print(f"✅ Embedding cache: {stats['hit_rate']:.1%} hit rate ({stats['hits']:,} reused, "
+              f"{stats['misses']:,} encoded)")
+    
     # Add embeddings to dataframe
     df_chunks['embedding'] = all_embeddings
     
@@ -71,27 +104,47 @@ def main():
     print(f"   Embedding dimension: {dimension}")
     print(f"   Total vectors: {len(embeddings_np)}")
     
-    # Create FAISS index
-    index = faiss.IndexFlatL2(dimension)
-    index.add(embeddings_np)
+    # Optionally learn a PCA/OPQ rotation and store reduced vectors; the
+    # transform is saved inside the index and applied to queries by search()
+    transform = None
+    if args.reduce_dim:
+        print(f"\n📐 Learning {args.reduce_method.upper()} reduction to {args.reduce_dim} dimensions...")
+        report = evaluate_reduction(embeddings_np, [args.reduce_dim], args.reduce_method)
+        print_report(report)
+        write_report(report, '../reports/dimension_reduction.json')
+        transform = train_transform(embeddings_np, args.reduce_dim, args.reduce_method)
     
     # Save index and metadata
-    print("\n💾 Saving vector store...")
-    faiss.write_index(index, index_file)
-    df_chunks[['complaint_id', 'product', 'chunk']].to_csv(metadata_file, index=False)
+    print(f"\n💾 Saving {args.backend} vector store...")
+    metadata_columns = [c for c in METADATA_COLUMNS if c in df_chunks.columns]
+    # Build into a fresh directory, so files of earlier builds are not published with it
+    build_dir = create_build_dir(vector_store_dir)
+    metadata_file = os.path.join(build_dir, 'metadata.csv')
+    if args.backend != 'faiss':
+        write_vector_store(args.backend, embeddings_np, df_chunks[metadata_columns], build_dir)
+    elif 'date_received' in metadata_columns:
+        # Rows are grouped by quarter for date-filtered retrieval
+        write_time_partitioned_store(embeddings_np, df_chunks[metadata_columns], build_dir, transform)
+    else:
+        FaissVectorStore(metadata=df_chunks[metadata_columns], index=build_index(embeddings_np, transform)).persist(build_dir)
     
-    print(f"✅ Saved FAISS index with {index.ntotal} vectors to {index_file}")
+    print(f"✅ Saved {len(embeddings_np)} vectors to {build_dir}")
     print(f"✅ Saved metadata to {metadata_file}")
     
     # Verify the files
     print("\n🔍 Verifying vector store...")
-    if os.path.exists(index_file) and os.path.exists(metadata_file):
+    if os.path.exists(metadata_file):
         # Test loading
-        test_index = faiss.read_index(index_file)
-        test_metadata = pd.read_csv(metadata_file)
+        test_store = load_vector_store(build_dir)
+        
+        print(f"✅ Verified {test_store.backend} vector store: {test_store.ntotal} vectors, query dimension {test_store.d}"
+              + (f", stored dimension {args.reduce_dim}" if args.reduce_dim else ""))
+        print(f"✅ Verified metadata: {len(test_store.metadata)} rows")
         
-        print(f"✅ Verified FAISS index: {test_index.ntotal} vectors, dimension {test_index.d}")
-        print(f"✅ Verified metadata: {len(test_metadata)} rows")
+        # Running apps switch to the new snapshot between requests
+        version = publish_snapshot(vector_store_dir, source_dir=build_dir, keep=3)
+        shutil.rmtree(build_dir)
+        print(f"✅ Published vector store snapshot {version}")
         
         print("\n🎉 Task 2 completed successfully!")
         print("You can now proceed with Task 3.")
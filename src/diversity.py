@@ -0,0 +1,113 @@
+"""
+Retrieval post-stage that diversifies the chunks passed to the prompt.
+Over-fetched candidates are first collapsed by complaint, so one complaint
+cannot fill the context with its overlapping chunks. Maximal Marginal
+Relevance then picks k of the rest, trading similarity to the question
+against similarity to the chunks already picked. Both steps run on the whole
+query batch at once as array operations over a few dozen candidates per query.
+"""
+
+import numpy as np
+
+
+def collapse_mask(complaint_ids, max_per_complaint=1):
+    """
+    Keep at most max_per_complaint hits per complaint in each row.
+
+    Args:
+        complaint_ids: Array (queries, candidates) of complaint ids in rank
+            order (padding gets a placeholder id and is masked by the caller)
+        max_per_complaint: Hits kept per complaint (the best-ranked ones)
+
+    Returns:
+        Boolean array, True for hits that are kept
+    """
+    same = complaint_ids[:, :, None] == complaint_ids[:, None, :]
+    # Number of better-ranked hits from the same complaint
+    earlier = np.tril(same, k=-1).sum(axis=2)
+    return earlier < max_per_complaint
+
+
+def mmr_select(query_embeddings, candidate_embeddings, valid, k, lambda_mult=0.7):
+    """
+    Greedy Maximal Marginal Relevance over a batch of queries.
+
+    Args:
+        query_embeddings: Array (queries, dim)
+        candidate_embeddings: Array (queries, candidates, dim)
+        valid: Boolean array (queries, candidates); False candidates are never picked
+        k: Number of candidates to pick per query
+        lambda_mult: 1.0 ranks by relevance only, 0.0 by novelty only
+
+    Returns:
+        Array (queries, k) of candidate positions, -1 where fewer than k were valid
+    """
+    queries = query_embeddings / np.maximum(np.linalg.norm(query_embeddings, axis=1, keepdims=True), 1e-12)
+    candidates = candidate_embeddings / np.maximum(
+        np.linalg.norm(candidate_embeddings, axis=2, keepdims=True), 1e-12)
+
+    relevance = np.einsum('qd,qcd->qc', queries, candidates)
+    similarity = np.einsum('qcd,qed->qce', candidates, candidates)
+
+    num_queries, num_candidates = relevance.shape
+    rows = np.arange(num_queries)
+    available = valid.copy()
+    # Highest similarity of each candidate to anything picked so far
+    redundancy = np.full((num_queries, num_candidates), -np.inf, dtype=relevance.dtype)
+    selected = np.full((num_queries, k), -1, dtype=np.int64)
+
+    for step in range(min(k, num_candidates)):
+        if step == 0:
+            scores = relevance.copy()
+        else:
+            scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+
+        picked = scores.argmax(axis=1)
+        has_pick = available[rows, picked]
+        selected[:, step] = np.where(has_pick, picked, -1)
+
+        available[rows, picked] = False
+        redundancy = np.maximum(redundancy, similarity[rows, picked])
+
+    return selected
+
+
+def diversify_hits(query_embeddings, distances, indices, complaint_ids, vectors, k,
+                   lambda_mult=0.7, max_per_complaint=1):
+    """
+    Collapse by complaint and re-rank over-fetched search results with MMR.
+
+    Args:
+        query_embeddings: Array (queries, dim) used for the search
+        distances: FAISS distances (queries, candidates)
+        indices: FAISS row ids (queries, candidates), -1 for padding
+        complaint_ids: Array with the complaint id of every stored row
+        vectors: Callable mapping an array of row ids to their embeddings, or
+            None to only collapse by complaint
+        k: Hits kept per query
+        lambda_mult: MMR relevance weight
+        max_per_complaint: Hits kept per complaint
+
+    Returns:
+        (distances, indices) with k columns in the picked order, padded with
+        -1 like FAISS
+    """
+    valid = indices >= 0
+    safe_indices = np.where(valid, indices, 0)
+    row_complaints = np.where(valid, complaint_ids[safe_indices], -1)
+    if max_per_complaint:
+        valid &= collapse_mask(row_complaints, max_per_complaint)
+
+    if vectors is None:
+        # Keep the FAISS order among the collapsed hits
+        order = np.argsort(~valid, axis=1, kind='stable')[:, :k]
+        picked = np.where(np.take_along_axis(valid, order, axis=1), order, -1)
+    else:
+        candidate_embeddings = vectors(safe_indices.ravel()).reshape(*indices.shape, -1)
+        picked = mmr_select(query_embeddings, candidate_embeddings, valid, k, lambda_mult)
+
+    safe_picked = np.maximum(picked, 0)
+    distances = np.where(picked >= 0, np.take_along_axis(distances, safe_picked, axis=1), np.inf)
+    indices = np.where(picked >= 0, np.take_along_axis(indices, safe_picked, axis=1), -1)
+    return distances, indices
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Persistent content-hash cache for chunk embeddings.
+Re-chunking with a different chunk_size or chunk_overlap leaves most chunk
+texts byte-identical, so their embeddings are looked up instead of
+recomputed. Keys hash the normalized chunk text together with the model name
+and a hash of its weights. Vectors go to an append-only float32 file, and a
+key -> row index is appended next to it. A crash between the two writes
+leaves at most unindexed rows, which are ignored; a crash within an index
+write leaves a partial last line, which is ignored and overwritten.
+
+Usage:
+    python src/embedding_cache.py stats --cache cache/embeddings
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import unicodedata
+
+import numpy as np
+
+VECTORS_FILE = 'vectors.f32'
+INDEX_FILE = 'index.tsv'
+META_FILE = 'meta.json'
+
+
+def normalize_text(text):
+    """Unicode-normalize and collapse whitespace, so formatting-only changes still hit."""
+    return ' '.join(unicodedata.normalize('NFC', str(text)).split())
+
+
+def weights_hash(model):
+    """
+    SHA-256 of a model's parameters and buffers, in name order.
+
+    A name alone does not pin the weights: a hub model can be updated under
+    the same name, or loaded from a fine-tuned local copy.
+
+    Args:
+        model: torch module (e.g. a SentenceTransformer)
+
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha256()
+    for name, tensor in sorted(model.state_dict().items()):
+        digest.update(name.encode('utf-8'))
+        digest.update(str(tuple(tensor.shape)).encode('utf-8'))
+        digest.update(tensor.detach().cpu().float().contiguous().numpy().tobytes())
+    return digest.hexdigest()
+
+
+def model_version(model, model_name):
+    """
+    Identify the embedding model for cache keys.
+
+    Args:
+        model: SentenceTransformer instance
+        model_name: Name it was loaded with
+
+    Returns:
+        String that changes whenever the model's vectors would
+    """
+    return (f"{model_name}|weights={weights_hash(model)[:16]}|"
+            f"dim={model.get_sentence_embedding_dimension()}|max_seq={model.max_seq_length}")
+
+
+class EmbeddingCache:
+    def __init__(self, path, model_id, dimension):
+        """
+        Open (or create) a cache directory.
+
+        One process should write to a cache at a time.
+
+        Args:
+            path: Cache directory
+            model_id: Model name and version, see model_version()
+            dimension: Embedding dimension
+        """
+        self.path = path
+        self.model_id = model_id
+        self.dimension = dimension
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(path, exist_ok=True)
+
+        meta_file = os.path.join(path, META_FILE)
+        if os.path.exists(meta_file):
+            with open(meta_file) as f:
+                stored_dimension = json.load(f)['dimension']
+            if stored_dimension != dimension:
+                raise ValueError(f"Cache at {path} holds {stored_dimension}-dim vectors, not {dimension}")
+        else:
+            with open(meta_file, 'w') as f:
+                json.dump({'dimension': dimension}, f)
+
+        self.vectors_file = os.path.join(path, VECTORS_FILE)
+        self.index_file = os.path.join(path, INDEX_FILE)
+        self.rows = self._read_index()
+        self._vectors = None
+
+    def _stored_rows(self):
+        if not os.path.exists(self.vectors_file):
+            return 0
+        return os.path.getsize(self.vectors_file) // (4 * self.dimension)
+
+    def _read_index(self):
+        """
+        Key -> row for every row fully written to the vectors file.
+
+        Only newline-terminated lines count: a line cut short by a crash
+        could end in a truncated row number that points at the wrong vector.
+        The length of the complete lines is kept so _append() can drop the
+        partial tail before writing.
+        """
+        stored = self._stored_rows()
+        rows = {}
+        self._index_size = 0
+        if os.path.exists(self.index_file):
+            with open(self.index_file, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    self._index_size += len(line)
+                    key, _, row = line[:-1].decode('utf-8').partition('\t')
+                    if row.isdigit() and int(row) < stored:
+                        rows[key] = int(row)
+        return rows
+
+    def _mapped_vectors(self):
+        if self._vectors is None or len(self._vectors) < self._stored_rows():
+            stored = self._stored_rows()
+            self._vectors = (np.memmap(self.vectors_file, dtype=np.float32, mode='r', shape=(stored, self.dimension))
+                             if stored else np.zeros((0, self.dimension), dtype=np.float32))
+        return self._vectors
+
+    def key(self, text):
+        """Cache key of a chunk text for this model."""
+        return hashlib.sha256(f"{self.model_id}\0{normalize_text(text)}".encode('utf-8')).hexdigest()
+
+    def encode(self, texts, encode_fn):
+        """
+        Embeddings for texts, encoding only the ones not cached yet.
+
+        Args:
+            texts: List of chunk texts
+            encode_fn: Function taking a list of texts and returning their
+                embeddings (e.g. a wrapped SentenceTransformer.encode)
+
+        Returns:
+            float32 array with one row per text
+        """
+        keys = [self.key(text) for text in texts]
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self.rows and key not in missing:
+                missing[key] = text
+
+        # Repeats of a missing text within the call are encoded once and count as hits
+        self.misses += len(missing)
+        self.hits += len(keys) - len(missing)
+        if missing:
+            encoded = np.asarray(encode_fn(list(missing.values())), dtype=np.float32)
+            self._append(list(missing), encoded)
+
+        vectors = self._mapped_vectors()
+        return np.asarray(vectors[[self.rows[key] for key in keys]], dtype=np.float32).reshape(len(keys), self.dimension)
+
+    def _append(self, keys, vectors):
+        """Write vectors, then index them; both files are only ever appended to."""
+        first_row = self._stored_rows()
+        if os.path.exists(self.vectors_file) and os.path.getsize(self.vectors_file) != first_row * 4 * self.dimension:
+            # Drop a partial row left by an interrupted write
+            os.truncate(self.vectors_file, first_row * 4 * self.dimension)
+        with open(self.vectors_file, 'ab') as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(self.index_file) and os.path.getsize(self.index_file) != self._index_size:
+            # Drop a partial line left by an interrupted write
+            os.truncate(self.index_file, self._index_size)
+        lines = ''.join(f"{key}\t{first_row + offset}\n" for offset, key in enumerate(keys)).encode('utf-8')
+        with open(self.index_file, 'ab') as f:
+            f.write(lines)
+        self._index_size += len(lines)
+        for offset, key in enumerate(keys):
+            self.rows[key] = first_row + offset
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self):
+        """Hit/miss counts of this run and the cache size."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hit_rate, 4),
+            'cached_vectors': len(self.rows),
+            'cache_mb': round(self._stored_rows() * 4 * self.dimension / 1024 / 1024, 1)
+        }
+
+
+def encode_with_cache(model, model_name, texts, cache_dir, batch_size=32, show_progress_bar=False):
+    """
+    Embed chunk texts through an EmbeddingCache (cache_dir=None encodes everything).
+
+    Args:
+        model: SentenceTransformer instance
+        model_name: Name the model was loaded with
+        texts: List of chunk texts
+        cache_dir: Cache directory, or None to disable the cache
+        batch_size: Encoder batch size
+        show_progress_bar: Passed to model.encode
+
+    Returns:
+        (float32 embeddings, cache summary dictionary or None)
+    """
+    def encode(batch):
+        return model.encode(batch, batch_size=batch_size, show_progress_bar=show_progress_bar)
+
+    if cache_dir is None:
+        return np.asarray(encode(texts), dtype=np.float32), None
+    cache = EmbeddingCache(cache_dir, model_version(model, model_name), model.get_sentence_embedding_dimension())
+    return cache.encode(texts, encode), cache.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the chunk embedding cache")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    stats_parser = subparsers.add_parser('stats', help="Show the cache size")
+    stats_parser.add_argument('--cache', default='cache/embeddings', help="Cache directory")
+    args = parser.parse_args()
+
+    with open(os.path.join(args.cache, META_FILE)) as f:
+        dimension = json.load(f)['dimension']
+    cache = EmbeddingCache(args.cache, model_id=None, dimension=dimension)
+    summary = cache.summary()
+    print(f"📦 {summary['cached_vectors']:,} cached {dimension}-dim vectors ({summary['cache_mb']:.1f} MB) in {args.cache}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
-from rag_pipeline import RAGPipeline, create_evaluation_questions
+from rag_pipeline import create_evaluation_questions
+from inference_client import load_pipeline
 import os
 
 class RAGEvaluator:
@@ -25,13 +26,25 @@ class RAGEvaluator:
         Returns:
             Dictionary with evaluation results
         """
-        # Get RAG response
-        result = self.rag.answer_question(question)
+        # Get RAG response (mode 'rag' so aggregate and theme questions are
+        # scored on retrieval and generation, not on the cube or the clusters)
+        result = self.rag.answer_question(question, mode='rag')
         
-        # Analyze response quality
-        answer = result['answer']
-        sources = result['sources']
+        return self.build_evaluation(question, result['answer'], result['sources'], expected_aspects)
+    
+    def build_evaluation(self, question, answer, sources, expected_aspects=None):
+        """
+        Score an already generated answer and its sources.
         
+        Args:
+            question: Test question
+            answer: Generated answer text
+            sources: Retrieved source chunks
+            expected_aspects: List of aspects that should be covered in the answer
+            
+        Returns:
+            Dictionary with evaluation results
+        """
         # Calculate quality metrics
         quality_score = self._calculate_quality_score(answer, sources, expected_aspects)
         
@@ -216,7 +229,7 @@ def create_custom_evaluation_questions():
 if __name__ == "__main__":
     # Initialize RAG pipeline
     print("Initializing RAG pipeline...")
-    rag = RAGPipeline()
+    rag = load_pipeline()
     
     # Initialize evaluator
     evaluator = RAGEvaluator(rag)
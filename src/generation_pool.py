@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Multi-process generation pool with per-worker CPU and thread pinning.
+Each worker process pins itself to a slice of the available cores, sets its
+torch thread count and loads DialoGPT from a memory-mapped weights file, so
+all workers share one copy of the weights in the OS page cache. A dispatcher
+sends each prompt to the worker with the fewest outstanding requests.
+
+Usage:
+    python src/generation_pool.py export --model microsoft/DialoGPT-medium --output models/dialogpt-medium
+    python src/generation_pool.py sweep --weights models/dialogpt-medium --processes 1 2 4 --threads 1 2 4
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+
+WEIGHTS_FILE = 'weights.pt'
+# Seconds between liveness checks of the workers while waiting on them
+POLL_INTERVAL = 1.0
+
+
+def export_weights(model_name, output_dir):
+    """
+    Save a model as config + tokenizer + a single mmap-able state dict file.
+
+    Args:
+        model_name: HuggingFace model name
+        output_dir: Destination directory
+    """
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    model = AutoModelForCausalLM.from_pretrained(model_name)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    model.config.save_pretrained(output_dir)
+    tokenizer.save_pretrained(output_dir)
+    torch.save(model.state_dict(), os.path.join(output_dir, WEIGHTS_FILE))
+
+
+def split_cpus(num_workers, cpus=None):
+    """
+    Split the usable CPUs into contiguous, equally sized slices.
+
+    Args:
+        num_workers: Number of slices
+        cpus: CPU ids to split (defaults to this process's affinity)
+
+    Returns:
+        List of CPU id lists, one per worker
+    """
+    if cpus is None:
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count() or 1))
+    per_worker = max(1, len(cpus) // num_workers)
+    return [cpus[(i * per_worker) % len(cpus):(i * per_worker) % len(cpus) + per_worker]
+            for i in range(num_workers)]
+
+
+def _worker_main(worker_id, cpus, num_threads, weights_dir, request_queue, response_queue):
+    """Worker process: pin, load mmap'd weights, then serve prompts until None arrives."""
+    if hasattr(os, 'sched_setaffinity') and cpus:
+        os.sched_setaffinity(0, cpus)
+
+    import torch
+    from transformers import AutoConfig, AutoModelForCausalLM, AutoTokenizer
+
+    torch.set_num_threads(num_threads)
+    torch.set_num_interop_threads(1)
+
+    config = AutoConfig.from_pretrained(weights_dir)
+    tokenizer = AutoTokenizer.from_pretrained(weights_dir)
+    state_dict = torch.load(os.path.join(weights_dir, WEIGHTS_FILE), mmap=True, weights_only=True)
+    with torch.device('meta'):
+        model = AutoModelForCausalLM.from_config(config)
+    # assign=True keeps the mmap'd tensors instead of copying them into private memory
+    model.load_state_dict(state_dict, assign=True)
+    model.tie_weights()
+    model.eval()
+
+    response_queue.put(('ready', worker_id, None, None))
+
+    while True:
+        request = request_queue.get()
+        if request is None:
+            break
+        request_id, prompt, max_new_tokens, min_new_tokens, max_time = request
+        try:
+            inputs = tokenizer(prompt, return_tensors='pt')
+            generation_kwargs = {'max_new_tokens': max_new_tokens, 'do_sample': True,
+                                 'temperature': 0.7, 'pad_token_id': tokenizer.eos_token_id}
+            if min_new_tokens is not None:
+                generation_kwargs['min_new_tokens'] = min_new_tokens
+            if max_time is not None:
+                generation_kwargs['max_time'] = max_time
+            with torch.inference_mode():
+                output = model.generate(**inputs, **generation_kwargs)
+            new_tokens = output[0, inputs['input_ids'].shape[1]:]
+            answer = tokenizer.decode(new_tokens, skip_special_tokens=True).strip()
+            response_queue.put(('ok', worker_id, request_id, (answer, int(new_tokens.shape[0]))))
+        except Exception as e:
+            response_queue.put(('error', worker_id, request_id, f"{type(e).__name__}: {e}"))
+
+
+class GenerationPool:
+    def __init__(self, weights_dir, num_workers=2, threads_per_worker=None, startup_timeout=600):
+        """
+        Start the worker processes and wait until every one has loaded the model.
+
+        Args:
+            weights_dir: Directory written by export_weights()
+            num_workers: Number of worker processes
+            threads_per_worker: torch threads per worker (defaults to its CPU slice size)
+            startup_timeout: Seconds to wait for the workers to load
+
+        Raises:
+            RuntimeError: If a worker exits or the timeout passes before all are ready
+        """
+        context = mp.get_context('spawn')
+        self.num_workers = num_workers
+        self.cpu_slices = split_cpus(num_workers)
+        self.threads_per_worker = threads_per_worker or len(self.cpu_slices[0])
+
+        self._request_queues = [context.Queue() for _ in range(num_workers)]
+        self._response_queue = context.Queue()
+        self._depth = [0] * num_workers
+        # request id -> (future, worker id)
+        self._futures = {}
+        self._dead = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+
+        self._processes = []
+        for worker_id in range(num_workers):
+            process = context.Process(
+                target=_worker_main,
+                args=(worker_id, self.cpu_slices[worker_id], self.threads_per_worker,
+                      weights_dir, self._request_queues[worker_id], self._response_queue),
+                daemon=True
+            )
+            process.start()
+            self._processes.append(process)
+
+        try:
+            self._wait_ready(startup_timeout)
+        except RuntimeError:
+            for process in self._processes:
+                process.terminate()
+            raise
+
+        self._collector = threading.Thread(target=self._collect, name='generation-pool-collector', daemon=True)
+        self._collector.start()
+
+    def _wait_ready(self, timeout):
+        """Wait for every worker's 'ready', failing fast if one of them exits while loading."""
+        deadline = time.monotonic() + timeout
+        ready = set()
+        while len(ready) < self.num_workers:
+            try:
+                status, worker_id, _, _ = self._response_queue.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                for worker_id, process in enumerate(self._processes):
+                    if worker_id not in ready and not process.is_alive():
+                        raise RuntimeError(f"Generation worker {worker_id} exited with code "
+                                           f"{process.exitcode} while loading {WEIGHTS_FILE}")
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Generation workers not ready after {timeout}s")
+                continue
+            if status != 'ready':
+                raise RuntimeError("Generation worker failed to start")
+            ready.add(worker_id)
+
+    def _collect(self):
+        """Resolve futures as workers report back, and fail those of workers that died."""
+        next_check = time.monotonic() + POLL_INTERVAL
+        while True:
+            # Checked on a timer, so a dead worker is noticed while the others keep replying
+            if time.monotonic() >= next_check:
+                self._reap_dead_workers()
+                next_check = time.monotonic() + POLL_INTERVAL
+            try:
+                message = self._response_queue.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if message is None:
+                return
+            status, worker_id, request_id, payload = message
+            with self._lock:
+                entry = self._futures.pop(request_id, None)
+                if entry is None:
+                    # Already failed when its worker was reaped
+                    continue
+                self._depth[worker_id] -= 1
+            future, _ = entry
+            if status == 'ok':
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(payload))
+
+    def _reap_dead_workers(self):
+        """Stop routing to workers that exited and fail the requests they held."""
+        failed = []
+        with self._lock:
+            for worker_id, process in enumerate(self._processes):
+                if worker_id in self._dead or process.is_alive():
+                    continue
+                self._dead.add(worker_id)
+                self._depth[worker_id] = 0
+                for request_id, (future, assigned) in list(self._futures.items()):
+                    if assigned == worker_id:
+                        del self._futures[request_id]
+                        failed.append((future, worker_id, process.exitcode))
+        for future, worker_id, exitcode in failed:
+            future.set_exception(RuntimeError(f"Generation worker {worker_id} exited with code {exitcode}"))
+
+    def queue_depths(self):
+        """Outstanding requests per worker."""
+        with self._lock:
+            return list(self._depth)
+
+    def submit(self, prompt, max_new_tokens=200, min_new_tokens=None, max_time=None):
+        """
+        Send a prompt to the least loaded worker.
+
+        max_time (seconds) stops generation early, returning the partial answer.
+
+        Returns:
+            Future resolving to (answer text, generated token count)
+
+        Raises:
+            RuntimeError: If every worker has exited
+        """
+        future = Future()
+        with self._lock:
+            alive = [i for i in range(self.num_workers) if i not in self._dead]
+            if not alive:
+                raise RuntimeError("All generation workers have exited")
+            request_id = next(self._ids)
+            worker_id = min(alive, key=lambda i: self._depth[i])
+            self._depth[worker_id] += 1
+            self._futures[request_id] = (future, worker_id)
+        self._request_queues[worker_id].put((request_id, prompt, max_new_tokens, min_new_tokens, max_time))
+        return future
+
+    def generate(self, prompt, max_new_tokens=200, min_new_tokens=None, max_time=None):
+        """Blocking generation; returns the answer text."""
+        answer, _ = self.submit(prompt, max_new_tokens, min_new_tokens, max_time).result()
+        return answer
+
+    def shutdown(self):
+        """Stop all workers."""
+        for request_queue in self._request_queues:
+            request_queue.put(None)
+        for process in self._processes:
+            process.join(timeout=30)
+        self._response_queue.put(None)
+
+
+def sweep(weights_dir, process_counts, thread_counts, num_requests=32, max_new_tokens=64):
+    """
+    Measure throughput for every process-count x thread-count combination
+    that fits on the available cores.
+
+    Returns:
+        List of result dictionaries
+    """
+    available = len(split_cpus(1)[0])
+    prompt = ("You are a financial analyst assistant for CrediTrust. Question: What billing issues "
+              "do customers report?\n\nAnswer: Based on the complaint data, ")
+    results = []
+
+    for processes, threads in itertools.product(process_counts, thread_counts):
+        if processes * threads > available:
+            continue
+        print(f"   {processes} processes x {threads} threads...")
+        pool = GenerationPool(weights_dir, processes, threads)
+        try:
+            pool.generate(prompt, max_new_tokens=4)  # warm up every code path once
+            start_time = time.perf_counter()
+            futures = [pool.submit(prompt, max_new_tokens, max_new_tokens) for _ in range(num_requests)]
+            outputs = [f.result() for f in futures]
+            elapsed = time.perf_counter() - start_time
+        finally:
+            pool.shutdown()
+
+        tokens = sum(count for _, count in outputs)
+        results.append({
+            'processes': processes,
+            'threads_per_process': threads,
+            'requests_per_s': round(num_requests / elapsed, 3),
+            'tokens_per_s': round(tokens / elapsed, 2),
+            'seconds': round(elapsed, 2)
+        })
+        print(f"      {results[-1]['requests_per_s']} requests/s, {results[-1]['tokens_per_s']} tokens/s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-process generation pool")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help="Write mmap-able weights for the pool")
+    export_parser.add_argument('--model', default='microsoft/DialoGPT-medium', help="HuggingFace model name")
+    export_parser.add_argument('--output', default='models/dialogpt-medium', help="Output directory")
+
+    sweep_parser = subparsers.add_parser('sweep', help="Throughput sweep over processes x threads")
+    sweep_parser.add_argument('--weights', default='models/dialogpt-medium', help="Exported weights directory")
+    sweep_parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4], help="Process counts")
+    sweep_parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4], help="torch threads per process")
+    sweep_parser.add_argument('--requests', type=int, default=32, help="Requests per combination")
+    sweep_parser.add_argument('--tokens', type=int, default=64, help="Generated tokens per request")
+    sweep_parser.add_argument('--output', default='reports/generation_pool_sweep', help="Report prefix (.json/.md)")
+
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        print(f"💾 Exporting {args.model} to {args.output}...")
+        export_weights(args.model, args.output)
+        print("✅ Done")
+        return
+
+    print("🚀 Generation pool sweep")
+    results = sweep(args.weights, args.processes, args.threads, args.requests, args.tokens)
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output + '.json', 'w') as f:
+        json.dump({'created_at': datetime.now().isoformat(timespec='seconds'),
+                   'cpu_count': os.cpu_count(), 'tokens_per_request': args.tokens,
+                   'results': results}, f, indent=2)
+    with open(args.output + '.md', 'w') as f:
+        f.write("| processes | threads/process | requests/s | tokens/s |\n|---|---|---|---|\n")
+        for r in sorted(results, key=lambda r: -r['tokens_per_s']):
+            f.write(f"| {r['processes']} | {r['threads_per_process']} | {r['requests_per_s']} | {r['tokens_per_s']} |\n")
+    print(f"💾 Results saved to {args.output}.json and {args.output}.md")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Dimensionality reduction of the stored embeddings with recall tracking.
+A PCA or OPQ rotation is learned on a sample of the chunk embeddings and the
+index stores the reduced vectors. The transform is saved with the index as a
+FAISS IndexPreTransform, so index.search() applies it to query embeddings and
+retrieve() needs no changes. evaluate_reduction() measures recall@k of each
+reduced size against exact full-dimension search, to pick the size/quality
+point deliberately.
+
+Usage:
+    python src/index_compression.py evaluate --vector-store vector_store/ --dimensions 64 128 192
+    python src/index_compression.py evaluate --vector-store vector_store/ --dimensions 128 --method opq
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+
+sys.path.append(os.path.dirname(__file__))
+
+from index_io import load_embeddings, read_index
+from vector_stores import load_vector_store, store_backend
+
+REDUCTION_METHODS = ('pca', 'opq')
+
+
+def train_transform(embeddings, dimension, method='pca', sample_size=100_000, seed=42):
+    """
+    Learn a rotation that maps embeddings to `dimension` dimensions.
+
+    Args:
+        embeddings: float32 array (may be memory-mapped)
+        dimension: Output dimension
+        method: 'pca' (keep the top principal components) or 'opq' (rotation
+            that balances variance across subspaces, best when a PQ index follows)
+        sample_size: Rows sampled for training
+        seed: Random seed for the sample
+
+    Returns:
+        Trained faiss.VectorTransform
+    """
+    if method not in REDUCTION_METHODS:
+        raise ValueError(f"Unknown reduction method: {method}")
+    input_dimension = embeddings.shape[1]
+    if not 0 < dimension <= input_dimension:
+        raise ValueError(f"Dimension must be between 1 and {input_dimension}, got {dimension}")
+
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(embeddings), size=min(sample_size, len(embeddings)), replace=False))
+    sample = np.ascontiguousarray(embeddings[rows], dtype=np.float32)
+
+    if method == 'pca':
+        transform = faiss.PCAMatrix(input_dimension, dimension)
+    else:
+        # Subquantizer count must divide the output dimension
+        subquantizers = next(m for m in (32, 16, 8, 4, 2, 1) if dimension % m == 0)
+        transform = faiss.OPQMatrix(input_dimension, subquantizers, dimension)
+    transform.train(sample)
+    return transform
+
+
+def build_index(embeddings, transform=None, batch_size=100_000):
+    """
+    Build a flat L2 index, over reduced vectors when a transform is given.
+
+    Args:
+        embeddings: float32 array of full-dimension embeddings
+        transform: Optional trained transform from train_transform()
+        batch_size: Rows added per batch (bounds the temporary copies)
+
+    Returns:
+        faiss.IndexFlatL2, or faiss.IndexPreTransform wrapping one
+    """
+    if transform is None:
+        index = faiss.IndexFlatL2(embeddings.shape[1])
+    else:
+        index = faiss.IndexPreTransform(transform, faiss.IndexFlatL2(transform.d_out))
+    for start in range(0, len(embeddings), batch_size):
+        index.add(np.ascontiguousarray(embeddings[start:start + batch_size], dtype=np.float32))
+    return index
+
+
+def index_transform(index):
+    """
+    The transform stored with an index, so derived indexes (shards) can reuse it.
+
+    Returns:
+        faiss.VectorTransform, or None for plain indexes
+    """
+    index = faiss.downcast_index(index)
+    if not isinstance(index, faiss.IndexPreTransform):
+        return None
+    return faiss.downcast_VectorTransform(index.chain.at(0))
+
+
+def recall_at_k(exact_indices, approximate_indices, k):
+    """
+    Fraction of the exact top-k found in the approximate top-k.
+
+    Args:
+        exact_indices: Row ids from exact search, shape (queries, >= k)
+        approximate_indices: Row ids from the reduced index, shape (queries, >= k)
+        k: Cutoff
+
+    Returns:
+        Mean recall@k over the queries
+    """
+    exact, approximate = exact_indices[:, :k], approximate_indices[:, :k]
+    found = (approximate[:, :, None] == exact[:, None, :]).any(axis=1)
+    return float(found.mean())
+
+
+def evaluate_reduction(embeddings, dimensions, method='pca', ks=(1, 5, 10), num_queries=1000,
+                       sample_size=100_000, seed=42):
+    """
+    Compare reduced-dimension indexes with exact full-dimension search.
+
+    Held-out chunk embeddings serve as queries and are left out of the
+    indexes, so no query trivially finds itself.
+
+    Args:
+        embeddings: float32 array of full-dimension embeddings
+        dimensions: Reduced dimensions to evaluate
+        method: 'pca' or 'opq'
+        ks: Cutoffs for recall@k
+        num_queries: Held-out query rows
+        sample_size: Rows used to train each transform
+        seed: Random seed
+
+    Returns:
+        Dictionary with the full-dimension baseline and one row per dimension
+    """
+    rng = np.random.default_rng(seed)
+    num_queries = min(num_queries, max(len(embeddings) // 10, 1))
+    query_rows = rng.choice(len(embeddings), size=num_queries, replace=False)
+    in_base = np.ones(len(embeddings), dtype=bool)
+    in_base[query_rows] = False
+    queries = np.ascontiguousarray(embeddings[np.sort(query_rows)], dtype=np.float32)
+    base = np.asarray(embeddings[in_base], dtype=np.float32)
+
+    max_k = max(ks)
+    exact_index = build_index(base)
+    start_time = time.perf_counter()
+    _, exact = exact_index.search(queries, max_k)
+    full_search_ms = (time.perf_counter() - start_time) * 1000 / num_queries
+    del exact_index
+
+    rows = []
+    for dimension in dimensions:
+        start_time = time.perf_counter()
+        transform = train_transform(base, dimension, method, sample_size, seed)
+        train_seconds = time.perf_counter() - start_time
+
+        index = build_index(base, transform)
+        start_time = time.perf_counter()
+        _, approximate = index.search(queries, max_k)
+        search_ms = (time.perf_counter() - start_time) * 1000 / num_queries
+
+        rows.append({
+            'dimension': dimension,
+            'bytes_per_vector': dimension * 4,
+            'index_mb': round(len(base) * dimension * 4 / 1024 / 1024, 1),
+            'train_seconds': round(train_seconds, 2),
+            'search_ms_per_query': round(search_ms, 4),
+            **{f"recall@{k}": round(recall_at_k(exact, approximate, k), 4) for k in ks}
+        })
+
+    return {
+        'method': method,
+        'num_vectors': int(len(base)),
+        'num_queries': int(num_queries),
+        'full_dimension': int(embeddings.shape[1]),
+        'full_index_mb': round(len(base) * embeddings.shape[1] * 4 / 1024 / 1024, 1),
+        'full_search_ms_per_query': round(full_search_ms, 4),
+        'rows': rows
+    }
+
+
+def print_report(report):
+    """Print an evaluate_reduction() report as a table."""
+    recall_keys = [key for key in report['rows'][0] if key.startswith('recall@')] if report['rows'] else []
+    print(f"   {report['method'].upper()} vs {report['full_dimension']}-dim exact search "
+          f"({report['num_vectors']:,} vectors, {report['full_index_mb']:.0f} MB, "
+          f"{report['full_search_ms_per_query']:.2f} ms/query)")
+    print(f"   {'dim':>5} {'MB':>8} {'ms/query':>9} " + " ".join(f"{key:>10}" for key in recall_keys))
+    for row in report['rows']:
+        print(f"   {row['dimension']:>5} {row['index_mb']:>8.0f} {row['search_ms_per_query']:>9.2f} "
+              + " ".join(f"{row[key]:>10.3f}" for key in recall_keys))
+
+
+def write_report(report, path):
+    """Save a report as JSON."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+def load_store_embeddings(vector_store_path):
+    """
+    Full-dimension embeddings of a store: embeddings.npy, else read back from
+    the store's backend (reconstructed from a FAISS index, fetched from Chroma).
+    """
+    embeddings_file = os.path.join(vector_store_path, 'embeddings.npy')
+    if os.path.exists(embeddings_file):
+        return load_embeddings(embeddings_file)
+    if store_backend(vector_store_path) != 'faiss':
+        store = load_vector_store(vector_store_path)
+        return store.vectors(np.arange(store.ntotal))
+    index, _ = read_index(os.path.join(vector_store_path, 'faiss_index.bin'), mmap=False)
+    if index_transform(index) is not None:
+        raise ValueError("The index is already reduced and embeddings.npy is missing; rebuild the store")
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate reduced-dimension indexes against full-dimension search")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    evaluate_parser = subparsers.add_parser('evaluate', help="Report recall@k per reduced dimension")
+    evaluate_parser.add_argument('--vector-store', default='vector_store/', help="Vector store directory")
+    evaluate_parser.add_argument('--dimensions', type=int, nargs='+', default=[64, 128, 192], help="Reduced sizes")
+    evaluate_parser.add_argument('--method', choices=REDUCTION_METHODS, default='pca', help="Transform to learn")
+    evaluate_parser.add_argument('--queries', type=int, default=1000, help="Held-out query vectors")
+    evaluate_parser.add_argument('--output', default='reports/dimension_reduction.json', help="Report file")
+    args = parser.parse_args()
+
+    from snapshots import resolve_store_path
+    path, _ = resolve_store_path(args.vector_store)
+    embeddings = load_store_embeddings(path)
+    print(f"📐 Evaluating {args.method.upper()} reduction of {len(embeddings):,} vectors...")
+    report = evaluate_reduction(embeddings, args.dimensions, args.method, num_queries=args.queries)
+    print_report(report)
+    write_report(report, args.output)
+    print(f"💾 Report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
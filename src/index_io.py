@@ -0,0 +1,122 @@
+"""
+Memory-mapped loading for FAISS indexes and embedding arrays.
+A mapped file is served from the OS page cache, so worker processes that load
+the same vector store share one physical copy. Startup also stops scaling with
+index size, because pages are read on first touch.
+"""
+
+import logging
+import os
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _base_index(index):
+    """The index under any IndexPreTransform wrappers, downcast to its concrete type."""
+    index = faiss.downcast_index(index)
+    while isinstance(index, faiss.IndexPreTransform):
+        index = faiss.downcast_index(index.index)
+    return index
+
+
+def _is_ivf(index):
+    try:
+        faiss.extract_index_ivf(index)
+        return True
+    except RuntimeError:
+        return False
+
+
+def read_index(path, mmap=True):
+    """
+    Read a FAISS index, memory-mapping its vectors when FAISS can.
+
+    IO_FLAG_MMAP only maps the inverted lists of IVF indexes; the codes of
+    flat indexes (the IndexFlatL2 this repo builds) need IO_FLAG_MMAP_IFC,
+    which newer FAISS releases provide. Any other combination is read into
+    private memory and reported as not mapped.
+
+    Args:
+        path: Index file
+        mmap: Try to map the file; falls back to a normal read for index
+            types (or FAISS builds) that cannot be mapped
+
+    Returns:
+        (index, mapped) where mapped is True only when the vectors are
+        served from the file
+    """
+    if mmap:
+        mmap_ifc = getattr(faiss, 'IO_FLAG_MMAP_IFC', None)
+        if mmap_ifc is not None:
+            try:
+                index = faiss.read_index(path, mmap_ifc | faiss.IO_FLAG_READ_ONLY)
+                if isinstance(_base_index(index), faiss.IndexFlatCodes):
+                    return index, True
+            except RuntimeError as e:
+                logger.info("Cannot mmap the codes of %s (%s)", path, e)
+        try:
+            index = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            if _is_ivf(index):
+                return index, True
+            logger.info("%s was read into memory: this FAISS build cannot map %s codes",
+                        path, type(_base_index(index)).__name__)
+            return index, False
+        except (RuntimeError, AttributeError) as e:
+            logger.info("Cannot mmap %s (%s); reading it into memory", path, e)
+    return faiss.read_index(path), False
+
+
+def load_embeddings(path, mmap=True):
+    """
+    Load a raw embedding matrix saved with np.save.
+
+    Args:
+        path: .npy file
+        mmap: Map the file read-only instead of reading it
+
+    Returns:
+        float32 array (a read-only np.memmap when mmap is True)
+    """
+    return np.load(path, mmap_mode='r' if mmap else None)
+
+
+def memory_usage():
+    """
+    Resident memory of this process, split into private and file-backed pages.
+
+    File-backed pages (mapped indexes, embeddings, libraries) are shared with
+    other processes mapping the same files; anonymous pages are private.
+
+    Returns:
+        Dictionary of sizes in MB (empty where /proc is unavailable)
+    """
+    fields = {'VmRSS': 'rss_mb', 'RssAnon': 'rss_private_mb', 'RssFile': 'rss_file_mb'}
+    usage = {}
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in fields:
+                    usage[fields[key]] = round(int(value.split()[0]) / 1024, 1)
+    except OSError:
+        pass
+    return usage
+
+
+def evict_from_page_cache(paths):
+    """
+    Ask the kernel to drop cached pages of the given files (best effort, no root needed).
+
+    Used to measure cold starts.
+
+    Args:
+        paths: Files to evict
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    for path in paths:
+        with open(path, 'rb') as f:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
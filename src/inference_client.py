@@ -0,0 +1,257 @@
+"""
+Thin client for the shared inference daemon.
+RemoteRAGPipeline implements the RAGPipeline methods the apps and scripts use,
+forwarding each call over the daemon socket, so attaching takes milliseconds
+instead of reloading the index and models in every process.
+"""
+
+import asyncio
+import ipaddress
+import os
+import secrets
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client
+
+DEFAULT_ADDRESS = 'localhost:7861'
+AUTHKEY_ENV = 'RAG_INFERENCE_AUTHKEY'
+AUTHKEY_FILE_ENV = 'RAG_INFERENCE_AUTHKEY_FILE'
+DEFAULT_AUTHKEY_FILE = os.path.join('~', '.config', 'creditrust', 'rag_authkey')
+
+
+def parse_address(address):
+    """
+    Turn an address string into a multiprocessing.connection address.
+
+    'unix:/path.sock' or a path starting with '/' selects a Unix socket,
+    'host:port' selects TCP. An empty host (':7861') means localhost, so
+    listening on other interfaces always takes an explicit host.
+
+    Returns:
+        Tuple of (address, family)
+    """
+    if address.startswith('unix:'):
+        return address[len('unix:'):], 'AF_UNIX'
+    if address.startswith('/'):
+        return address, 'AF_UNIX'
+    host, port = address.rsplit(':', 1)
+    return (host or 'localhost', int(port)), 'AF_INET'
+
+
+def is_local_address(address):
+    """True for Unix sockets and TCP addresses on the loopback interface."""
+    parsed, family = parse_address(address)
+    if family == 'AF_UNIX':
+        return True
+    host = parsed[0]
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class AuthKeyError(RuntimeError):
+    """Raised when no usable shared secret is configured for the sockets."""
+
+
+def authkey_file_path(path=None):
+    """Key file from the argument, RAG_INFERENCE_AUTHKEY_FILE or ~/.config/creditrust/rag_authkey."""
+    return os.path.expanduser(path or os.environ.get(AUTHKEY_FILE_ENV) or DEFAULT_AUTHKEY_FILE)
+
+
+def get_authkey(path=None):
+    """
+    Shared secret for the daemon and shard sockets.
+
+    The sockets carry pickles, so whoever holds the key can run code in the
+    server; there is deliberately no built-in default. The key comes from
+    RAG_INFERENCE_AUTHKEY, else from a key file that only its owner can read.
+
+    Args:
+        path: Key file to read instead of the environment / default file
+
+    Returns:
+        The key as bytes
+
+    Raises:
+        AuthKeyError: If no key is configured or the key file is readable by others
+    """
+    if path is None and os.environ.get(AUTHKEY_ENV):
+        return os.environ[AUTHKEY_ENV].encode('utf-8')
+    path = authkey_file_path(path)
+    if not os.path.exists(path):
+        raise AuthKeyError(f"No authkey configured: set {AUTHKEY_ENV} or create {path} "
+                           f"with `python src/inference_server.py --create-authkey`")
+    if os.stat(path).st_mode & 0o077:
+        raise AuthKeyError(f"{path} is accessible by other users; run `chmod 600 {path}`")
+    with open(path, 'rb') as f:
+        key = f.read().strip()
+    if not key:
+        raise AuthKeyError(f"{path} is empty")
+    return key
+
+
+def create_authkey_file(path=None):
+    """
+    Write a new random key file readable only by its owner.
+
+    Args:
+        path: Key file (defaults as in get_authkey())
+
+    Returns:
+        Path of the key file
+    """
+    path = authkey_file_path(path)
+    os.makedirs(os.path.dirname(path) or '.', mode=0o700, exist_ok=True)
+    # O_EXCL: never overwrite a key other processes already use
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(secrets.token_hex(32).encode('utf-8'))
+    return path
+
+
+class RemoteCallError(RuntimeError):
+    """Raised when the daemon reports an exception for a forwarded call."""
+
+
+class RemoteRAGPipeline:
+    def __init__(self, address=DEFAULT_ADDRESS, authkey=None):
+        """
+        Connect to a running inference daemon.
+
+        Args:
+            address: 'host:port' or 'unix:/path.sock' of the daemon
+            authkey: Shared secret (defaults to get_authkey())
+        """
+        self.address = address
+        self.authkey = authkey or get_authkey()
+        # Connections are not thread-safe, so every thread gets its own
+        self._local = threading.local()
+
+        info = self._call('info')
+        self.vector_store_path = info['vector_store_path']
+        self.model_name = info['model_name']
+        self.num_vectors = info['num_vectors']
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            address, family = parse_address(self.address)
+            connection = Client(address, family=family, authkey=self.authkey)
+            self._local.connection = connection
+        return connection
+
+    def _call(self, method, *args, **kwargs):
+        connection = self._connection()
+        try:
+            connection.send((method, args, kwargs))
+            status, result = connection.recv()
+        except (EOFError, OSError):
+            # Drop the broken connection so the next call reconnects
+            self._local.connection = None
+            raise
+        if status != 'ok':
+            raise RemoteCallError(result)
+        return result
+
+    def close(self):
+        """Close this thread's connection to the daemon."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def info(self):
+        """Describe the daemon (vector store, model, pid, uptime)."""
+        return self._call('info')
+
+    def encode_queries(self, questions, batch_size=32):
+        return self._call('encode_queries', questions, batch_size=batch_size)
+
+    def retrieve(self, question, k=5, date_range=None, diversify=None):
+        return self._call('retrieve', question, k, date_range=date_range, diversify=diversify)
+
+    def retrieve_batch(self, questions, k=5, batch_size=32, date_range=None, diversify=None):
+        return self._call('retrieve_batch', questions, k, batch_size=batch_size, date_range=date_range,
+                          diversify=diversify)
+
+    def create_prompt(self, question, context_chunks):
+        return self._call('create_prompt', question, context_chunks)
+
+    def generate_answer(self, prompt, max_new_tokens=200, min_new_tokens=None):
+        return self._call('generate_answer', prompt, max_new_tokens=max_new_tokens,
+                          min_new_tokens=min_new_tokens)
+
+    def generate_answers(self, prompts, batch_size=8, max_new_tokens=200, min_new_tokens=None,
+                         return_stats=False):
+        return self._call('generate_answers', prompts, batch_size=batch_size,
+                          max_new_tokens=max_new_tokens, min_new_tokens=min_new_tokens,
+                          return_stats=return_stats)
+
+    def count_tokens(self, text):
+        return self._call('count_tokens', text)
+
+    def reload_store(self):
+        return self._call('reload_store')
+
+    def answer_question(self, question, k=5, return_timings=False, mode='generative', latency_budget=None):
+        return self._call('answer_question', question, k, return_timings=return_timings, mode=mode,
+                          latency_budget=latency_budget)
+
+    async def retrieve_async(self, question, k=5, date_range=None, diversify=None):
+        return await asyncio.to_thread(self.retrieve, question, k, date_range, diversify)
+
+    async def answer_question_async(self, question, k=5, return_timings=False, mode='generative',
+                                    latency_budget=None):
+        # The daemon finishes the call even if this task is cancelled
+        return await asyncio.to_thread(self.answer_question, question, k, return_timings, mode,
+                                       latency_budget)
+
+
+def load_pipeline(vector_store_path='vector_store/', address=None, **kwargs):
+    """
+    Attach to the inference daemon if one is configured, else load locally.
+
+    The daemon address comes from the argument or RAG_INFERENCE_ADDRESS; if
+    neither is set, the daemon cannot be reached, no shared secret is
+    configured or the daemon rejects it, or the daemon serves a different
+    vector store, a local RAGPipeline is created with the given arguments
+    (with a warning saying why).
+
+    Args:
+        vector_store_path: Vector store to answer from
+        address: Daemon address, overriding RAG_INFERENCE_ADDRESS
+        **kwargs: Extra RAGPipeline arguments for the local fallback (an
+            attached daemon uses its own settings instead)
+
+    Returns:
+        RemoteRAGPipeline or RAGPipeline
+    """
+    address = address or os.environ.get('RAG_INFERENCE_ADDRESS')
+    if address:
+        rag = None
+        try:
+            rag = RemoteRAGPipeline(address)
+        except (OSError, EOFError) as e:
+            print(f"Inference daemon at {address} unavailable ({e}); loading models locally")
+        except AuthKeyError as e:
+            print(f"Cannot attach to inference daemon at {address}: {e}; loading models locally")
+        except AuthenticationError:
+            print(f"Inference daemon at {address} rejected the shared secret (check {AUTHKEY_ENV} "
+                  f"or {AUTHKEY_FILE_ENV}); loading models locally")
+
+        if rag is not None:
+            if os.path.realpath(rag.vector_store_path) != os.path.realpath(vector_store_path):
+                print(f"Inference daemon at {address} serves {rag.vector_store_path}, not "
+                      f"{vector_store_path}; loading models locally")
+                rag.close()
+            else:
+                print(f"Attached to inference daemon at {address} ({rag.num_vectors} vectors)")
+                if kwargs:
+                    print(f"   The daemon's own settings apply; ignoring {', '.join(sorted(kwargs))}")
+                return rag
+
+    from rag_pipeline import RAGPipeline
+    return RAGPipeline(vector_store_path=vector_store_path, **kwargs)
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Long-lived inference daemon for the RAG system.
+Loads the FAISS index, MiniLM and DialoGPT once and serves embed / retrieve /
+generate calls over a local socket, so apps and scripts can attach through
+inference_client.RemoteRAGPipeline instead of loading their own copies.
+
+The socket carries pickles, so the daemon refuses to start without a shared
+secret (RAG_INFERENCE_AUTHKEY or an owner-only key file, see
+inference_client.get_authkey) and listens on localhost unless another
+address is given.
+
+Usage:
+    python src/inference_server.py --create-authkey
+    python src/inference_server.py --address localhost:7861
+    python src/inference_server.py --address unix:/tmp/creditrust_rag.sock --metrics-port 9101
+"""
+
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from multiprocessing.connection import Listener
+
+sys.path.append(os.path.dirname(__file__))
+
+from rag_pipeline import RAGPipeline
+from metrics import REGISTRY, start_metrics_server
+from inference_client import (DEFAULT_ADDRESS, AuthKeyError, create_authkey_file, get_authkey, is_local_address,
+                              parse_address)
+
+# Methods a client may call on the hosted pipeline
+EXPOSED_METHODS = {
+    'encode_queries', 'retrieve', 'retrieve_batch', 'create_prompt',
+    'generate_answer', 'generate_answers', 'answer_question', 'count_tokens', 'reload_store'
+}
+
+DAEMON_CALLS = REGISTRY.counter('rag_daemon_calls_total', 'Calls handled by the inference daemon by method')
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceServer:
+    def __init__(self, rag_pipeline, address=DEFAULT_ADDRESS, authkey=None):
+        """
+        Initialize the server around an already loaded pipeline.
+
+        Args:
+            rag_pipeline: Initialized RAGPipeline instance
+            address: 'host:port' or 'unix:/path.sock'
+            authkey: Shared secret clients must present (defaults to get_authkey(),
+                which raises AuthKeyError if none is configured)
+        """
+        self.rag = rag_pipeline
+        self.address = address
+        self.authkey = authkey or get_authkey()
+        self.started_at = time.time()
+        self._listener = None
+
+    def info(self):
+        """Describe what the daemon is serving."""
+        return {
+            'vector_store_path': os.path.abspath(self.rag.vector_store_path),
+            'model_name': self.rag.model_name,
+            'num_vectors': self.rag.index.ntotal,
+            'snapshot_version': self.rag.store.version,
+            'pid': os.getpid(),
+            'uptime_s': round(time.time() - self.started_at, 1)
+        }
+
+    def _handle_connection(self, connection):
+        """Serve requests from one client until it disconnects."""
+        with connection:
+            while True:
+                try:
+                    method, args, kwargs = connection.recv()
+                except (EOFError, ConnectionResetError):
+                    return
+
+                try:
+                    if method == 'info':
+                        result = self.info()
+                    elif method in EXPOSED_METHODS:
+                        result = getattr(self.rag, method)(*args, **kwargs)
+                    else:
+                        raise ValueError(f"Unknown method: {method}")
+                    DAEMON_CALLS.inc(labels={'method': method})
+                    connection.send(('ok', result))
+                except Exception as e:
+                    logger.error("Call %s failed:\n%s", method, traceback.format_exc())
+                    connection.send(('error', f"{type(e).__name__}: {e}"))
+
+    def serve_forever(self):
+        """Accept clients until interrupted; each client gets its own thread."""
+        address, family = parse_address(self.address)
+        if family == 'AF_UNIX' and os.path.exists(address):
+            os.remove(address)
+
+        self._listener = Listener(address, family=family, authkey=self.authkey)
+        print(f"✅ Inference daemon listening on {self.address}")
+        if not is_local_address(self.address):
+            logger.warning("Listening on %s: reachable from other hosts, protected only by the authkey",
+                           self.address)
+
+        try:
+            while True:
+                try:
+                    connection = self._listener.accept()
+                except Exception as e:
+                    # A client with the wrong authkey must not take the daemon down
+                    logger.warning("Rejected connection: %s", e)
+                    continue
+                threading.Thread(target=self._handle_connection, args=(connection,), daemon=True).start()
+        finally:
+            self._listener.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared RAG inference daemon")
+    parser.add_argument('--address', default=os.environ.get('RAG_INFERENCE_ADDRESS', DEFAULT_ADDRESS),
+                        help="'host:port' or 'unix:/path.sock' (binds to localhost unless a host is given)")
+    parser.add_argument('--authkey-file', help="Owner-only key file (instead of RAG_INFERENCE_AUTHKEY)")
+    parser.add_argument('--create-authkey', action='store_true',
+                        help="Write a new random key file and exit")
+    parser.add_argument('--vector-store', default='vector_store/', help="Vector store directory")
+    parser.add_argument('--model', default='microsoft/DialoGPT-medium', help="Generation model")
+    parser.add_argument('--draft-model', help="Small draft model for assisted generation, e.g. microsoft/DialoGPT-small")
+    parser.add_argument('--shard-addresses', default=os.environ.get('RAG_SHARD_ADDRESSES'),
+                        help="Comma-separated shard servers to search instead of the local index")
+    parser.add_argument('--snapshot-poll-interval', type=float,
+                        help="Seconds between checks for a newly published vector store snapshot")
+    parser.add_argument('--latency-budget', type=float,
+                        help="Seconds per answered question; generation is cut off when it runs out")
+    parser.add_argument('--max-inflight', type=int,
+                        help="Generations allowed at once; further requests get sources only")
+    parser.add_argument('--diversify', action='store_true',
+                        help="Retrieve with MMR and one chunk per complaint by default")
+    parser.add_argument('--metrics-port', type=int, help="Also serve Prometheus metrics on this port")
+    parser.add_argument('--metrics-host', default='127.0.0.1',
+                        help="Interface for the metrics port (loopback by default; 0.0.0.0 for remote scrapes)")
+    parser.add_argument('--generation-processes', type=int,
+                        help="Run generation in this many pinned worker processes")
+    parser.add_argument('--generation-threads', type=int, help="torch threads per generation process")
+    parser.add_argument('--generation-weights', default='models/dialogpt-medium',
+                        help="Weights exported with 'generation_pool.py export'")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    if args.create_authkey:
+        path = create_authkey_file(args.authkey_file)
+        print(f"🔑 Wrote a new authkey to {path}; clients read it from there or from RAG_INFERENCE_AUTHKEY")
+        return
+    # Checked before the models load, so a missing key fails fast
+    try:
+        authkey = get_authkey(args.authkey_file)
+    except AuthKeyError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print("🚀 Loading RAG pipeline into the inference daemon...")
+    start_time = time.time()
+    generation_pool = None
+    if args.generation_processes:
+        from generation_pool import GenerationPool
+        generation_pool = GenerationPool(args.generation_weights, args.generation_processes,
+                                         args.generation_threads)
+        print(f"✅ {args.generation_processes} generation workers, CPU slices {generation_pool.cpu_slices}")
+    rag = RAGPipeline(vector_store_path=args.vector_store, model_name=args.model,
+                      generation_pool=generation_pool, draft_model_name=args.draft_model,
+                      latency_budget=args.latency_budget, max_inflight_generations=args.max_inflight,
+                      shard_addresses=args.shard_addresses.split(',') if args.shard_addresses else None,
+                      snapshot_poll_interval=args.snapshot_poll_interval, diversify=args.diversify)
+    print(f"✅ Loaded in {time.time() - start_time:.1f} seconds")
+
+    if args.metrics_port:
+        start_metrics_server(port=args.metrics_port, host=args.metrics_host)
+        print(f"Metrics available at http://{args.metrics_host}:{args.metrics_port}/metrics")
+
+    try:
+        InferenceServer(rag, args.address, authkey).serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Inference daemon stopped.")
+    finally:
+        if generation_pool is not None:
+            generation_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Append-only JSONL result files shared by the bulk runners.
+Each finished record is written and flushed as its own line, so a run that is
+interrupted can be resumed by skipping the ids already present in the file.
+run_batches() is the retrieve-then-generate loop the runners share. A batch
+that fails is written as records with an 'error' field, which do not count as
+done, so the next run retries only those ids.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import as_completed
+
+import numpy as np
+
+
+def to_jsonable(value):
+    """
+    Convert numpy/pandas scalars and containers into plain JSON types.
+
+    Args:
+        value: Any value produced by the pipeline
+
+    Returns:
+        A value that json.dumps can serialize
+    """
+    if isinstance(value, dict):
+        return {str(key): to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    return value
+
+
+def read_jsonl(path):
+    """
+    Read records from a JSONL file, ignoring a truncated final line.
+
+    Args:
+        path: Path to the JSONL file
+
+    Returns:
+        List of decoded records (empty if the file does not exist)
+    """
+    records = []
+    if not os.path.exists(path):
+        return records
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                # A crash mid-write leaves a partial last line; it gets redone
+                continue
+    return records
+
+
+def latest_records(path, key='question_id'):
+    """
+    Read the last record written for each id (a retry supersedes its error).
+
+    Args:
+        path: Path to the JSONL results file
+        key: Record field holding the id
+
+    Returns:
+        List of records in order of first appearance
+    """
+    latest = {}
+    for record in read_jsonl(path):
+        if key in record:
+            latest[record[key]] = record
+    return list(latest.values())
+
+
+def load_completed_ids(path, key='question_id'):
+    """
+    Collect the ids already written to a results file without an error.
+
+    Args:
+        path: Path to the JSONL results file
+        key: Record field holding the id
+
+    Returns:
+        Set of ids found in the file
+    """
+    return {record[key] for record in read_jsonl(path) if key in record and 'error' not in record}
+
+
+def split_pending(items, path, key='question_id'):
+    """
+    Drop the items whose ids are already in a results file.
+
+    Args:
+        items: List of dictionaries carrying key
+        path: Path to the JSONL results file
+        key: Field holding the id
+
+    Returns:
+        (pending items in their original order, number of ids already done)
+    """
+    completed = load_completed_ids(path, key)
+    return [item for item in items if item[key] not in completed], len(completed)
+
+
+def run_batches(pending, writer, retrieve, make_tasks, batch_size, executor=None, max_backlog=8):
+    """
+    Retrieve pending items batch by batch and stream records as tasks finish.
+
+    A failed retrieval or task does not stop the run: each of its items is
+    written as an error record instead (see write_errors()).
+
+    Args:
+        pending: Items still to process
+        writer: JsonlResultWriter the records are written to
+        retrieve: Function(batch) returning one retrieval result per item
+        make_tasks: Function(batch, results, retrieval_time) returning
+            (items, task) pairs, where task is a zero-argument callable that
+            returns the records of those items (retrieval_time is in seconds
+            per item)
+        batch_size: Items retrieved per batch
+        executor: Executor the tasks run on (None runs them inline)
+        max_backlog: Tasks left outstanding before retrieval waits for one,
+            so retrieval does not run far ahead of generation
+
+    Returns:
+        (records written, items that failed) by this call
+    """
+    written = writer.records_written
+    failed = 0
+    futures = {}
+    total = len(pending)
+
+    for start in range(0, total, batch_size):
+        batch = pending[start:start + batch_size]
+
+        batch_start = time.time()
+        try:
+            results = retrieve(batch)
+        except Exception as e:
+            failed += write_errors(writer, batch, e)
+            continue
+        retrieval_time = (time.time() - batch_start) / len(batch)
+
+        for items, task in make_tasks(batch, results, retrieval_time):
+            if executor is None:
+                try:
+                    records = task()
+                except Exception as e:
+                    failed += write_errors(writer, items, e)
+                    continue
+                for record in records:
+                    writer.write(record)
+            else:
+                futures[executor.submit(task)] = items
+
+        while len(futures) > max_backlog:
+            done = next(as_completed(futures))
+            failed += _write_future(writer, done, futures.pop(done))
+
+        print(f"   Retrieved {min(start + len(batch), total):,}/{total:,} questions...")
+
+    for future in as_completed(futures):
+        failed += _write_future(writer, future, futures[future])
+    return writer.records_written - written, failed
+
+
+def write_errors(writer, items, error, key='question_id'):
+    """
+    Write one error record per item of a failed batch.
+
+    Args:
+        writer: JsonlResultWriter the records are written to
+        items: Items of the failed batch
+        error: The exception raised
+        key: Field holding the id
+
+    Returns:
+        Number of items written
+    """
+    message = f"{type(error).__name__}: {error}"
+    print(f"   ⚠️ {len(items)} questions failed ({message}); they are retried on the next run")
+    for item in items:
+        writer.write({key: item[key], 'question': item.get('question'), 'error': message})
+    return len(items)
+
+
+def _write_future(writer, future, items):
+    """Write the records of a finished task, or error records if it raised."""
+    try:
+        records = future.result()
+    except Exception as e:
+        return write_errors(writer, items, e)
+    for record in records:
+        writer.write(record)
+    return 0
+
+
+class JsonlResultWriter:
+    def __init__(self, path, fsync=False):
+        """
+        Open a JSONL file for appending results from several threads.
+
+        Args:
+            path: Path to the JSONL results file
+            fsync: Also fsync after each record (slower, survives power loss)
+        """
+        self.path = path
+        self.fsync = fsync
+        self.records_written = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def write(self, record):
+        """Append one record and flush it to disk."""
+        line = json.dumps(to_jsonable(record), ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self.records_written += 1
+
+    def close(self):
+        """Close the underlying file."""
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+End-to-end load generator for the chat service.
+Replays a question corpus against ComplaintChatInterface.chat_with_rag_async
+(the web UI's handler; chat_with_rag with --sync-handler) in process, or
+against an HTTP endpoint that accepts a JSON question, at a fixed concurrency
+(closed loop) or a Poisson arrival rate (open loop). Records time-to-first-byte,
+latency percentiles, throughput and error rate and writes JSON and HTML
+reports.
+
+Usage:
+    python src/load_test.py --concurrency 8 --requests 200 --stub-generator
+    python src/load_test.py --rate 2.5 --duration 120 --concurrency 16
+    python src/load_test.py --http-url http://localhost:8000/ask --concurrency 4 --requests 100
+"""
+
+import argparse
+import asyncio
+import html
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlparse
+
+import numpy as np
+
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STUB_ANSWER = ("Based on the complaint data, customers most often report unexpected fees, "
+               "billing errors and slow responses from customer service.")
+
+
+class InProcessTarget:
+    def __init__(self, stub_generator=False, stub_delay=0.0, mode='rag', use_async=True):
+        """
+        Drive the Gradio chat handler directly, without the web layer.
+
+        Args:
+            stub_generator: Replace LLM generation with a canned answer
+            stub_delay: Seconds the stub generator sleeps to mimic generation
+            mode: Answer mode passed to the handler; 'rag' keeps aggregate and
+                theme questions from being answered by the cube or the clusters
+            use_async: Call chat_with_rag_async on one event loop, as the web UI
+                does, instead of the blocking chat_with_rag
+        """
+        from app import ComplaintChatInterface
+        from inference_client import RemoteRAGPipeline
+
+        self.chat = ComplaintChatInterface()
+        self.mode = mode
+        if stub_generator:
+            if isinstance(self.chat.rag, RemoteRAGPipeline):
+                # Generation runs inside the daemon, so a stub here would never be called
+                raise ValueError("--stub-generator cannot stub a remote inference daemon; "
+                                 "unset RAG_INFERENCE_ADDRESS to load the pipeline in process")
+
+            def stub_generate_answer(prompt, **kwargs):
+                if stub_delay:
+                    time.sleep(stub_delay)
+                return STUB_ANSWER
+            # answer_question and answer_question_async both generate through this method
+            self.chat.rag.generate_answer = stub_generate_answer
+
+        self.loop = None
+        if use_async:
+            self.loop = asyncio.new_event_loop()
+            threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+    def send(self, question):
+        """
+        Send one question and time it.
+
+        The handler returns the whole response at once, so time-to-first-byte
+        equals total latency for this target.
+
+        Returns:
+            Tuple of (ttfb seconds, total seconds, error message or None)
+        """
+        start_time = time.perf_counter()
+        if self.loop is not None:
+            future = asyncio.run_coroutine_threadsafe(
+                self.chat.chat_with_rag_async(question, [], mode=self.mode), self.loop)
+            _, history = future.result()
+        else:
+            _, history = self.chat.chat_with_rag(question, [], mode=self.mode)
+        elapsed = time.perf_counter() - start_time
+
+        response = history[-1][1] if history else ''
+        error = response if response.startswith("❌") else None
+        return elapsed, elapsed, error
+
+
+class HttpTarget:
+    def __init__(self, url, field='question', timeout=120):
+        """
+        POST questions as JSON to an HTTP endpoint.
+
+        Args:
+            url: Endpoint URL, e.g. http://localhost:8000/ask
+            field: JSON field the question is sent in
+            timeout: Socket timeout in seconds
+        """
+        self.url = urlparse(url)
+        self.field = field
+        self.timeout = timeout
+
+    def send(self, question):
+        """Send one question; returns (ttfb seconds, total seconds, error or None)."""
+        connection_class = (http.client.HTTPSConnection if self.url.scheme == 'https'
+                            else http.client.HTTPConnection)
+        connection = connection_class(self.url.netloc, timeout=self.timeout)
+        body = json.dumps({self.field: question})
+
+        start_time = time.perf_counter()
+        try:
+            connection.request('POST', self.url.path or '/', body=body,
+                               headers={'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            response.read(1)
+            ttfb = time.perf_counter() - start_time
+            response.read()
+            total = time.perf_counter() - start_time
+        except (OSError, http.client.HTTPException) as e:
+            elapsed = time.perf_counter() - start_time
+            return elapsed, elapsed, str(e)
+        finally:
+            connection.close()
+
+        error = None if response.status < 400 else f"HTTP {response.status}"
+        return ttfb, total, error
+
+
+class LoadGenerator:
+    def __init__(self, target, questions, concurrency=4, rate=None, seed=42):
+        """
+        Initialize the load generator.
+
+        Args:
+            target: Object with a send(question) method
+            questions: Question corpus, replayed round-robin
+            concurrency: Maximum requests in flight
+            rate: Mean arrivals per second (Poisson); None for closed loop
+            seed: Random seed for arrival times
+        """
+        self.target = target
+        self.questions = questions
+        self.concurrency = concurrency
+        self.rate = rate
+        self.random = random.Random(seed)
+        self.samples = []
+        self._lock = threading.Lock()
+        self._counter = 0
+
+    def _next_question(self):
+        with self._lock:
+            question = self.questions[self._counter % len(self.questions)]
+            self._counter += 1
+            return question
+
+    def _send(self, question, scheduled_at):
+        ttfb, total, error = self.target.send(question)
+        finished_at = time.perf_counter()
+        with self._lock:
+            self.samples.append({
+                'question': question,
+                # Time spent queued behind the concurrency limit counts as latency
+                'queue_wait': finished_at - total - scheduled_at,
+                'ttfb': ttfb,
+                'latency': total,
+                'end_to_end': finished_at - scheduled_at,
+                'error': error,
+                'finished_at': finished_at
+            })
+
+    def run(self, num_requests=None, duration=None):
+        """
+        Generate load until num_requests are sent or duration seconds pass.
+
+        Returns:
+            Wall-clock seconds the run took
+        """
+        start_time = time.perf_counter()
+
+        def keep_going(sent):
+            if num_requests is not None and sent >= num_requests:
+                return False
+            if duration is not None and time.perf_counter() - start_time >= duration:
+                return False
+            return True
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            if self.rate:
+                # Open loop: arrivals follow a Poisson process regardless of latency
+                sent = 0
+                next_arrival = start_time
+                while keep_going(sent):
+                    delay = next_arrival - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    executor.submit(self._send, self._next_question(), next_arrival)
+                    sent += 1
+                    next_arrival += self.random.expovariate(self.rate)
+            else:
+                # Closed loop: each worker sends its next request as soon as one finishes
+                sent_lock = threading.Lock()
+                sent = [0]
+
+                def worker():
+                    while True:
+                        with sent_lock:
+                            if not keep_going(sent[0]):
+                                return
+                            sent[0] += 1
+                        self._send(self._next_question(), time.perf_counter())
+
+                for _ in range(self.concurrency):
+                    executor.submit(worker)
+
+        return time.perf_counter() - start_time
+
+
+def percentiles(values):
+    """p50/p90/p95/p99/max of a list of seconds, in milliseconds."""
+    if not values:
+        return {}
+    values = np.asarray(values) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(values, 50)), 2),
+        'p90_ms': round(float(np.percentile(values, 90)), 2),
+        'p95_ms': round(float(np.percentile(values, 95)), 2),
+        'p99_ms': round(float(np.percentile(values, 99)), 2),
+        'max_ms': round(float(values.max()), 2)
+    }
+
+
+def build_report(samples, wall_time, settings):
+    """Aggregate raw samples into the report dictionary."""
+    ok = [s for s in samples if s['error'] is None]
+    errors = [s for s in samples if s['error'] is not None]
+
+    error_counts = {}
+    for sample in errors:
+        key = sample['error'][:120]
+        error_counts[key] = error_counts.get(key, 0) + 1
+
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'settings': settings,
+        'wall_time_s': round(wall_time, 3),
+        'requests': len(samples),
+        'successes': len(ok),
+        'errors': len(errors),
+        'error_rate': round(len(errors) / len(samples), 4) if samples else 0.0,
+        'throughput_rps': round(len(ok) / wall_time, 3) if wall_time else 0.0,
+        'ttfb': percentiles([s['ttfb'] for s in ok]),
+        'latency': percentiles([s['latency'] for s in ok]),
+        'end_to_end': percentiles([s['end_to_end'] for s in ok]),
+        'queue_wait': percentiles([max(s['queue_wait'], 0.0) for s in ok]),
+        'error_messages': error_counts
+    }
+
+
+def write_html_report(report, path):
+    """Render the report as a small standalone HTML page."""
+    rows = []
+    for section in ['ttfb', 'latency', 'end_to_end', 'queue_wait']:
+        values = report[section]
+        cells = "".join(f"<td>{values.get(name, '-')}</td>"
+                        for name in ['p50_ms', 'p90_ms', 'p95_ms', 'p99_ms', 'max_ms'])
+        rows.append(f"<tr><th>{section}</th>{cells}</tr>")
+
+    settings = "".join(f"<li><b>{html.escape(str(key))}</b>: {html.escape(str(value))}</li>"
+                       for key, value in report['settings'].items())
+    errors = "".join(f"<li>{count} × {html.escape(message)}</li>"
+                     for message, count in report['error_messages'].items()) or "<li>none</li>"
+
+    page = f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>CrediTrust load test</title>
+<style>body{{font-family:'Segoe UI',sans-serif;margin:2rem}}table{{border-collapse:collapse}}
+td,th{{border:1px solid #ccc;padding:.4rem .8rem;text-align:right}}</style></head>
+<body>
+<h1>CrediTrust chat service load test</h1>
+<p>{report['created_at']}</p>
+<h2>Settings</h2><ul>{settings}</ul>
+<h2>Summary</h2>
+<ul>
+<li>Requests: {report['requests']} ({report['successes']} ok, {report['errors']} errors)</li>
+<li>Error rate: {report['error_rate']:.2%}</li>
+<li>Throughput: {report['throughput_rps']} requests/s over {report['wall_time_s']}s</li>
+</ul>
+<h2>Latency (ms)</h2>
+<table><tr><th></th><th>p50</th><th>p90</th><th>p95</th><th>p99</th><th>max</th></tr>
+{''.join(rows)}</table>
+<h2>Errors</h2><ul>{errors}</ul>
+</body></html>
+"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(page)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for the complaint chat service")
+    parser.add_argument('--questions', help="Question corpus (.jsonl, .csv or .txt); defaults to the sample questions")
+    parser.add_argument('--http-url', help="POST questions to this endpoint instead of calling the handler in process")
+    parser.add_argument('--http-field', default='question', help="JSON field used for the question")
+    parser.add_argument('--concurrency', type=int, default=4, help="Maximum requests in flight")
+    parser.add_argument('--rate', type=float, help="Poisson arrival rate in requests/s (open loop)")
+    parser.add_argument('--requests', type=int, help="Total requests to send")
+    parser.add_argument('--duration', type=float, help="Seconds to run for")
+    parser.add_argument('--stub-generator', action='store_true', help="Replace the LLM with a canned answer")
+    parser.add_argument('--stub-delay', type=float, default=0.0, help="Seconds the stub generator sleeps")
+    parser.add_argument('--mode', default='rag', choices=['rag', 'generative', 'extractive'],
+                        help="Answer mode for the in-process target ('generative' allows cube/topic answers)")
+    parser.add_argument('--sync-handler', action='store_true',
+                        help="Call the blocking chat_with_rag instead of chat_with_rag_async")
+    parser.add_argument('--output', default='reports/load_test', help="Report path prefix (.json and .html are added)")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed for arrivals")
+    args = parser.parse_args()
+
+    if args.requests is None and args.duration is None:
+        args.requests = 50
+
+    if args.questions:
+        from batch_evaluation import load_questions
+        questions = [q['question'] for q in load_questions(args.questions)]
+    else:
+        from rag_pipeline import create_evaluation_questions
+        questions = create_evaluation_questions()
+
+    print("🚀 CrediTrust Load Test")
+    print("=" * 50)
+
+    if args.http_url:
+        if args.stub_generator:
+            print("⚠️ --stub-generator only applies to the in-process target; start the server in stub mode instead")
+        target = HttpTarget(args.http_url, args.http_field)
+    else:
+        print("🔧 Initializing chat interface...")
+        try:
+            target = InProcessTarget(args.stub_generator, args.stub_delay, args.mode,
+                                     use_async=not args.sync_handler)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+
+    loop = f"open loop at {args.rate}/s" if args.rate else "closed loop"
+    print(f"📈 {loop}, concurrency {args.concurrency}, {len(questions)} distinct questions")
+
+    generator = LoadGenerator(target, questions, args.concurrency, args.rate, args.seed)
+    wall_time = generator.run(args.requests, args.duration)
+
+    settings = {
+        'target': args.http_url or ('in-process chat_with_rag' if args.sync_handler
+                                    else 'in-process chat_with_rag_async'),
+        'mode': args.mode,
+        'concurrency': args.concurrency,
+        'rate': args.rate,
+        'requests': args.requests,
+        'duration': args.duration,
+        'stub_generator': args.stub_generator,
+        'stub_delay': args.stub_delay
+    }
+    report = build_report(generator.samples, wall_time, settings)
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output + '.json', 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    write_html_report(report, args.output + '.html')
+
+    print(f"\n✅ {report['successes']}/{report['requests']} requests succeeded "
+          f"({report['error_rate']:.1%} errors), {report['throughput_rps']} requests/s")
+    print(f"   latency p50={report['latency'].get('p50_ms')}ms p95={report['latency'].get('p95_ms')}ms "
+          f"p99={report['latency'].get('p99_ms')}ms")
+    print(f"💾 Reports saved to {args.output}.json and {args.output}.html")
+
+
+if __name__ == "__main__":
+    main()
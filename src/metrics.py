@@ -0,0 +1,184 @@
+"""
+Lightweight in-process metrics for the RAG pipeline.
+Counters and histograms are kept in a registry that renders the Prometheus
+text exposition format, and can be served from the running app on /metrics
+without any extra dependency.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds; covers sub-millisecond cache hits up to very slow CPU generations
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (8, 16, 32, 64, 128, 256, 512, 1024, 2048)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    parts = ",".join(f'{key}="{value}"' for key, value in labels)
+    return "{" + parts + "}"
+
+
+def _label_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        """Monotonic counter, optionally split by labels."""
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, labels=None):
+        """Increase the counter."""
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, labels=None):
+        """Current value for one label set."""
+        return self._values.get(_label_key(labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        """Cumulative-bucket histogram, optionally split by labels."""
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=None):
+        """Record one observation."""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+                self._series[key] = series
+            series['counts'][bisect.bisect_left(self.buckets, value)] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def count(self, labels=None):
+        """Number of observations for one label set."""
+        series = self._series.get(_label_key(labels))
+        return series['count'] if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, series['counts']):
+                    cumulative += bucket_count
+                    bucket_labels = key + (('le', repr(float(bound))),)
+                    lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+                inf_labels = key + (('le', '+Inf'),)
+                lines.append(f"{self.name}_bucket{_format_labels(inf_labels)} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series['sum']}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """Holds named metrics; asking for an existing name returns the same metric."""
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name, factory):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = factory()
+            return self._metrics[name]
+
+    def counter(self, name, help_text):
+        return self._get_or_create(name, lambda: Counter(name, help_text))
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(name, lambda: Histogram(name, help_text, buckets))
+
+    def render_prometheus(self):
+        """Render every metric in the Prometheus text format."""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+class StageTimings:
+    def __init__(self):
+        """Collects wall-clock seconds per named stage of one request."""
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block and add it to the named stage."""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start_time)
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def as_dict(self):
+        """Stage timings rounded to microseconds."""
+        return {name: round(seconds, 6) for name, seconds in self.stages.items()}
+
+
+def start_metrics_server(port=9100, host='127.0.0.1', registry=REGISTRY):
+    """
+    Serve the registry on http://host:port/metrics from a daemon thread.
+
+    Args:
+        port: Port to listen on
+        host: Interface to bind; loopback by default, since the metrics are
+            unauthenticated (pass '0.0.0.0' to let a remote Prometheus scrape)
+        registry: Registry to expose
+
+    Returns:
+        The running ThreadingHTTPServer
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes every few seconds would otherwise flood the console
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Stage-level micro-benchmarks with baseline regression comparison.
+Runs the hot functions of the RAG system against a small synthetic vector
+store (no real complaint data needed), stores the timings as JSON and compares
+two result files, flagging slowdowns beyond a noise threshold.
+
+Usage:
+    python src/microbench.py run --output benchmarks/results/latest.json
+    python src/microbench.py run --skip-llm --only encode search
+    python src/microbench.py compare benchmarks/baselines/main.json benchmarks/results/latest.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import faiss
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(__file__))
+
+from rag_pipeline import RAGPipeline
+from snapshots import VectorStoreSnapshot
+from diversity import diversify_hits
+from vector_stores import FaissVectorStore
+from chunking_embedding import create_splitter, chunk_complaints
+from synthetic_data import PRODUCT_MIX, SyntheticComplaintGenerator
+
+PRODUCTS = list(PRODUCT_MIX)
+
+
+def synthetic_narratives(count, seed=42, median_words=180):
+    """Deterministic synthetic narratives with a long-tailed length distribution."""
+    generator = SyntheticComplaintGenerator(seed, median_words=median_words)
+    return generator.complaints(count)['Consumer complaint narrative'].tolist()
+
+
+def build_synthetic_store(num_vectors=20000, dimension=384, seed=42):
+    """
+    Build an in-memory flat index and matching metadata.
+
+    Returns:
+        Tuple of (index, metadata DataFrame)
+    """
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((num_vectors, dimension)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    index = faiss.IndexFlatL2(dimension)
+    index.add(vectors)
+
+    texts = synthetic_narratives(min(num_vectors, 2000), seed)
+    metadata = pd.DataFrame({
+        'complaint_id': np.arange(num_vectors) // 2 + 1000000,
+        'product': [PRODUCTS[i % len(PRODUCTS)] for i in range(num_vectors)],
+        'chunk': [texts[i % len(texts)] for i in range(num_vectors)]
+    })
+    return index, metadata
+
+
+def time_call(fn, repeat=20, warmup=2):
+    """
+    Time repeated calls of fn.
+
+    Returns:
+        Dictionary of per-call statistics in milliseconds
+    """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start_time) * 1000)
+
+    samples = np.asarray(samples)
+    return {
+        'repeat': repeat,
+        'min_ms': round(float(samples.min()), 4),
+        'median_ms': round(float(np.median(samples)), 4),
+        'p95_ms': round(float(np.percentile(samples, 95)), 4),
+        'mean_ms': round(float(samples.mean()), 4)
+    }
+
+
+def environment_info():
+    """Machine and library versions recorded next to every result file."""
+    info = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'faiss': faiss.__version__,
+        'numpy': np.__version__
+    }
+    try:
+        import torch
+        info['torch'] = torch.__version__
+        info['torch_threads'] = torch.get_num_threads()
+    except ImportError:
+        pass
+    return info
+
+
+def run_benchmarks(only=None, skip_llm=False, repeat=20, num_vectors=20000,
+                   generation_tokens=32, seed=42):
+    """
+    Run the benchmark suite.
+
+    Args:
+        only: Optional list of name prefixes to run
+        skip_llm: Skip loading DialoGPT and the generate_answer benchmark
+        repeat: Timed repetitions per benchmark
+        num_vectors: Size of the synthetic vector store
+        generation_tokens: Fixed number of tokens per generate_answer call
+        seed: Seed for synthetic data and generation
+
+    Returns:
+        Dictionary mapping benchmark name to timing statistics
+    """
+    # RAGPipeline memory-maps the store it loads, so its directory has to
+    # outlive every benchmark that uses the pipeline
+    with tempfile.TemporaryDirectory() as store_dir:
+        return _run_benchmarks(store_dir, only, skip_llm, repeat, num_vectors, generation_tokens, seed)
+
+
+def _run_benchmarks(store_dir, only, skip_llm, repeat, num_vectors, generation_tokens, seed):
+    """run_benchmarks() with the synthetic store written to store_dir when the LLM is benchmarked."""
+    def selected(name):
+        return not only or any(name.startswith(prefix) for prefix in only)
+
+    index, metadata = build_synthetic_store(num_vectors, seed=seed)
+    queries = synthetic_narratives(256, seed + 1, median_words=12)
+    results = {}
+
+    generation_name = f"generate_answer_{generation_tokens}tok"
+    encoder_names = ['encode_bs1', 'encode_bs32', 'encode_bs256', 'search_k5', 'search_k50',
+                     'metadata_gather_k5', 'metadata_gather_k50', 'search_k20', 'diversify_k5']
+
+    rag = encoder = query_embedding = None
+    if not skip_llm and selected(generation_name):
+        # RAGPipeline loads from disk, so write the synthetic store to the temp dir
+        faiss.write_index(index, os.path.join(store_dir, 'faiss_index.bin'))
+        metadata.to_csv(os.path.join(store_dir, 'metadata.csv'), index=False)
+        rag = RAGPipeline(vector_store_path=store_dir)
+        encoder = rag.embedding_model
+    elif any(selected(name) for name in encoder_names):
+        from sentence_transformers import SentenceTransformer
+        encoder = SentenceTransformer('all-MiniLM-L6-v2')
+
+    for batch_size in [1, 32, 256]:
+        name = f"encode_bs{batch_size}"
+        if selected(name):
+            batch = queries[:batch_size]
+            results[name] = time_call(lambda: encoder.encode(batch, batch_size=batch_size),
+                                      repeat=max(3, repeat // (1 + batch_size // 32)))
+
+    if encoder is not None:
+        query_embedding = np.asarray(encoder.encode(queries[:1]), dtype=np.float32)
+
+    for k in [5, 50]:
+        if selected(f"search_k{k}"):
+            results[f"search_k{k}"] = time_call(lambda: index.search(query_embedding, k), repeat)
+
+        if selected(f"metadata_gather_k{k}"):
+            distances, indices = index.search(query_embedding, k)
+            store = VectorStoreSnapshot(index, metadata)
+            results[f"metadata_gather_k{k}"] = time_call(
+                lambda: store.chunks_from_hits(distances[0], indices[0]), repeat)
+
+    if selected('search_k20'):
+        results['search_k20'] = time_call(lambda: index.search(query_embedding, 20), repeat)
+
+    if selected('diversify_k5'):
+        # Post-stage cost on top of search_k20: collapse 20 candidates by complaint, MMR down to 5
+        store = VectorStoreSnapshot(FaissVectorStore(metadata=metadata, index=index), metadata)
+        vectors = store.vector_lookup()
+        distances, indices = index.search(query_embedding, 20)
+        results['diversify_k5'] = time_call(
+            lambda: diversify_hits(query_embedding, distances, indices, store.complaint_ids, vectors, 5), repeat)
+
+    if selected('create_prompt'):
+        chunks = [{'text': text, 'complaint_id': 1000000 + i, 'product': PRODUCTS[i % len(PRODUCTS)]}
+                  for i, text in enumerate(synthetic_narratives(5, seed + 2))]
+        results['create_prompt'] = time_call(
+            lambda: RAGPipeline.create_prompt(queries[0], chunks), repeat * 10)
+
+    if selected('chunker'):
+        df = pd.DataFrame({
+            'Complaint ID': np.arange(200),
+            'Product': [PRODUCTS[i % len(PRODUCTS)] for i in range(200)],
+            'Consumer complaint narrative': synthetic_narratives(200, seed + 3, median_words=400)
+        })
+        splitter = create_splitter()
+        results['chunker_200_narratives'] = time_call(lambda: chunk_complaints(df, splitter),
+                                                      max(3, repeat // 4))
+
+    if rag is not None:
+        from transformers import set_seed
+        chunks = rag.store.chunks_from_hits(*[a[0] for a in index.search(query_embedding, 5)])
+        prompt = rag.create_prompt(queries[0], chunks)
+
+        def generate():
+            set_seed(seed)
+            rag.generate_answer(prompt, max_new_tokens=generation_tokens,
+                                min_new_tokens=generation_tokens)
+
+        result = time_call(generate, repeat=max(3, repeat // 4), warmup=1)
+        result['tokens_per_s'] = round(generation_tokens / (result['median_ms'] / 1000), 2)
+        results[generation_name] = result
+
+    return results
+
+
+def compare_results(baseline, current, threshold=0.10):
+    """
+    Compare median timings of two result files.
+
+    Args:
+        baseline: Baseline result dictionary
+        current: Current result dictionary
+        threshold: Relative slowdown tolerated as noise (0.10 = 10%)
+
+    Returns:
+        List of benchmark names that regressed
+    """
+    regressions = []
+    print(f"{'benchmark':<32}{'baseline ms':>14}{'current ms':>14}{'change':>10}")
+    for name, result in sorted(current['results'].items()):
+        old = baseline['results'].get(name)
+        if old is None:
+            print(f"{name:<32}{'-':>14}{result['median_ms']:>14.3f}{'new':>10}")
+            continue
+
+        change = result['median_ms'] / old['median_ms'] - 1 if old['median_ms'] else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  ❌ REGRESSION'
+            regressions.append(name)
+        elif change < -threshold:
+            flag = '  ✅ faster'
+        print(f"{name:<32}{old['median_ms']:>14.3f}{result['median_ms']:>14.3f}{change:>+10.1%}{flag}")
+
+    if baseline.get('environment') != current.get('environment'):
+        print("\n⚠️ Environments differ; comparisons across machines are only indicative.")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG stage micro-benchmarks")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="Run the benchmark suite")
+    run_parser.add_argument('--output', default='benchmarks/results/latest.json', help="Result file")
+    run_parser.add_argument('--only', nargs='+', help="Only run benchmarks whose names start with these prefixes")
+    run_parser.add_argument('--skip-llm', action='store_true', help="Skip the generate_answer benchmark")
+    run_parser.add_argument('--repeat', type=int, default=20, help="Timed repetitions per benchmark")
+    run_parser.add_argument('--num-vectors', type=int, default=20000, help="Synthetic vector store size")
+    run_parser.add_argument('--generation-tokens', type=int, default=32, help="Tokens per generate_answer call")
+    run_parser.add_argument('--seed', type=int, default=42, help="Random seed")
+
+    compare_parser = subparsers.add_parser('compare', help="Compare a result file against a baseline")
+    compare_parser.add_argument('baseline', help="Baseline result file")
+    compare_parser.add_argument('current', help="Current result file")
+    compare_parser.add_argument('--threshold', type=float, default=0.10, help="Relative noise threshold")
+
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        results = run_benchmarks(args.only, args.skip_llm, args.repeat, args.num_vectors,
+                                 args.generation_tokens, args.seed)
+        report = {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'environment': environment_info(),
+            'settings': {'num_vectors': args.num_vectors, 'repeat': args.repeat,
+                         'generation_tokens': args.generation_tokens, 'seed': args.seed},
+            'results': results
+        }
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+        for name, result in sorted(results.items()):
+            print(f"{name:<32} median {result['median_ms']:>10.3f} ms   p95 {result['p95_ms']:>10.3f} ms")
+        print(f"\n💾 Results saved to {args.output}")
+
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        regressions = compare_results(baseline, current, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"\n✅ No regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+"""
+Cached, content-addressed runner for the build pipeline.
+
+    preprocess -> chunk -> embed -> index  --+
+        |                    \               |
+        +-> cube              +-> topics ----+-> publish -> evaluate
+
+Each stage declares its input and output files. Its fingerprint hashes the
+input contents, its parameters, the source of its stage function and the
+modules it calls. A stage is skipped when its fingerprint and the hashes of
+its outputs match the last successful run. Because downstream fingerprints
+hash upstream outputs, a stage that re-runs but produces identical files
+does not invalidate the stages after it. Ready stages run concurrently, each
+in its own process; every run appends per-stage wall time and peak memory
+(ru_maxrss from os.wait4) to reports/pipeline_runs.jsonl.
+
+All paths are relative to the repository root. File hashes are memoized by
+size and mtime in .pipeline/, so unchanged multi-GB inputs are not re-read.
+
+Usage:
+    python run_tasks.py                                # run what is stale
+    python run_tasks.py --status                       # show what would run
+    python run_tasks.py --chunk-size 300 --until index # stages up to the index only
+    python run_tasks.py --force embed --jobs 3
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATE_DIR = '.pipeline'
+STATE_FILE = os.path.join(STATE_DIR, 'state.json')
+HASH_MEMO_FILE = os.path.join(STATE_DIR, 'file_hashes.json')
+LOG_DIR = os.path.join(STATE_DIR, 'logs')
+RUN_LOG = 'reports/pipeline_runs.jsonl'
+
+RAW_FILE = 'data/raw/complaints.csv'
+FILTERED_FILE = 'data/processed/filtered_complaints.csv'
+CHUNKS_FILE = 'data/processed/complaint_chunks.csv'
+EMBEDDINGS_FILE = 'data/processed/chunk_embeddings.npy'
+BUILD_DIR = 'build'
+INDEX_DIR = os.path.join(BUILD_DIR, 'index')
+CUBE_OUTPUT = os.path.join(BUILD_DIR, 'cube', 'complaint_cube.parquet')
+TOPICS_DIR = os.path.join(BUILD_DIR, 'topics')
+VECTOR_STORE_ROOT = 'vector_store'
+CURRENT_OUTPUT = os.path.join(VECTOR_STORE_ROOT, 'CURRENT')
+EVALUATION_FILE = 'reports/evaluation_results.csv'
+EMBEDDING_CACHE = 'cache/embeddings'
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+DONE = ('ran', 'skipped', 'kept')
+
+
+def run_preprocess():
+    from preprocessing import preprocess_complaints
+    written = preprocess_complaints(RAW_FILE, FILTERED_FILE)
+    print(f"Wrote {written:,} complaints to {FILTERED_FILE}")
+
+
+def run_chunk(chunk_size, chunk_overlap):
+    import pandas as pd
+    from chunking_embedding import chunk_complaints, create_splitter
+    df_chunks = chunk_complaints(pd.read_csv(FILTERED_FILE), create_splitter(chunk_size, chunk_overlap))
+    df_chunks.to_csv(CHUNKS_FILE, index=False)
+    print(f"Created {len(df_chunks):,} chunks")
+
+
+def run_embed(model_name):
+    import numpy as np
+    import pandas as pd
+    from sentence_transformers import SentenceTransformer
+    from embedding_cache import encode_with_cache
+    chunks = pd.read_csv(CHUNKS_FILE)['chunk'].tolist()
+    embeddings, stats = encode_with_cache(SentenceTransformer(model_name), model_name, chunks, EMBEDDING_CACHE)
+    np.save(EMBEDDINGS_FILE, embeddings)
+    print(f"Embedded {len(embeddings):,} chunks, cache hit rate {stats['hit_rate']:.1%}")
+
+
+def run_index(backend, reduce_dim, reduce_method):
+    import numpy as np
+    import pandas as pd
+    from index_compression import build_index, train_transform
+    from time_shards import METADATA_COLUMNS, write_time_partitioned_store
+    from vector_stores import FaissVectorStore, write_vector_store
+    df_chunks = pd.read_csv(CHUNKS_FILE)
+    embeddings = np.load(EMBEDDINGS_FILE)
+    metadata = df_chunks[[c for c in METADATA_COLUMNS if c in df_chunks.columns]]
+
+    # Start from an empty directory so files of another backend do not linger
+    shutil.rmtree(INDEX_DIR, ignore_errors=True)
+    transform = train_transform(embeddings, reduce_dim, reduce_method) if reduce_dim else None
+    if backend != 'faiss':
+        write_vector_store(backend, embeddings, metadata, INDEX_DIR)
+    elif 'date_received' in metadata.columns:
+        write_time_partitioned_store(embeddings, metadata, INDEX_DIR, transform)
+    else:
+        FaissVectorStore(metadata=metadata, index=build_index(embeddings, transform)).persist(INDEX_DIR)
+    print(f"Built {backend} store with {len(embeddings):,} vectors")
+
+
+def run_cube():
+    from aggregate_cube import build_cube_from_csv, write_cube
+    cube = build_cube_from_csv(FILTERED_FILE)
+    write_cube(cube, CUBE_OUTPUT)
+    print(f"Cube: {len(cube):,} cells")
+
+
+def run_topics(max_clusters, min_cluster_size, seed):
+    import numpy as np
+    import pandas as pd
+    from topic_clusters import build_topics, write_topics
+    shutil.rmtree(TOPICS_DIR, ignore_errors=True)
+    centroids, clusters = build_topics(np.load(EMBEDDINGS_FILE, mmap_mode='r'), pd.read_csv(CHUNKS_FILE),
+                                       max_clusters, min_cluster_size, seed=seed)
+    write_topics(centroids, clusters, TOPICS_DIR)
+    print(f"Wrote {len(clusters)} topic clusters")
+
+
+def run_publish(keep):
+    from snapshots import publish_snapshot
+    staging = os.path.join(BUILD_DIR, 'release')
+    shutil.rmtree(staging, ignore_errors=True)
+    # Hard links, so the snapshot copy is the only full copy of the index
+    shutil.copytree(INDEX_DIR, staging, copy_function=os.link)
+    os.link(CUBE_OUTPUT, os.path.join(staging, os.path.basename(CUBE_OUTPUT)))
+    for name in os.listdir(TOPICS_DIR):
+        os.link(os.path.join(TOPICS_DIR, name), os.path.join(staging, name))
+    version = publish_snapshot(VECTOR_STORE_ROOT, source_dir=staging, keep=keep)
+    shutil.rmtree(staging)
+    print(f"Published vector store snapshot {version}")
+
+
+def run_evaluate():
+    from evaluation import RAGEvaluator
+    from inference_client import load_pipeline
+    evaluator = RAGEvaluator(load_pipeline(f"{VECTOR_STORE_ROOT}/"))
+    evaluator.run_evaluation()
+    evaluator.generate_evaluation_report(EVALUATION_FILE)
+
+
+class Stage:
+    def __init__(self, name, run, inputs, outputs, params=None, code=()):
+        """
+        One pipeline step, executed as run(**params) in a child process.
+
+        Args:
+            name: Stage name
+            run: Stage function of this module
+            inputs: Files or directories read (their producers become dependencies)
+            outputs: Files or directories written
+            params: Keyword arguments of run, part of the fingerprint
+            code: Source files whose changes invalidate the stage
+        """
+        self.name = name
+        self.run = run
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = params or {}
+        self.code = list(code)
+        self.deps = []
+
+
+def build_stages(config):
+    """
+    The pipeline DAG in topological order.
+
+    Args:
+        config: Parameter dictionary from the command line
+
+    Returns:
+        List of Stage objects with dependencies resolved from their inputs
+    """
+    stages = [
+        Stage('preprocess', run_preprocess, [RAW_FILE], [FILTERED_FILE], code=['src/preprocessing.py']),
+        Stage('chunk', run_chunk, [FILTERED_FILE], [CHUNKS_FILE],
+              {'chunk_size': config['chunk_size'], 'chunk_overlap': config['chunk_overlap']},
+              code=['src/chunking_embedding.py', 'src/time_shards.py']),
+        Stage('cube', run_cube, [FILTERED_FILE], [CUBE_OUTPUT], code=['src/aggregate_cube.py']),
+        Stage('embed', run_embed, [CHUNKS_FILE], [EMBEDDINGS_FILE], {'model_name': config['model_name']},
+              code=['src/embedding_cache.py']),
+        Stage('index', run_index, [CHUNKS_FILE, EMBEDDINGS_FILE], [INDEX_DIR],
+              {'backend': config['backend'], 'reduce_dim': config['reduce_dim'],
+               'reduce_method': config['reduce_method']},
+              code=['src/vector_stores.py', 'src/time_shards.py', 'src/index_compression.py', 'src/index_io.py']),
+        Stage('topics', run_topics, [CHUNKS_FILE, EMBEDDINGS_FILE], [TOPICS_DIR],
+              {'max_clusters': config['max_clusters'], 'min_cluster_size': config['min_cluster_size'],
+               'seed': config['seed']},
+              code=['src/topic_clusters.py']),
+        Stage('publish', run_publish, [INDEX_DIR, CUBE_OUTPUT, TOPICS_DIR], [CURRENT_OUTPUT],
+              {'keep': config['keep_snapshots']}, code=['src/snapshots.py']),
+        Stage('evaluate', run_evaluate, [CURRENT_OUTPUT], [EVALUATION_FILE],
+              code=['src/evaluation.py', 'src/rag_pipeline.py', 'src/inference_client.py'])
+    ]
+    producers = {output: stage.name for stage in stages for output in stage.outputs}
+    for stage in stages:
+        stage.deps = sorted({producers[path] for path in stage.inputs if path in producers})
+    return stages
+
+
+class FileHasher:
+    def __init__(self, memo_file=HASH_MEMO_FILE):
+        """
+        SHA-256 of files and directories, memoized by (size, mtime).
+
+        Args:
+            memo_file: JSON file keeping digests between runs
+        """
+        self.memo_file = memo_file
+        self.memo = {}
+        if os.path.exists(memo_file):
+            with open(memo_file) as f:
+                self.memo = json.load(f)
+
+    def _file_digest(self, path):
+        stat = os.stat(path)
+        key = [stat.st_size, stat.st_mtime_ns]
+        memo = self.memo.get(path)
+        if memo and memo[:2] == key:
+            return memo[2]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        self.memo[path] = key + [digest.hexdigest()]
+        return digest.hexdigest()
+
+    def hash(self, path):
+        """Content hash of a file or directory tree, None if it does not exist."""
+        if os.path.isfile(path):
+            return self._file_digest(path)
+        if not os.path.isdir(path):
+            return None
+        digest = hashlib.sha256()
+        for directory, subdirectories, names in sorted(os.walk(path)):
+            subdirectories.sort()
+            for name in sorted(names):
+                file_path = os.path.join(directory, name)
+                digest.update(f"{os.path.relpath(file_path, path)}\0{self._file_digest(file_path)}\n".encode('utf-8'))
+        return digest.hexdigest()
+
+    def save(self):
+        _write_json(self.memo_file, self.memo)
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_file = f"{path}.tmp"
+    with open(temp_file, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(temp_file, path)
+
+
+def fingerprint(stage, hasher):
+    """
+    Hash of everything a stage's outputs depend on.
+
+    Returns:
+        Hex digest, or None if an input is missing
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps({'stage': stage.name, 'params': stage.params,
+                              'function': inspect.getsource(stage.run)}, sort_keys=True).encode('utf-8'))
+    for path in stage.inputs + stage.code:
+        content_hash = hasher.hash(path)
+        if content_hash is None and path in stage.inputs:
+            return None
+        digest.update(f"{path}\0{content_hash}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def output_hashes(stage, hasher):
+    return {path: hasher.hash(path) for path in stage.outputs}
+
+
+def check_stage(stage, state, hasher, force=False):
+    """
+    Decide whether a stage has to run.
+
+    Returns:
+        (decision, fingerprint) where decision is 'run', 'skip', 'keep' (inputs
+        are missing but earlier outputs exist and are used as they are) or
+        'missing' (inputs and outputs are missing)
+    """
+    stage_fingerprint = fingerprint(stage, hasher)
+    outputs = output_hashes(stage, hasher)
+    if stage_fingerprint is None:
+        return ('keep' if all(outputs.values()) else 'missing'), None
+    record = state.get(stage.name)
+    if (not force and record and record['fingerprint'] == stage_fingerprint
+            and all(outputs.values()) and record['outputs'] == outputs):
+        return 'skip', stage_fingerprint
+    return 'run', stage_fingerprint
+
+
+def select_stages(stages, targets):
+    """The targets and every stage they depend on, in topological order."""
+    if not targets:
+        return stages
+    by_name = {stage.name: stage for stage in stages}
+    needed, queue = set(), list(targets)
+    while queue:
+        name = queue.pop()
+        if name not in needed:
+            needed.add(name)
+            queue.extend(by_name[name].deps)
+    return [stage for stage in stages if stage.name in needed]
+
+
+def _launch(stage, config):
+    os.makedirs(LOG_DIR, exist_ok=True)
+    log_file = os.path.join(LOG_DIR, f"{stage.name}.log")
+    with open(log_file, 'w') as log:
+        process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--run-stage', stage.name, '--config', json.dumps(config)],
+            stdout=log, stderr=subprocess.STDOUT, env=dict(os.environ, PYTHONUNBUFFERED='1'))
+    return process, log_file
+
+
+def run_pipeline(config, jobs=2, force=(), targets=None, status_only=False):
+    """
+    Run the stale stages of the DAG, independent ones concurrently.
+
+    Args:
+        config: Parameter dictionary (see build_stages)
+        jobs: Stages running at the same time
+        force: Stage names to run even if up to date
+        targets: Stage names to build (with their dependencies); None builds all
+        status_only: Only report what would run
+
+    Returns:
+        Run record with the status, wall time and peak memory of every stage
+    """
+    stages = select_stages(build_stages(config), targets)
+    state = {}
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE) as f:
+            state = json.load(f)
+    hasher = FileHasher()
+
+    results = {stage.name: {'status': 'pending'} for stage in stages}
+    pending = list(stages)
+    running = {}
+    run_start = time.time()
+
+    while pending or running:
+        for stage in list(pending):
+            dep_status = [results[dep]['status'] for dep in stage.deps if dep in results]
+            if any(status in ('failed', 'blocked', 'stale') for status in dep_status):
+                # With --status, stale upstream outputs may change, so dependents would run too
+                results[stage.name]['status'] = 'stale' if status_only and 'stale' in dep_status else 'blocked'
+                pending.remove(stage)
+                continue
+            if not all(status in DONE for status in dep_status) or len(running) >= jobs:
+                continue
+            pending.remove(stage)
+
+            decision, stage_fingerprint = check_stage(stage, state, hasher, stage.name in force)
+            if decision == 'skip':
+                results[stage.name]['status'] = 'skipped'
+            elif decision == 'keep':
+                results[stage.name].update(status='kept', note="inputs missing, using existing outputs")
+            elif decision == 'missing':
+                missing = [path for path in stage.inputs if not os.path.exists(path)]
+                results[stage.name].update(status='failed', note=f"missing inputs: {', '.join(missing)}")
+                print(f"❌ {stage.name}: missing {', '.join(missing)}")
+            elif status_only:
+                results[stage.name]['status'] = 'stale'
+            else:
+                process, log_file = _launch(stage, config)
+                running[process.pid] = (stage, process, stage_fingerprint, time.time(), log_file)
+                print(f"🔄 {stage.name} started (log: {log_file})")
+
+        if not running:
+            continue
+
+        pid, wait_status, usage = os.wait4(-1, 0)
+        if pid not in running:
+            continue
+        stage, process, stage_fingerprint, start_time, log_file = running.pop(pid)
+        process.returncode = os.waitstatus_to_exitcode(wait_status)
+        result = results[stage.name]
+        result.update({
+            'wall_seconds': round(time.time() - start_time, 2),
+            # ru_maxrss is in KB on Linux
+            'peak_rss_mb': round(usage.ru_maxrss / 1024, 1),
+            'cpu_seconds': round(usage.ru_utime + usage.ru_stime, 2),
+            'log': log_file
+        })
+        if process.returncode == 0:
+            result['status'] = 'ran'
+            state[stage.name] = {
+                'fingerprint': stage_fingerprint,
+                'outputs': output_hashes(stage, hasher),
+                'finished_at': datetime.now().isoformat(timespec='seconds')
+            }
+            _write_json(STATE_FILE, state)
+            print(f"✅ {stage.name} finished in {result['wall_seconds']:.1f}s (peak {result['peak_rss_mb']:.0f} MB)")
+        else:
+            result['status'] = 'failed'
+            print(f"❌ {stage.name} failed with exit code {process.returncode}, see {log_file}")
+            with open(log_file) as f:
+                print(f.read()[-1000:])
+
+    hasher.save()
+    return {
+        'started_at': datetime.fromtimestamp(run_start).isoformat(timespec='seconds'),
+        'wall_seconds': round(time.time() - run_start, 2),
+        'jobs': jobs,
+        'config': config,
+        'stages': results
+    }
+
+
+def _run_stage(name, config):
+    """Child process entry point: run one stage function."""
+    stage = next(stage for stage in build_stages(config) if stage.name == name)
+    for path in stage.outputs:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    stage.run(**stage.params)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the stale stages of the complaint pipeline")
+    parser.add_argument('--until', nargs='+', metavar='STAGE', help="Only build these stages and their dependencies")
+    parser.add_argument('--force', nargs='+', default=[], metavar='STAGE', help="Run these stages even if up to date")
+    parser.add_argument('--jobs', type=int, default=2, help="Stages running at the same time")
+    parser.add_argument('--status', action='store_true', help="Only show which stages are stale")
+    parser.add_argument('--chunk-size', type=int, default=500, help="Words per chunk")
+    parser.add_argument('--chunk-overlap', type=int, default=50, help="Words shared by consecutive chunks")
+    parser.add_argument('--model-name', default=MODEL_NAME, help="Sentence transformer for the embeddings")
+    parser.add_argument('--backend', choices=['faiss', 'chroma', 'numpy'], default='faiss', help="Vector store backend")
+    parser.add_argument('--reduce-dim', type=int, default=0, help="Store vectors reduced to this many dimensions")
+    parser.add_argument('--reduce-method', choices=['pca', 'opq'], default='pca', help="Transform for --reduce-dim")
+    parser.add_argument('--max-clusters', type=int, default=20, help="Upper bound on topic clusters per product")
+    parser.add_argument('--min-cluster-size', type=int, default=20, help="Smaller topic clusters are dropped")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed for the topic clusters")
+    parser.add_argument('--keep-snapshots', type=int, default=3, help="Vector store snapshots kept after publishing")
+    parser.add_argument('--app', action='store_true', help="Launch the Gradio app once the pipeline succeeds")
+    parser.add_argument('--run-stage', help=argparse.SUPPRESS)
+    parser.add_argument('--config', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    if args.run_stage:
+        _run_stage(args.run_stage, json.loads(args.config))
+        return
+
+    if args.backend != 'faiss' and args.reduce_dim:
+        parser.error("--reduce-dim needs the faiss backend")
+    config = {
+        'chunk_size': args.chunk_size,
+        'chunk_overlap': args.chunk_overlap,
+        'model_name': args.model_name,
+        'backend': args.backend,
+        'reduce_dim': args.reduce_dim,
+        'reduce_method': args.reduce_method,
+        'max_clusters': args.max_clusters,
+        'min_cluster_size': args.min_cluster_size,
+        'seed': args.seed,
+        'keep_snapshots': args.keep_snapshots
+    }
+    names = [stage.name for stage in build_stages(config)]
+    for name in (args.until or []) + args.force:
+        if name not in names:
+            parser.error(f"unknown stage {name!r} (stages: {', '.join(names)})")
+
+    print("🚀 CrediTrust pipeline" + (" status" if args.status else ""))
+    run = run_pipeline(config, args.jobs, set(args.force), args.until, status_only=args.status)
+
+    print("\n📊 Stages:")
+    for name, result in run['stages'].items():
+        timing = (f" {result['wall_seconds']:.1f}s, peak {result['peak_rss_mb']:.0f} MB"
+                  if 'wall_seconds' in result else "")
+        note = f" ({result['note']})" if 'note' in result else ""
+        print(f"   {name:<11} {result['status']}{timing}{note}")
+    if args.status:
+        return
+
+    from jsonl_store import JsonlResultWriter
+    with JsonlResultWriter(RUN_LOG) as writer:
+        writer.write(run)
+    print(f"💾 Run logged to {RUN_LOG} ({run['wall_seconds']:.1f}s total)")
+
+    failed = [name for name, result in run['stages'].items() if result['status'] in ('failed', 'blocked')]
+    if failed:
+        print(f"❌ Not built: {', '.join(failed)}")
+        sys.exit(1)
+    if args.app:
+        print("🚀 Starting Gradio interface at http://localhost:7860 (Ctrl+C to stop)")
+        try:
+            subprocess.run([sys.executable, 'app.py'])
+        except KeyboardInterrupt:
+            print("\n🛑 Interface stopped by user.")
+
+
+if __name__ == "__main__":
+    main()
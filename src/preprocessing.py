@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Task 1 preprocessing as a script (the steps of notebooks/eda_preprocessing.ipynb).
+Streams the raw CFPB export, keeps complaints with a narrative in the target
+products, relabels Buy Now, Pay Later complaints, cleans the narratives and
+writes data/processed/filtered_complaints.csv.
+
+Usage:
+    python src/preprocessing.py --input data/raw/complaints.csv --output data/processed/filtered_complaints.csv
+"""
+
+import argparse
+import os
+import re
+import time
+
+import pandas as pd
+
+PRODUCTS = [
+    'Credit card or prepaid card',
+    'Consumer Loan',
+    'Checking or savings account',
+    'Money transfer, virtual currency, or money service'
+]
+
+BNPL_TERMS = ['bnpl', 'installment', 'pay later']
+BOILERPLATE = ['i am writing to file a complaint', 'please help']
+
+
+def clean_narrative(text):
+    """Lowercase, strip punctuation and remove boilerplate phrases."""
+    if not isinstance(text, str):
+        return ''
+    text = text.lower()
+    text = re.sub(r'[^a-z0-9\s]', '', text)
+    for phrase in BOILERPLATE:
+        text = text.replace(phrase, '')
+    return text.strip()
+
+
+def preprocess_frame(df, products=PRODUCTS):
+    """
+    Filter, relabel and clean one block of raw complaints.
+
+    Args:
+        df: Raw complaints with the CFPB export columns
+        products: Products to keep
+
+    Returns:
+        DataFrame of kept complaints with cleaned narratives
+    """
+    df = df[df['Product'].isin(products) & df['Consumer complaint narrative'].notnull()].copy()
+    issues = df['Issue'].fillna('').str.lower()
+    is_bnpl = issues.apply(lambda issue: any(term in issue for term in BNPL_TERMS))
+    df.loc[is_bnpl, 'Product'] = 'Buy Now, Pay Later (BNPL)'
+    df['Consumer complaint narrative'] = df['Consumer complaint narrative'].apply(clean_narrative)
+    return df[df['Consumer complaint narrative'] != '']
+
+
+def preprocess_complaints(input_file, output_file, products=PRODUCTS, chunk_size=10000):
+    """
+    Stream the raw CSV through preprocess_frame() into the filtered CSV.
+
+    The output is written under a temporary name and renamed when complete.
+
+    Args:
+        input_file: Raw CFPB complaints CSV
+        output_file: Filtered complaints CSV
+        products: Products to keep
+        chunk_size: Raw rows read per block
+
+    Returns:
+        Number of complaints written
+    """
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+    temp_file = f"{output_file}.partial"
+    written = 0
+    for block in pd.read_csv(input_file, chunksize=chunk_size, low_memory=False):
+        filtered = preprocess_frame(block, products)
+        if filtered.empty:
+            continue
+        filtered.to_csv(temp_file, mode='w' if written == 0 else 'a', header=written == 0, index=False)
+        written += len(filtered)
+    if written == 0:
+        raise ValueError(f"No complaints in {input_file} matched the target products")
+    os.replace(temp_file, output_file)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Filter and clean the raw CFPB complaints")
+    parser.add_argument('--input', default='data/raw/complaints.csv', help="Raw complaints CSV")
+    parser.add_argument('--output', default='data/processed/filtered_complaints.csv', help="Filtered CSV")
+    args = parser.parse_args()
+
+    print(f"🧹 Preprocessing {args.input}...")
+    start_time = time.time()
+    written = preprocess_complaints(args.input, args.output)
+    print(f"✅ Wrote {written:,} complaints to {args.output} in {time.time() - start_time:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
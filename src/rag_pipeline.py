@@ -1,77 +1,415 @@
-import pandas as pd
 import numpy as np
-import faiss
+import torch
 from sentence_transformers import SentenceTransformer
-from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM
+from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM, StoppingCriteria, StoppingCriteriaList
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+import json
+import logging
 import os
+import re
+import threading
+import time
+import weakref
+
+from metrics import REGISTRY, StageTimings, TOKEN_BUCKETS
+from diversity import diversify_hits
+from snapshots import VectorStoreSnapshot, current_version, gc_snapshots, resolve_store_path
+
+request_logger = logging.getLogger('rag_pipeline.requests')
+
+STAGE_SECONDS = REGISTRY.histogram('rag_stage_seconds', 'Seconds spent in each RAG pipeline stage')
+REQUEST_SECONDS = REGISTRY.histogram('rag_request_seconds', 'End-to-end seconds per answered question')
+PROMPT_TOKENS = REGISTRY.histogram('rag_prompt_tokens', 'Prompt length in tokens', TOKEN_BUCKETS)
+GENERATED_TOKENS = REGISTRY.histogram('rag_generated_tokens', 'Generated answer length in tokens', TOKEN_BUCKETS)
+QUERY_CACHE_LOOKUPS = REGISTRY.counter('rag_query_cache_lookups_total', 'Query embedding cache lookups by result')
+REQUESTS_TOTAL = REGISTRY.counter('rag_requests_total', 'Answered questions by status and answer mode')
+DRAFT_TOKENS = REGISTRY.counter('rag_draft_tokens_total', 'Draft model tokens in assisted generation by outcome')
+BUDGET_OVERRUNS = REGISTRY.counter('rag_budget_overruns_total', 'Requests that ran out of latency budget by stage')
+DEGRADED_RESPONSES = REGISTRY.counter('rag_degraded_responses_total', 'Sources-only responses by reason')
+SNAPSHOT_SWAPS = REGISTRY.counter('rag_snapshot_swaps_total', 'Vector store snapshot reloads by outcome')
+SEARCHED_VECTOR_FRACTION = REGISTRY.histogram(
+    'rag_searched_vector_fraction', 'Share of the vector store searched by date-filtered queries',
+    (0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0))
+GENERATION_TOKENS_PER_SECOND = REGISTRY.histogram(
+    'rag_generation_tokens_per_second', 'Generated tokens per second by decoding mode',
+    (1, 2, 5, 10, 15, 20, 30, 50, 75, 100, 200))
+
+
+ANSWER_MODES = ('generative', 'extractive', 'rag')
+
+DEGRADED_ANSWERS = {
+    'queue_full': "The assistant is busy right now, so no written summary was generated. "
+                  "The most relevant complaints are listed below.",
+    'budget_exhausted': "There was not enough time left to write a summary. "
+                        "The most relevant complaints are listed below."
+}
+
+
+class StopSignalCriteria(StoppingCriteria):
+    def __init__(self, stop_event):
+        """Stop generation at the next token once stop_event is set."""
+        self.stop_event = stop_event
+    
+    def __call__(self, input_ids, scores, **kwargs):
+        stop = self.stop_event.is_set()
+        return torch.full((input_ids.shape[0],), stop, dtype=torch.bool, device=input_ids.device)
+
+
+class GenerationDeadline(StoppingCriteria):
+    def __init__(self, deadline):
+        """Stop generation once time.perf_counter() passes deadline; remembers if it fired."""
+        self.deadline = deadline
+        self.triggered = False
+    
+    def remaining(self):
+        """Seconds left before the deadline."""
+        return max(self.deadline - time.perf_counter(), 0.0)
+    
+    def __call__(self, input_ids, scores, **kwargs):
+        if time.perf_counter() >= self.deadline:
+            self.triggered = True
+        return torch.full((input_ids.shape[0],), self.triggered, dtype=torch.bool, device=input_ids.device)
+
 
 class RAGPipeline:
-    def __init__(self, vector_store_path='vector_store/', model_name='microsoft/DialoGPT-medium'):
+    def __init__(self, vector_store_path='vector_store/', model_name='microsoft/DialoGPT-medium',
+                 query_cache_size=1024, retrieval_workers=2, generation_workers=1,
+                 generation_pool=None, draft_model_name=None, num_assistant_tokens=5,
+                 latency_budget=None, max_inflight_generations=None, min_generation_seconds=1.0,
+                 cube_path=None, shard_addresses=None, shard_timeout=2.0, snapshot_poll_interval=None,
+                 snapshots_to_keep=2, mmap_index=True, diversify=False, mmr_lambda=0.7,
+                 diversify_fetch_multiplier=4, max_chunks_per_complaint=1):
         """
         Initialize the RAG pipeline with vector store and LLM.
         
         Args:
-            vector_store_path: Path to the FAISS index and metadata
+            vector_store_path: Path to the FAISS index and metadata, or a
+                versioned root with a CURRENT pointer (see snapshots.py)
             model_name: HuggingFace model name for text generation
+            query_cache_size: Number of question embeddings kept in the LRU cache
+            retrieval_workers: Threads serving embedding/search for the async API
+            generation_workers: Threads serving generation for the async API
+            generation_pool: Optional GenerationPool; generation then runs in its
+                worker processes and the LLM is not loaded in this process
+            draft_model_name: Optional small model sharing the tokenizer (e.g.
+                'microsoft/DialoGPT-small') used for assisted (speculative) decoding
+            num_assistant_tokens: Tokens the draft model proposes per verification step
+            latency_budget: Default seconds per answered question; generation is
+                cut off when the budget left after retrieval runs out
+            max_inflight_generations: Generations allowed to run or wait at once;
+                further requests get a sources-only response
+            min_generation_seconds: Smallest remaining budget worth starting
+                generation with
+            cube_path: Complaint count cube for analytics questions (defaults to
+                complaint_cube.parquet in the vector store, used if present)
+            shard_addresses: Optional shard server addresses; searches then fan
+                out to them (see sharded_search.py) instead of a local index
+            shard_timeout: Seconds to wait for the slowest shard
+            snapshot_poll_interval: Seconds between checks of CURRENT; when it
+                changes, the new snapshot is loaded in the background and
+                swapped in between requests (None disables the watcher)
+            snapshots_to_keep: Snapshots kept when old ones are garbage collected
+            mmap_index: Memory-map the index and embeddings, so worker processes
+                share one copy through the page cache (falls back to a normal
+                read for index types that cannot be mapped)
+            diversify: Default for retrieve()'s diversify argument
+            mmr_lambda: MMR weight of relevance against novelty (1.0 = relevance only)
+            diversify_fetch_multiplier: Candidates fetched per requested chunk
+                when diversifying
+            max_chunks_per_complaint: Chunks of one complaint kept when
+                diversifying (0 disables collapsing)
         """
         self.vector_store_path = vector_store_path
         self.model_name = model_name
         
-        # Load vector store
-        self.index = faiss.read_index(os.path.join(vector_store_path, 'faiss_index.bin'))
-        self.metadata = pd.read_csv(os.path.join(vector_store_path, 'metadata.csv'))
+        # Separate pools so retrieval for new requests is never queued behind
+        # long generations; created on first use of the async API
+        self.retrieval_workers = retrieval_workers
+        self.generation_workers = generation_workers
+        self._retrieval_executor = None
+        self._generation_executor = None
+        self._executor_lock = threading.Lock()
+        
+        # Latency budget and load shedding
+        self.latency_budget = latency_budget
+        self.max_inflight_generations = max_inflight_generations
+        self.min_generation_seconds = min_generation_seconds
+        self._inflight_generations = 0
+        self._inflight_lock = threading.Lock()
+        
+        # Optional MMR / complaint collapsing after search
+        self.diversify = diversify
+        self.mmr_lambda = mmr_lambda
+        self.diversify_fetch_multiplier = diversify_fetch_multiplier
+        self.max_chunks_per_complaint = max_chunks_per_complaint
+        
+        # Repeated questions (sample buttons, evaluation reruns) skip encoding
+        self.query_cache_size = query_cache_size
+        self._query_cache = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+        
+        # Load vector store: index, metadata, quarter row ranges for date-filtered
+        # retrieval, the count cube for "how do complaints vary by ..." and
+        # topic clusters for "most common issues" questions, all from the
+        # same snapshot
+        self.cube_path = cube_path
+        self.mmap_index = mmap_index
+        self.snapshots_to_keep = snapshots_to_keep
+        self._shard_index = None
+        if shard_addresses:
+            from sharded_search import ShardCoordinator
+            self._shard_index = ShardCoordinator(shard_addresses, timeout=shard_timeout)
+        self.store = self._load_store()
+        self._store_lock = threading.Lock()
+        # Swapped-out snapshots that requests may still be reading; an entry
+        # disappears when the last request drops its reference
+        self._retired_stores = weakref.WeakValueDictionary()
+        
+        self._snapshot_watcher = None
+        if snapshot_poll_interval:
+            self.start_snapshot_watcher(snapshot_poll_interval)
         
         # Initialize embedding model
         self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
         
         # Initialize LLM
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModelForCausalLM.from_pretrained(model_name)
-        
-        # Set up generation pipeline
-        self.generator = pipeline(
-            'text-generation',
-            model=self.model,
-            tokenizer=self.tokenizer,
-            max_length=512,
-            temperature=0.7,
-            do_sample=True,
-            pad_token_id=self.tokenizer.eos_token_id
-        )
+        self.generation_pool = generation_pool
+        self.model = None
+        self.generator = None
+        
+        if generation_pool is None:
+            self.model = AutoModelForCausalLM.from_pretrained(model_name)
+            
+            # Set up generation pipeline
+            self.generator = pipeline(
+                'text-generation',
+                model=self.model,
+                tokenizer=self.tokenizer,
+                max_length=512,
+                temperature=0.7,
+                do_sample=True,
+                pad_token_id=self.tokenizer.eos_token_id
+            )
+        
+        # Optional draft model for assisted generation
+        self.draft_model_name = draft_model_name
+        self.draft_model = None
+        self.last_generation_stats = None
+        self._assisted_lock = threading.Lock()
+        if draft_model_name and generation_pool is None:
+            self.draft_model = AutoModelForCausalLM.from_pretrained(draft_model_name)
+            self.draft_model.generation_config.num_assistant_tokens = num_assistant_tokens
+            self.draft_model.generation_config.num_assistant_tokens_schedule = 'heuristic'
         
         print(f"RAG Pipeline initialized with {self.index.ntotal} vectors")
     
-    def retrieve(self, question, k=5):
+    @property
+    def index(self):
+        return self.store.index
+    
+    @property
+    def metadata(self):
+        return self.store.metadata
+    
+    @property
+    def time_shards(self):
+        return self.store.time_shards
+    
+    @property
+    def cube(self):
+        return self.store.cube
+    
+    @property
+    def topics(self):
+        return self.store.topics
+    
+    def _load_store(self):
+        """Load the live snapshot (or the flat store) into a VectorStoreSnapshot."""
+        path, version = resolve_store_path(self.vector_store_path)
+        index = None
+        if self._shard_index is not None:
+            # Shard row ids are only valid against the snapshot the shards
+            # serve; raises while they still serve another version
+            index = self._shard_index.pinned(version)
+        return VectorStoreSnapshot.load(path, version=version, index=index,
+                                        cube_path=self.cube_path, mmap=self.mmap_index)
+    
+    def reload_store(self):
+        """
+        Load the snapshot CURRENT points at and swap it in.
+        
+        Loading happens in the calling thread while requests keep using the
+        old snapshot; the swap itself is a single reference assignment.
+        Requests already running finish on the snapshot they started with,
+        and snapshots still referenced by a request are not garbage
+        collected (a Chroma store's sqlite file must outlive its readers).
+        
+        Returns:
+            True if a new snapshot was swapped in
+        """
+        with self._store_lock:
+            if current_version(self.vector_store_path) == self.store.version:
+                return False
+            try:
+                new_store = self._load_store()
+            except Exception as e:
+                SNAPSHOT_SWAPS.inc(labels={'outcome': 'failed'})
+                request_logger.error(json.dumps({'event': 'snapshot_reload_failed', 'error': str(e)}))
+                return False
+            old_store = self.store
+            self.store = new_store
+            if old_store.version is not None:
+                self._retired_stores[old_store.version] = old_store
+            old_version = old_store.version
+            del old_store
+        
+        SNAPSHOT_SWAPS.inc(labels={'outcome': 'swapped'})
+        request_logger.info(json.dumps({'event': 'snapshot_swapped', 'old_version': old_version,
+                                        'new_version': new_store.version,
+                                        'num_vectors': int(new_store.index.ntotal)}))
+        if new_store.version is not None:
+            in_use = {new_store.version, *list(self._retired_stores.keys())}
+            gc_snapshots(self.vector_store_path, keep=self.snapshots_to_keep, in_use=in_use)
+        return True
+    
+    def start_snapshot_watcher(self, interval=30):
+        """Poll CURRENT every interval seconds in a daemon thread and reload on change."""
+        def watch():
+            while True:
+                time.sleep(interval)
+                self.reload_store()
+        
+        self._snapshot_watcher = threading.Thread(target=watch, name='snapshot-watcher', daemon=True)
+        self._snapshot_watcher.start()
+    
+    def retrieve(self, question, k=5, timings=None, date_range=None, diversify=None):
         """
         Retrieve the top-k most relevant chunks for a given question.
         
         Args:
             question: User's question
             k: Number of chunks to retrieve
+            timings: Optional StageTimings that receives per-stage durations
+            date_range: Optional (start, end) dates the complaints were received
+                in; either end may be None
+            diversify: Over-fetch, keep one chunk per complaint and re-rank
+                with MMR (defaults to the pipeline's diversify setting)
             
         Returns:
             List of dictionaries with chunk text and metadata
         """
-        # Embed the question
-        question_embedding = self.embedding_model.encode([question])
-        
-        # Search the vector store
-        distances, indices = self.index.search(question_embedding, k)
-        
-        # Get the retrieved chunks with metadata
-        retrieved_chunks = []
-        for idx in indices[0]:
-            chunk_data = self.metadata.iloc[idx]
-            retrieved_chunks.append({
-                'text': chunk_data['chunk'],
-                'complaint_id': chunk_data['complaint_id'],
-                'product': chunk_data['product'],
-                'similarity_score': 1 - distances[0][list(indices[0]).index(idx)]
-            })
+        return self.retrieve_batch([question], k, timings=timings, date_range=date_range,
+                                   diversify=diversify)[0]
+    
+    def retrieve_batch(self, questions, k=5, batch_size=32, timings=None, date_range=None,
+                       diversify=None):
+        """
+        Retrieve the top-k chunks for many questions, encoding and searching
+        each batch of questions in a single call.
+        
+        Args:
+            questions: List of questions
+            k: Number of chunks to retrieve per question
+            batch_size: Number of questions encoded and searched together
+            timings: Optional StageTimings that receives per-stage durations
+            date_range: Optional (start, end) dates; only the rows received
+                in the range are searched
+            diversify: See retrieve()
+            
+        Returns:
+            List with one list of chunk dictionaries per question
+        """
+        if timings is None:
+            timings = StageTimings()
+        if diversify is None:
+            diversify = self.diversify
+        fetch_k = k * self.diversify_fetch_multiplier if diversify else k
+        
+        # One snapshot for the whole call, even if a new one is swapped in meanwhile
+        store = self.store
+        results = []
+        for start in range(0, len(questions), batch_size):
+            batch = list(questions[start:start + batch_size])
+            
+            # Embed the questions
+            with timings.stage('encode'):
+                question_embeddings = self.encode_queries(batch, batch_size=batch_size)
+            
+            # Search the vector store
+            with timings.stage('search'):
+                if date_range is None:
+                    distances, indices = store.index.search(question_embeddings, fetch_k)
+                else:
+                    distances, indices = self._search_date_range(store, question_embeddings, fetch_k, date_range)
+            
+            if diversify:
+                with timings.stage('diversify'):
+                    distances, indices = diversify_hits(
+                        question_embeddings, distances, indices, store.complaint_ids, store.vector_lookup(), k,
+                        lambda_mult=self.mmr_lambda, max_per_complaint=self.max_chunks_per_complaint)
+            
+            with timings.stage('metadata'):
+                for row_distances, row_indices in zip(distances, indices):
+                    results.append(store.chunks_from_hits(row_distances, row_indices))
         
-        return retrieved_chunks
+        return results
     
-    def create_prompt(self, question, context_chunks):
+    def _search_date_range(self, store, query_embeddings, k, date_range):
+        """Search the rows received in date_range."""
+        if store.time_shards is None:
+            backend = getattr(store.index, 'backend', None)
+            if backend is None:
+                raise ValueError("Date filters are not available when searching through shard servers")
+            if backend != 'faiss':
+                raise ValueError(f"Date filters need the faiss backend, but this vector store uses {backend}; "
+                                 f"rebuild it with chunking_embedding.py --backend faiss to filter by date")
+            raise ValueError("This faiss vector store has no quarter ranges (shards.json); rebuild it with "
+                             "chunking_embedding.py to filter by date")
+        distances, indices, searched = store.time_shards.search(query_embeddings, k, date_range)
+        SEARCHED_VECTOR_FRACTION.observe(searched / max(store.index.ntotal, 1))
+        return distances, indices
+    
+    def encode_queries(self, questions, batch_size=32):
+        """
+        Embed questions, serving repeated ones from the LRU cache.
+        
+        Args:
+            questions: List of questions
+            batch_size: Encoder batch size for cache misses
+            
+        Returns:
+            float32 array with one embedding row per question
+        """
+        cached = {}
+        with self._query_cache_lock:
+            for question in questions:
+                if question in self._query_cache:
+                    self._query_cache.move_to_end(question)
+                    cached[question] = self._query_cache[question]
+        
+        misses = list(dict.fromkeys(q for q in questions if q not in cached))
+        QUERY_CACHE_LOOKUPS.inc(len(questions) - len(misses), labels={'result': 'hit'})
+        QUERY_CACHE_LOOKUPS.inc(len(misses), labels={'result': 'miss'})
+        
+        if misses:
+            encoded = self.embedding_model.encode(misses, batch_size=batch_size)
+            encoded = np.asarray(encoded, dtype=np.float32)
+            with self._query_cache_lock:
+                for question, embedding in zip(misses, encoded):
+                    cached[question] = embedding
+                    if self.query_cache_size:
+                        self._query_cache[question] = embedding
+                        while len(self._query_cache) > self.query_cache_size:
+                            self._query_cache.popitem(last=False)
+        
+        return np.stack([cached[question] for question in questions]).astype(np.float32, copy=False)
+    
+    @staticmethod
+    def create_prompt(question, context_chunks):
         """
         Create a prompt template for the LLM.
         
@@ -96,50 +434,670 @@ Answer: Based on the complaint data, """
         
         return prompt
     
-    def generate_answer(self, prompt):
+    def generate_answer(self, prompt, max_new_tokens=200, min_new_tokens=None, stop_event=None,
+                        deadline=None):
         """
         Generate an answer using the LLM.
         
         Args:
             prompt: Formatted prompt for the LLM
+            max_new_tokens: Upper bound on generated tokens
+            min_new_tokens: Optional lower bound (used to fix the length in benchmarks)
+            stop_event: Optional threading.Event; setting it ends generation early
+            deadline: Optional GenerationDeadline; generation stops when it
+                passes and deadline.triggered is set
             
         Returns:
             Generated answer text
         """
+        if self.generation_pool is not None:
+            # Worker processes cannot see stop_event; they finish the request,
+            # but honour the deadline through generate(max_time=...)
+            max_time = deadline.remaining() if deadline is not None else None
+            answer = self.generation_pool.generate(prompt, max_new_tokens, min_new_tokens, max_time)
+            if deadline is not None and deadline.remaining() == 0.0:
+                deadline.triggered = True
+            return answer
+        
+        generation_kwargs = {'max_new_tokens': max_new_tokens, 'do_sample': True}
+        if min_new_tokens is not None:
+            generation_kwargs['min_new_tokens'] = min_new_tokens
+        stopping_criteria = []
+        if stop_event is not None:
+            stopping_criteria.append(StopSignalCriteria(stop_event))
+        if deadline is not None:
+            stopping_criteria.append(deadline)
+        if stopping_criteria:
+            generation_kwargs['stopping_criteria'] = StoppingCriteriaList(stopping_criteria)
+        
+        if self.draft_model is not None:
+            return self._generate_assisted(prompt, generation_kwargs)
+        
+        start_time = time.perf_counter()
+        
         # Generate response
-        response = self.generator(prompt, max_new_tokens=200, do_sample=True)
+        response = self.generator(prompt, **generation_kwargs)
         
         # Extract the generated text (remove the input prompt)
         generated_text = response[0]['generated_text']
         answer = generated_text[len(prompt):].strip()
         
+        elapsed = time.perf_counter() - start_time
+        generated_tokens = self.count_tokens(answer)
+        GENERATION_TOKENS_PER_SECOND.observe(generated_tokens / max(elapsed, 1e-9), labels={'mode': 'standard'})
+        
         return answer
     
-    def answer_question(self, question, k=5):
+    def generate_answers(self, prompts, batch_size=8, max_new_tokens=200, min_new_tokens=None,
+                         return_stats=False):
+        """
+        Generate answers for many prompts, batching them through the model.
+        
+        Prompts are sorted by token length so each batch pads as little as
+        possible, left-padded with the EOS token (DialoGPT has no pad token and
+        decoder-only models must continue from the right edge), and the answers
+        are returned in input order.
+        
+        Args:
+            prompts: List of formatted prompts
+            batch_size: Prompts per forward batch
+            max_new_tokens: Upper bound on generated tokens per prompt
+            min_new_tokens: Optional lower bound (used to fix the length in benchmarks)
+            return_stats: Also return per-batch throughput for this call
+            
+        Returns:
+            List of generated answer texts, one per prompt, or (answers,
+            batch_stats) if return_stats is set
+        """
+        if self.generation_pool is not None:
+            # The pool spreads prompts over its worker processes instead (no per-batch stats)
+            futures = [self.generation_pool.submit(prompt, max_new_tokens, min_new_tokens) for prompt in prompts]
+            answers = [future.result()[0] for future in futures]
+            return (answers, []) if return_stats else answers
+        
+        pad_token_id = self.tokenizer.eos_token_id
+        encoded = [self.tokenizer.encode(prompt) for prompt in prompts]
+        order = sorted(range(len(prompts)), key=lambda i: len(encoded[i]))
+        answers = [None] * len(prompts)
+        batch_stats = []
+        
+        generation_kwargs = {'max_new_tokens': max_new_tokens, 'do_sample': True,
+                             'temperature': 0.7, 'pad_token_id': pad_token_id}
+        if min_new_tokens is not None:
+            generation_kwargs['min_new_tokens'] = min_new_tokens
+        
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            width = max(len(encoded[i]) for i in batch)
+            input_ids = torch.full((len(batch), width), pad_token_id, dtype=torch.long)
+            attention_mask = torch.zeros((len(batch), width), dtype=torch.long)
+            for row, i in enumerate(batch):
+                input_ids[row, width - len(encoded[i]):] = torch.tensor(encoded[i])
+                attention_mask[row, width - len(encoded[i]):] = 1
+            
+            start_time = time.perf_counter()
+            with torch.inference_mode():
+                output = self.model.generate(input_ids=input_ids, attention_mask=attention_mask,
+                                             **generation_kwargs)
+            elapsed = time.perf_counter() - start_time
+            
+            new_tokens = output[:, width:]
+            for row, i in enumerate(batch):
+                answers[i] = self.tokenizer.decode(new_tokens[row], skip_special_tokens=True).strip()
+            
+            # EOS doubles as padding, so finished rows only pad with it
+            generated = int((new_tokens != pad_token_id).sum())
+            batch_stats.append({
+                'batch_size': len(batch),
+                'generated_tokens': generated,
+                'padding_ratio': round(1 - int(attention_mask.sum()) / attention_mask.numel(), 4),
+                'seconds': round(elapsed, 4),
+                'tokens_per_second': round(generated / max(elapsed, 1e-9), 2)
+            })
+            GENERATION_TOKENS_PER_SECOND.observe(batch_stats[-1]['tokens_per_second'],
+                                                 labels={'mode': 'batched'})
+        
+        if return_stats:
+            return answers, batch_stats
+        return answers
+    
+    def _generate_assisted(self, prompt, generation_kwargs):
+        """
+        Assisted generation: the draft model proposes tokens and the main model
+        verifies them in one forward pass. With do_sample=True, transformers
+        uses speculative sampling, so answers follow the main model's
+        distribution.
+        
+        Args:
+            prompt: Formatted prompt for the LLM
+            generation_kwargs: Same keyword arguments as the standard path
+            
+        Returns:
+            Generated answer text; acceptance statistics are left in
+            self.last_generation_stats
+        """
+        inputs = self.tokenizer(prompt, return_tensors='pt')
+        calls = {'target': 0, 'draft': 0}
+        
+        def count(name):
+            def hook(module, args, output):
+                calls[name] += 1
+            return hook
+        
+        # Forward hooks are per model, so assisted calls are serialized to keep counts exact
+        with self._assisted_lock:
+            hooks = [self.model.register_forward_hook(count('target')),
+                     self.draft_model.register_forward_hook(count('draft'))]
+            start_time = time.perf_counter()
+            try:
+                with torch.inference_mode():
+                    output = self.model.generate(
+                        **inputs,
+                        assistant_model=self.draft_model,
+                        temperature=0.7,
+                        pad_token_id=self.tokenizer.eos_token_id,
+                        **generation_kwargs
+                    )
+            finally:
+                for hook in hooks:
+                    hook.remove()
+            elapsed = time.perf_counter() - start_time
+        
+        new_tokens = output[0, inputs['input_ids'].shape[1]:]
+        answer = self.tokenizer.decode(new_tokens, skip_special_tokens=True).strip()
+        
+        # Every verification step yields the accepted draft tokens plus one token
+        # from the main model, so accepted = generated - verification steps
+        generated = int(new_tokens.shape[0])
+        accepted = max(generated - calls['target'], 0)
+        proposed = calls['draft']
+        self.last_generation_stats = {
+            'generated_tokens': generated,
+            'draft_tokens_proposed': proposed,
+            'draft_tokens_accepted': accepted,
+            'acceptance_rate': round(accepted / proposed, 4) if proposed else 0.0,
+            'target_forward_passes': calls['target'],
+            'tokens_per_second': round(generated / max(elapsed, 1e-9), 2)
+        }
+        DRAFT_TOKENS.inc(accepted, labels={'outcome': 'accepted'})
+        DRAFT_TOKENS.inc(max(proposed - accepted, 0), labels={'outcome': 'rejected'})
+        GENERATION_TOKENS_PER_SECOND.observe(self.last_generation_stats['tokens_per_second'],
+                                             labels={'mode': 'assisted'})
+        
+        return answer
+    
+    def count_tokens(self, text):
+        """Number of LLM tokens in a piece of text."""
+        return len(self.tokenizer(text)['input_ids'])
+    
+    def split_sentences(self, text, max_words=30):
+        """
+        Split chunk text into sentence-like units.
+        
+        Narratives are cleaned of punctuation during preprocessing, so text
+        without sentence boundaries falls back to fixed word windows.
+        
+        Args:
+            text: Chunk text
+            max_words: Longest unit kept before splitting into windows
+            
+        Returns:
+            List of sentence strings
+        """
+        sentences = []
+        for piece in re.split(r'(?<=[.!?])\s+', text):
+            words = piece.split()
+            if len(words) <= max_words:
+                if len(words) >= 4:
+                    sentences.append(piece.strip())
+                continue
+            for start in range(0, len(words), max_words):
+                window = words[start:start + max_words]
+                if len(window) >= 4:
+                    sentences.append(' '.join(window))
+        return sentences
+    
+    def extractive_answer(self, question, context_chunks, max_sentences=5,
+                          query_weight=0.7, redundancy_threshold=0.8):
+        """
+        Build a cited summary straight from the retrieved chunks, without the LLM.
+        
+        Sentences are scored by similarity to the question and to the centroid
+        of all candidate sentences (what the chunks have in common), then picked
+        greedily while skipping near-duplicates of sentences already chosen.
+        
+        Args:
+            question: User's question
+            context_chunks: Retrieved chunks
+            max_sentences: Maximum sentences in the summary
+            query_weight: Weight of question similarity versus centroid similarity
+            redundancy_threshold: Cosine similarity above which a sentence is redundant
+            
+        Returns:
+            Summary text with complaint citations
+        """
+        candidates = []
+        for chunk in context_chunks:
+            for sentence in self.split_sentences(chunk['text']):
+                candidates.append((sentence, chunk['complaint_id']))
+        if not candidates:
+            return "No complaint excerpts matched this question."
+        
+        sentence_embeddings = self.embedding_model.encode(
+            [sentence for sentence, _ in candidates], batch_size=64, normalize_embeddings=True)
+        sentence_embeddings = np.asarray(sentence_embeddings, dtype=np.float32)
+        
+        query_embedding = self.encode_queries([question])[0]
+        query_embedding = query_embedding / (np.linalg.norm(query_embedding) + 1e-12)
+        centroid = sentence_embeddings.mean(axis=0)
+        centroid = centroid / (np.linalg.norm(centroid) + 1e-12)
+        
+        scores = (query_weight * (sentence_embeddings @ query_embedding)
+                  + (1 - query_weight) * (sentence_embeddings @ centroid))
+        
+        selected = []
+        for i in np.argsort(-scores):
+            if selected and np.max(sentence_embeddings[selected] @ sentence_embeddings[i]) > redundancy_threshold:
+                continue
+            selected.append(i)
+            if len(selected) == max_sentences:
+                break
+        
+        lines = [f"- {candidates[i][0]} [Complaint {candidates[i][1]}]" for i in selected]
+        return "Key points from the most relevant complaints:\n" + "\n".join(lines)
+    
+    def answer_question(self, question, k=5, return_timings=False, mode='generative',
+                        latency_budget=None):
         """
         Complete RAG pipeline: retrieve relevant chunks and generate an answer.
         
         Args:
             question: User's question
             k: Number of chunks to retrieve
+            return_timings: Include per-stage timings and token counts in the result
+            mode: 'generative' (LLM answer), 'extractive' (cited summary of the
+                retrieved chunks, no LLM; well under a second on CPU) or 'rag'
+                (LLM answer over retrieved chunks, never from the cube or the
+                topic clusters; for evaluations and benchmarks)
+            latency_budget: Seconds for the whole request (defaults to the
+                pipeline's latency_budget); time spent on retrieval and the
+                prompt is subtracted before generation starts
+            
+        Returns:
+            Dictionary with answer and retrieved sources; 'truncated' is True when
+            the answer was cut off by the budget and 'degraded' names the reason
+            when only sources were returned. Aggregate questions are answered
+            from the complaint count cube with mode 'aggregate', theme questions
+            from the topic clusters with mode 'topics' (unless mode is 'rag')
+        """
+        if mode not in ANSWER_MODES:
+            raise ValueError(f"Unknown answer mode: {mode}")
+        
+        if mode != 'rag':
+            aggregate_result = self._answer_from_cube(question, return_timings)
+            if aggregate_result is not None:
+                return aggregate_result
+            
+            topic_result = self._answer_from_topics(question, return_timings)
+            if topic_result is not None:
+                return topic_result
+        
+        timings = StageTimings()
+        start_time = time.perf_counter()
+        status = 'error'
+        token_counts = {}
+        truncated = False
+        degraded = None
+        
+        try:
+            # Step 1: Retrieve relevant chunks
+            retrieved_chunks = self.retrieve(question, k, timings=timings)
+            
+            if mode == 'extractive':
+                with timings.stage('extractive'):
+                    answer = self.extractive_answer(question, retrieved_chunks)
+            else:
+                # Step 2: Create prompt
+                with timings.stage('prompt'):
+                    prompt = self.create_prompt(question, retrieved_chunks)
+                
+                deadline, degraded = self._admit_generation(start_time, latency_budget)
+                if degraded:
+                    answer = DEGRADED_ANSWERS[degraded]
+                else:
+                    # Step 3: Generate answer
+                    try:
+                        with timings.stage('generation'):
+                            answer = self.generate_answer(prompt, deadline=deadline)
+                    finally:
+                        self._release_generation()
+                    truncated = self._check_truncated(deadline)
+                    
+                    token_counts = {
+                        'prompt_tokens': self.count_tokens(prompt),
+                        'generated_tokens': self.count_tokens(answer)
+                    }
+            status = 'degraded' if degraded else 'truncated' if truncated else 'ok'
+        finally:
+            total_time = time.perf_counter() - start_time
+            self._record_request(question, timings, total_time, status, token_counts, mode)
+        
+        result = {
+            'answer': answer,
+            'sources': retrieved_chunks,
+            'question': question,
+            'mode': mode,
+            'truncated': truncated,
+            'degraded': degraded
+        }
+        
+        if return_timings:
+            result['timings'] = dict(timings.as_dict(), total=round(total_time, 6), **token_counts)
+        
+        return result
+    
+    def _answer_from_cube(self, question, return_timings=False):
+        """
+        Answer a counting question (by product, issue, state, month...) from the cube.
+        
+        Args:
+            question: User's question
+            return_timings: Include timings in the result
+            
+        Returns:
+            Result dictionary shaped like answer_question's, or None if there is
+            no cube or the question needs the complaint narratives
+        """
+        cube = self.store.cube
+        if cube is None:
+            return None
+        
+        timings = StageTimings()
+        start_time = time.perf_counter()
+        with timings.stage('aggregate'):
+            aggregate = cube.answer(question)
+        if aggregate is None:
+            return None
+        
+        total_time = time.perf_counter() - start_time
+        self._record_request(question, timings, total_time, 'ok', {}, 'aggregate')
+        
+        result = {
+            'answer': aggregate['answer'],
+            'sources': [],
+            'question': question,
+            'mode': 'aggregate',
+            'truncated': False,
+            'degraded': None,
+            'aggregate': {key: aggregate[key] for key in ('dimension', 'product_filter', 'state_filter',
+                                                          'year_range', 'total', 'rows')}
+        }
+        if return_timings:
+            result['timings'] = dict(timings.as_dict(), total=round(total_time, 6))
+        return result
+    
+    def _answer_from_topics(self, question, return_timings=False):
+        """
+        Answer a theme question ("most common issues with ...") from the topic clusters.
+        
+        Args:
+            question: User's question
+            return_timings: Include timings in the result
+            
+        Returns:
+            Result dictionary shaped like answer_question's, with the clusters'
+            representative chunks as sources, or None if there are no clusters
+            or the question is not about themes
+        """
+        topics = self.store.topics
+        if topics is None or not topics.is_theme_question(question):
+            return None
+        
+        timings = StageTimings()
+        start_time = time.perf_counter()
+        with timings.stage('encode'):
+            query_embedding = self.encode_queries([question])[0]
+        with timings.stage('topics'):
+            themes = topics.answer(question, query_embedding)
+        if themes is None:
+            return None
+        
+        total_time = time.perf_counter() - start_time
+        self._record_request(question, timings, total_time, 'ok', {}, 'topics')
+        
+        result = {
+            'answer': themes['answer'],
+            'sources': themes['sources'],
+            'question': question,
+            'mode': 'topics',
+            'truncated': False,
+            'degraded': None,
+            'topics': {'product_filter': themes['product_filter'], 'clusters': themes['clusters']}
+        }
+        if return_timings:
+            result['timings'] = dict(timings.as_dict(), total=round(total_time, 6))
+        return result
+    
+    def _admit_generation(self, start_time, latency_budget=None):
+        """
+        Decide whether a request may start generating.
+        
+        Args:
+            start_time: time.perf_counter() value when the request arrived
+            latency_budget: Per-request budget, or None for the pipeline default
+            
+        Returns:
+            (GenerationDeadline or None, degradation reason or None). When the
+            request is admitted, the caller must call _release_generation()
+        """
+        latency_budget = latency_budget if latency_budget is not None else self.latency_budget
+        deadline = None
+        if latency_budget is not None:
+            deadline = GenerationDeadline(start_time + latency_budget)
+            if deadline.remaining() < self.min_generation_seconds:
+                BUDGET_OVERRUNS.inc(labels={'stage': 'before_generation'})
+                DEGRADED_RESPONSES.inc(labels={'reason': 'budget_exhausted'})
+                return None, 'budget_exhausted'
+        
+        with self._inflight_lock:
+            if (self.max_inflight_generations is not None
+                    and self._inflight_generations >= self.max_inflight_generations):
+                DEGRADED_RESPONSES.inc(labels={'reason': 'queue_full'})
+                return None, 'queue_full'
+            self._inflight_generations += 1
+        return deadline, None
+    
+    def _release_generation(self):
+        """Free the slot taken by _admit_generation()."""
+        with self._inflight_lock:
+            self._inflight_generations -= 1
+    
+    def _check_truncated(self, deadline):
+        """Count a budget overrun if the deadline cut generation short."""
+        if deadline is not None and deadline.triggered:
+            BUDGET_OVERRUNS.inc(labels={'stage': 'generation'})
+            return True
+        return False
+    
+    def _get_executors(self):
+        """Create the retrieval and generation thread pools on first use."""
+        with self._executor_lock:
+            if self._retrieval_executor is None:
+                self._retrieval_executor = ThreadPoolExecutor(
+                    max_workers=self.retrieval_workers, thread_name_prefix='rag-retrieval')
+                self._generation_executor = ThreadPoolExecutor(
+                    max_workers=self.generation_workers, thread_name_prefix='rag-generation')
+        return self._retrieval_executor, self._generation_executor
+    
+    async def retrieve_async(self, question, k=5, timings=None, date_range=None, diversify=None):
+        """
+        Retrieve on the retrieval pool without blocking the event loop.
+        
+        Args:
+            question: User's question
+            k: Number of chunks to retrieve
+            timings: Optional StageTimings that receives per-stage durations
+            date_range: Optional (start, end) dates, see retrieve()
+            diversify: See retrieve()
+            
+        Returns:
+            List of dictionaries with chunk text and metadata
+        """
+        retrieval_executor, _ = self._get_executors()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            retrieval_executor,
+            functools.partial(self.retrieve, question, k, timings=timings, date_range=date_range,
+                              diversify=diversify))
+    
+    async def answer_question_async(self, question, k=5, return_timings=False, mode='generative',
+                                    latency_budget=None):
+        """
+        asyncio version of answer_question.
+        
+        Retrieval and generation run on separate pools, so new requests are
+        embedded and searched while earlier ones are still generating. If the
+        awaiting task is cancelled (e.g. the client disconnected), generation
+        is signalled to stop at the next token.
+        
+        Args:
+            question: User's question
+            k: Number of chunks to retrieve
+            return_timings: Include per-stage timings and token counts in the result
+            mode: 'generative', 'extractive' or 'rag' (see answer_question)
+            latency_budget: Seconds for the whole request (see answer_question);
+                time spent waiting for a generation worker counts against it
             
         Returns:
             Dictionary with answer and retrieved sources
         """
-        # Step 1: Retrieve relevant chunks
-        retrieved_chunks = self.retrieve(question, k)
+        if mode not in ANSWER_MODES:
+            raise ValueError(f"Unknown answer mode: {mode}")
+        
+        # Cube lookups take milliseconds, so they run on the event loop
+        if mode != 'rag':
+            aggregate_result = self._answer_from_cube(question, return_timings)
+            if aggregate_result is not None:
+                return aggregate_result
+        
+        retrieval_executor, generation_executor = self._get_executors()
+        loop = asyncio.get_running_loop()
+        
+        # Theme questions need the question embedding, so they go to the retrieval pool
+        if mode != 'rag':
+            topic_result = await loop.run_in_executor(retrieval_executor, self._answer_from_topics,
+                                                      question, return_timings)
+            if topic_result is not None:
+                return topic_result
+        
+        timings = StageTimings()
+        start_time = time.perf_counter()
+        status = 'error'
+        token_counts = {}
+        truncated = False
+        degraded = None
+        stop_event = threading.Event()
+        # The generation slot is released exactly once: by the job when it
+        # runs, or below when the request is cancelled while the job is still
+        # queued (the cancelled job then never runs)
+        slot = {'held': False, 'started': False}
+        slot_lock = threading.Lock()
+        
+        def release_slot():
+            with slot_lock:
+                if not slot['held']:
+                    return
+                slot['held'] = False
+            self._release_generation()
         
-        # Step 2: Create prompt
-        prompt = self.create_prompt(question, retrieved_chunks)
+        def timed_generation(prompt, deadline):
+            with slot_lock:
+                slot['started'] = True
+                if not slot['held']:
+                    # Cancelled just before the job started; its slot is already free
+                    return ''
+            try:
+                with timings.stage('generation'):
+                    return self.generate_answer(prompt, stop_event=stop_event, deadline=deadline)
+            finally:
+                release_slot()
         
-        # Step 3: Generate answer
-        answer = self.generate_answer(prompt)
+        def timed_extraction(chunks):
+            with timings.stage('extractive'):
+                return self.extractive_answer(question, chunks)
         
-        return {
+        try:
+            # Step 1: Retrieve relevant chunks
+            retrieved_chunks = await self.retrieve_async(question, k, timings=timings)
+            
+            if mode == 'extractive':
+                # Embedding work, so it shares the retrieval pool
+                answer = await loop.run_in_executor(retrieval_executor, timed_extraction, retrieved_chunks)
+            else:
+                # Step 2: Create prompt
+                with timings.stage('prompt'):
+                    prompt = self.create_prompt(question, retrieved_chunks)
+                
+                deadline, degraded = self._admit_generation(start_time, latency_budget)
+                if degraded:
+                    answer = DEGRADED_ANSWERS[degraded]
+                else:
+                    slot['held'] = True
+                    # Step 3: Generate answer
+                    answer = await loop.run_in_executor(generation_executor, timed_generation,
+                                                        prompt, deadline)
+                    truncated = self._check_truncated(deadline)
+                    
+                    token_counts = {
+                        'prompt_tokens': self.count_tokens(prompt),
+                        'generated_tokens': self.count_tokens(answer)
+                    }
+            status = 'degraded' if degraded else 'truncated' if truncated else 'ok'
+        except asyncio.CancelledError:
+            stop_event.set()
+            with slot_lock:
+                queued = not slot['started']
+            if queued:
+                release_slot()
+            status = 'cancelled'
+            raise
+        finally:
+            total_time = time.perf_counter() - start_time
+            self._record_request(question, timings, total_time, status, token_counts, mode)
+        
+        result = {
             'answer': answer,
             'sources': retrieved_chunks,
-            'question': question
+            'question': question,
+            'mode': mode,
+            'truncated': truncated,
+            'degraded': degraded
         }
+        
+        if return_timings:
+            result['timings'] = dict(timings.as_dict(), total=round(total_time, 6), **token_counts)
+        
+        return result
+    
+    def _record_request(self, question, timings, total_time, status, token_counts, mode='generative'):
+        """Feed one request into the histograms and emit its JSON log line."""
+        for stage, seconds in timings.stages.items():
+            STAGE_SECONDS.observe(seconds, labels={'stage': stage})
+        REQUEST_SECONDS.observe(total_time, labels={'mode': mode})
+        REQUESTS_TOTAL.inc(labels={'status': status, 'mode': mode})
+        if 'prompt_tokens' in token_counts:
+            PROMPT_TOKENS.observe(token_counts['prompt_tokens'])
+            GENERATED_TOKENS.observe(token_counts['generated_tokens'])
+        
+        request_logger.info(json.dumps({
+            'event': 'rag_request',
+            'status': status,
+            'mode': mode,
+            'question_chars': len(question),
+            'total_s': round(total_time, 6),
+            'stages': timings.as_dict(),
+            **token_counts
+        }))
 
 def create_evaluation_questions():
     """
@@ -9,8 +9,14 @@ import numpy as np
 import faiss
 from sentence_transformers import SentenceTransformer
 import os
+import shutil
 import time
 
+from snapshots import create_build_dir, publish_snapshot
+from time_shards import METADATA_COLUMNS, write_time_partitioned_store
+from vector_stores import FaissVectorStore
+from embedding_cache import EmbeddingCache, model_version
+
 def main():
     print("🚀 Task 2: Complete Text Chunking, Embedding, and Vector Store Indexing")
     print("=" * 70)
@@ -49,6 +55,13 @@ def main():
     
     start_time = time.time()
     
+    # Chunks whose text is unchanged since an earlier run come from the cache
+    cache = EmbeddingCache('../cache/embeddings', model_version(model, 'all-MiniLM-L6-v2'),
+                           model.get_sentence_embedding_dimension())
+    
+    def encode(texts):
+        return model.encode(texts, batch_size=32, show_progress_bar=False)
+    
     # Process in batches to avoid memory issues
     batch_size = 1000
     all_embeddings = []
@@ -60,11 +73,13 @@ def main():
         
         print(f"   Processing batch {batch_num}/{total_batches} ({i+1}-{min(i+batch_size, len(df_chunks)):,} chunks)...")
         
-        batch_embeddings = model.encode(batch, batch_size=32, show_progress_bar=False)
+        batch_embeddings = cache.encode(batch, encode)
         all_embeddings.extend(batch_embeddings.tolist())
     
     embedding_time = time.time() - start_time
+    stats = cache.summary()
     print(f"✅ Generated embeddings in {embedding_time:.1f} seconds")
+    print(f"Embedding cache hit rate: {stats['hit_rate']:.1%} ({stats['hits']:,} reused, {stats['misses']:,} encoded)")
     print(f"Total embeddings: {len(all_embeddings):,}")
     print(f"Embedding dimension: {len(all_embeddings[0])}")
     
@@ -82,17 +97,21 @@ def main():
     # Step 6: Save vector store
     print("\n💾 Step 6: Saving vector store...")
     vector_store_dir = '../vector_store'
-    os.makedirs(vector_store_dir, exist_ok=True)
-    
-    # Save FAISS index
-    index_file = os.path.join(vector_store_dir, 'faiss_index.bin')
-    faiss.write_index(index, index_file)
-    print(f"✅ FAISS index saved ({os.path.getsize(index_file) / (1024*1024):.1f} MB)")
-    
-    # Save metadata
-    metadata_file = os.path.join(vector_store_dir, 'metadata.csv')
-    metadata_df = df_chunks[['complaint_id', 'product', 'chunk']].copy()
-    metadata_df.to_csv(metadata_file, index=False)
+    # Build into a fresh directory, so files of earlier builds are not published with it
+    build_dir = create_build_dir(vector_store_dir)
+    
+    index_file = os.path.join(build_dir, 'faiss_index.bin')
+    metadata_file = os.path.join(build_dir, 'metadata.csv')
+    metadata_df = df_chunks[[c for c in METADATA_COLUMNS if c in df_chunks.columns]].copy()
+    
+    if 'date_received' in metadata_df.columns:
+        # Index, metadata and the row range of every quarter for date-filtered retrieval
+        write_time_partitioned_store(embeddings_np, metadata_df, build_dir)
+        print(f"✅ FAISS index and quarter ranges saved ({os.path.getsize(index_file) / (1024*1024):.1f} MB)")
+    else:
+        # Chunks from before dates were kept: no quarter ranges
+        FaissVectorStore(metadata=metadata_df, index=index).persist(build_dir)
+        print(f"✅ FAISS index saved ({os.path.getsize(index_file) / (1024*1024):.1f} MB)")
     print(f"✅ Metadata saved ({os.path.getsize(metadata_file) / (1024*1024):.1f} MB)")
     
     # Step 7: Verify vector store
@@ -112,6 +131,10 @@ def main():
     print(f"Test question: {test_question}")
     print(f"Retrieved {len(indices[0])} similar chunks")
     
+    # Running apps switch to the new snapshot between requests
+    version = publish_snapshot(vector_store_dir, source_dir=build_dir, keep=3)
+    print(f"✅ Published vector store snapshot {version}")
+    
     # Step 8: Summary
     print("\n📊 Task 2 Completion Summary")
     print("=" * 50)
@@ -127,11 +150,13 @@ def main():
     print("You can now proceed with Task 3: RAG Core Logic and Evaluation")
     
     # List vector store files
-    print(f"\n📁 Vector store contents:")
-    for file in os.listdir(vector_store_dir):
-        file_path = os.path.join(vector_store_dir, file)
-        size_mb = os.path.getsize(file_path) / (1024*1024)
-        print(f"  {file} ({size_mb:.1f} MB)")
+    print(f"\n📁 Vector store contents (snapshot {version}):")
+    for file in os.listdir(build_dir):
+        file_path = os.path.join(build_dir, file)
+        if os.path.isfile(file_path):
+            size_mb = os.path.getsize(file_path) / (1024*1024)
+            print(f"  {file} ({size_mb:.1f} MB)")
+    shutil.rmtree(build_dir)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
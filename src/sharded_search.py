@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+"""
+Scatter-gather vector search over shards served by separate processes.
+The index is split into N contiguous row ranges. Each range is served by a
+shard server, locally or on another host. A coordinator sends every query
+batch to all shards in parallel, merges the per-shard top-k by distance, and
+answers without any shard that misses the timeout.
+
+Shards and coordinator exchange pickles, so both sides need the shared
+secret from inference_client.get_authkey(); there is no fallback key.
+Addresses without a host bind to localhost. Every shard reports the snapshot
+version it serves, and a coordinator pinned to a snapshot drops results of
+shards serving another one, since their row ids index different metadata.
+
+Usage:
+    python src/sharded_search.py split --vector-store vector_store/ --num-shards 4
+    python src/sharded_search.py serve --vector-store vector_store/ --shard 0 --address localhost:7870
+    python src/sharded_search.py launch --vector-store vector_store/ --base-port 7870
+    python src/sharded_search.py check --vector-store vector_store/ --queries 200
+"""
+
+import argparse
+import copy
+import json
+import logging
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait
+from multiprocessing.connection import Client, Listener
+
+import faiss
+import numpy as np
+
+sys.path.append(os.path.dirname(__file__))
+
+from metrics import REGISTRY
+from index_io import load_embeddings, read_index
+from index_compression import build_index, index_transform
+from inference_client import AuthKeyError, get_authkey, is_local_address, parse_address
+from snapshots import publish_snapshot, resolve_store_path, stage_snapshot
+
+SEARCH_SHARD_MANIFEST = 'search_shards.json'
+SEARCH_SHARD_DIR = 'search_shards'
+
+SHARD_TIMEOUTS = REGISTRY.counter('rag_shard_timeouts_total', 'Shard searches dropped for missing the timeout')
+SHARD_ERRORS = REGISTRY.counter('rag_shard_errors_total', 'Shard searches that failed')
+
+logger = logging.getLogger(__name__)
+
+
+def write_search_shards(embeddings, output_dir, num_shards, transform=None):
+    """
+    Split embeddings into contiguous row ranges with one flat index each.
+
+    Args:
+        embeddings: float32 array in metadata row order
+        output_dir: Vector store directory
+        num_shards: Number of shards
+        transform: Optional dimension-reducing transform shared with the full index
+
+    Returns:
+        The manifest dictionary written to search_shards.json
+    """
+    os.makedirs(os.path.join(output_dir, SEARCH_SHARD_DIR), exist_ok=True)
+    bounds = np.linspace(0, len(embeddings), num_shards + 1).astype(int)
+
+    shards = []
+    for shard_number, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+        shard_file = os.path.join(SEARCH_SHARD_DIR, f"shard_{shard_number}.bin")
+        index = build_index(embeddings[start:end], transform)
+        faiss.write_index(index, os.path.join(output_dir, shard_file))
+        shards.append({'file': shard_file, 'offset': int(start), 'count': int(end - start)})
+
+    manifest = {'num_shards': num_shards, 'total': int(len(embeddings)), 'shards': shards}
+    with open(os.path.join(output_dir, SEARCH_SHARD_MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_manifest(vector_store_path):
+    """Read search_shards.json from a vector store."""
+    with open(os.path.join(vector_store_path, SEARCH_SHARD_MANIFEST)) as f:
+        return json.load(f)
+
+
+def split_store(vector_store_path, num_shards):
+    """
+    Shard an existing vector store in place (the full index is kept).
+
+    Args:
+        vector_store_path: Directory containing faiss_index.bin
+        num_shards: Number of shards
+
+    Returns:
+        The manifest dictionary
+    """
+    index, _ = read_index(os.path.join(vector_store_path, 'faiss_index.bin'), mmap=False)
+    embeddings_file = os.path.join(vector_store_path, 'embeddings.npy')
+    if os.path.exists(embeddings_file):
+        embeddings = load_embeddings(embeddings_file)
+    else:
+        embeddings = index.reconstruct_n(0, index.ntotal)
+    # Shards of a reduced index reduce their vectors the same way (reconstructed
+    # vectors map back onto the stored ones, since the rotation is orthonormal)
+    transform = index_transform(index)
+    return write_search_shards(embeddings, vector_store_path, num_shards, transform)
+
+
+def split_snapshot(vector_store_path, num_shards, keep=3):
+    """
+    Shard the live snapshot of a vector store into a new snapshot.
+
+    Snapshots are never modified in place: the live one is staged with hard
+    links, split there, and published as a new version (a flat directory
+    without snapshots is split in place).
+
+    Args:
+        vector_store_path: Vector store root or flat directory
+        num_shards: Number of shards
+        keep: Snapshots kept after publishing
+
+    Returns:
+        (manifest, version) - version is None for a flat directory
+    """
+    path, version = resolve_store_path(vector_store_path)
+    if version is None:
+        return split_store(path, num_shards), None
+
+    build_dir = stage_snapshot(vector_store_path, version, exclude=(SEARCH_SHARD_MANIFEST, SEARCH_SHARD_DIR))
+    try:
+        manifest = split_store(build_dir, num_shards)
+        new_version = publish_snapshot(vector_store_path, source_dir=build_dir, keep=keep)
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+    return manifest, new_version
+
+
+class ShardServer:
+    def __init__(self, vector_store_path, shard_number, address, authkey=None):
+        """
+        Load one shard's index from the live snapshot.
+
+        Args:
+            vector_store_path: Vector store root (its CURRENT snapshot is
+                served) or flat directory with search_shards.json
+            shard_number: Shard to serve
+            address: 'host:port' or 'unix:/path.sock' to listen on
+            authkey: Shared secret the coordinator must present (defaults to
+                get_authkey(), which raises AuthKeyError if none is configured)
+        """
+        path, self.version = resolve_store_path(vector_store_path)
+        shard = load_manifest(path)['shards'][shard_number]
+        self.shard_number = shard_number
+        self.offset = shard['offset']
+        self.index, _ = read_index(os.path.join(path, shard['file']))
+        self.address = address
+        self.authkey = authkey or get_authkey()
+
+    def search(self, query_embeddings, k):
+        """Search this shard; returns distances, global row ids and the snapshot version."""
+        distances, indices = self.index.search(query_embeddings, k)
+        return distances, np.where(indices >= 0, indices + self.offset, -1), self.version
+
+    def _handle_connection(self, connection):
+        """Serve requests from one coordinator connection until it closes."""
+        with connection:
+            while True:
+                try:
+                    method, args = connection.recv()
+                except (EOFError, ConnectionResetError):
+                    return
+                try:
+                    if method == 'search':
+                        result = self.search(*args)
+                    elif method == 'info':
+                        result = {'shard': self.shard_number, 'offset': self.offset,
+                                  'count': self.index.ntotal, 'version': self.version, 'pid': os.getpid()}
+                    else:
+                        raise ValueError(f"Unknown method: {method}")
+                    connection.send(('ok', result))
+                except Exception as e:
+                    logger.error("Shard call %s failed:\n%s", method, traceback.format_exc())
+                    connection.send(('error', f"{type(e).__name__}: {e}"))
+
+    def serve_forever(self, ready=None):
+        """Accept coordinator connections until interrupted."""
+        address, family = parse_address(self.address)
+        if family == 'AF_UNIX' and os.path.exists(address):
+            os.remove(address)
+        if not is_local_address(self.address):
+            logger.warning("Shard %s listening on %s: reachable from other hosts, protected only by the authkey",
+                           self.shard_number, self.address)
+        with Listener(address, family=family, authkey=self.authkey) as listener:
+            if ready is not None:
+                ready.set()
+            while True:
+                try:
+                    connection = listener.accept()
+                except Exception as e:
+                    logger.warning("Rejected connection: %s", e)
+                    continue
+                threading.Thread(target=self._handle_connection, args=(connection,), daemon=True).start()
+
+
+class ShardCoordinator:
+    def __init__(self, addresses, timeout=2.0, authkey=None, version=None):
+        """
+        Connect to the shard servers.
+
+        Exposes ntotal and search() like a FAISS index, so RAGPipeline can use
+        it in place of the single index.
+
+        Args:
+            addresses: Shard server addresses, one per shard
+            timeout: Seconds to wait for the shards before merging without the
+                missing ones
+            authkey: Shared secret (defaults to get_authkey(), which raises
+                AuthKeyError if none is configured)
+            version: Snapshot version results must come from; None accepts
+                any (use pinned() to get a checked view)
+        """
+        self.addresses = list(addresses)
+        self.timeout = timeout
+        self.version = version
+        self.authkey = authkey or get_authkey()
+        # Idle connections per shard; a connection is only used by one call at a time
+        self._idle = [[] for _ in self.addresses]
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=len(self.addresses) * 4,
+                                            thread_name_prefix='shard-search')
+
+        self._refresh_info()
+        self.last_search_shards = len(self.addresses)
+
+    def _refresh_info(self):
+        self.shard_info = [self._call(shard, 'info') for shard in range(len(self.addresses))]
+        self.ntotal = sum(info['count'] for info in self.shard_info)
+
+    def pinned(self, version):
+        """
+        A view of this coordinator that only accepts results from one snapshot.
+
+        The view shares connections and threads with this coordinator.
+
+        Args:
+            version: Snapshot version the caller resolves row ids against
+
+        Returns:
+            ShardCoordinator view
+
+        Raises:
+            ValueError: If any shard currently serves another version
+        """
+        view = copy.copy(self)
+        view.version = version
+        view._refresh_info()
+        served = {info['version'] for info in view.shard_info}
+        if served != {version}:
+            raise ValueError(f"Shards serve snapshot(s) {sorted(map(str, served))}, not {version}; "
+                             f"restart them on the new snapshot first")
+        return view
+
+    def _call(self, shard, method, *args):
+        with self._lock:
+            connection = self._idle[shard].pop() if self._idle[shard] else None
+        if connection is None:
+            address, family = parse_address(self.addresses[shard])
+            connection = Client(address, family=family, authkey=self.authkey)
+
+        try:
+            connection.send((method, args))
+            status, result = connection.recv()
+        except (EOFError, OSError):
+            connection.close()
+            raise
+        # Returned only after the reply is read, so a late reply never reaches another call
+        with self._lock:
+            self._idle[shard].append(connection)
+
+        if status != 'ok':
+            raise RuntimeError(f"Shard {shard}: {result}")
+        return result
+
+    def search(self, query_embeddings, k):
+        """
+        Search every shard in parallel and merge the top-k by distance.
+
+        Args:
+            query_embeddings: float32 array of query embeddings
+            k: Results per query
+
+        Returns:
+            (distances, indices) with global row ids, padded with -1 like FAISS
+        """
+        query_embeddings = np.ascontiguousarray(query_embeddings, dtype=np.float32)
+        futures = {self._executor.submit(self._call, shard, 'search', query_embeddings, k): shard
+                   for shard in range(len(self.addresses))}
+        done, not_done = wait(futures, timeout=self.timeout)
+
+        for future in not_done:
+            SHARD_TIMEOUTS.inc(labels={'shard': str(futures[future])})
+
+        all_distances = [np.full((len(query_embeddings), k), np.inf, dtype=np.float32)]
+        all_indices = [np.full((len(query_embeddings), k), -1, dtype=np.int64)]
+        answered = 0
+        for future in done:
+            try:
+                distances, indices, version = future.result()
+            except Exception as e:
+                SHARD_ERRORS.inc(labels={'shard': str(futures[future])})
+                logger.warning("Shard %s failed: %s", futures[future], e)
+                continue
+            if self.version is not None and version != self.version:
+                # Row ids of another snapshot would map to the wrong chunks
+                SHARD_ERRORS.inc(labels={'shard': str(futures[future])})
+                logger.warning("Shard %s serves snapshot %s, expected %s; dropping its results",
+                               futures[future], version, self.version)
+                continue
+            all_distances.append(np.where(indices >= 0, distances, np.inf))
+            all_indices.append(indices)
+            answered += 1
+        self.last_search_shards = answered
+
+        distances = np.concatenate(all_distances, axis=1)
+        indices = np.concatenate(all_indices, axis=1)
+        top = np.argsort(distances, axis=1, kind='stable')[:, :k]
+        distances = np.take_along_axis(distances, top, axis=1)
+        indices = np.where(np.isfinite(distances), np.take_along_axis(indices, top, axis=1), -1)
+        return distances, indices
+
+
+def _serve_shard(vector_store_path, shard_number, address, authkey, ready):
+    ShardServer(vector_store_path, shard_number, address, authkey).serve_forever(ready)
+
+
+def launch_local(vector_store_path, base_port=7870, host='localhost', startup_timeout=120, authkey=None):
+    """
+    Start one shard server process per shard on consecutive local ports.
+
+    Args:
+        vector_store_path: Vector store directory with search_shards.json
+        base_port: Port of shard 0
+        host: Interface to listen on
+        startup_timeout: Seconds to wait for every shard to listen
+        authkey: Shared secret (defaults to get_authkey())
+
+    Returns:
+        (processes, addresses)
+    """
+    authkey = authkey or get_authkey()
+    context = mp.get_context('spawn')
+    num_shards = load_manifest(resolve_store_path(vector_store_path)[0])['num_shards']
+    processes, addresses, ready_events = [], [], []
+    for shard_number in range(num_shards):
+        address = f"{host}:{base_port + shard_number}"
+        ready = context.Event()
+        process = context.Process(target=_serve_shard, args=(vector_store_path, shard_number, address, authkey, ready),
+                                  daemon=True)
+        process.start()
+        processes.append(process)
+        addresses.append(address)
+        ready_events.append(ready)
+
+    for address, ready in zip(addresses, ready_events):
+        if not ready.wait(startup_timeout):
+            raise RuntimeError(f"Shard server at {address} did not start")
+    return processes, addresses
+
+
+def check(vector_store_path, num_queries=200, k=5, base_port=7870, timeout=2.0, seed=42):
+    """
+    Compare scatter-gather results against the single full index.
+
+    Returns:
+        Dictionary with recall against the full index and latency percentiles
+    """
+    path, version = resolve_store_path(vector_store_path)
+    index = faiss.read_index(os.path.join(path, 'faiss_index.bin'))
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, index.ntotal, num_queries)
+    queries = np.stack([index.reconstruct(int(row)) for row in rows])
+    queries += rng.normal(0, 0.01, queries.shape).astype(np.float32)
+
+    # Throwaway shards only this process talks to: a per-run random key is enough
+    authkey = os.urandom(32)
+    processes, addresses = launch_local(vector_store_path, base_port, authkey=authkey)
+    try:
+        coordinator = ShardCoordinator(addresses, timeout=timeout, authkey=authkey).pinned(version)
+        _, expected = index.search(queries, k)
+        latencies, hits = [], 0
+        for query, expected_row in zip(queries, expected):
+            start_time = time.perf_counter()
+            _, found = coordinator.search(query[None, :], k)
+            latencies.append(time.perf_counter() - start_time)
+            hits += len(set(found[0]) & set(expected_row))
+    finally:
+        for process in processes:
+            process.terminate()
+
+    return {
+        'num_shards': len(addresses),
+        'queries': num_queries,
+        'recall_vs_full_index': round(hits / (num_queries * k), 4),
+        'latency_ms_p50': round(float(np.percentile(latencies, 50)) * 1000, 3),
+        'latency_ms_p95': round(float(np.percentile(latencies, 95)) * 1000, 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded scatter-gather vector search")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    split_parser = subparsers.add_parser('split', help="Shard an existing vector store")
+    split_parser.add_argument('--vector-store', default='vector_store/', help="Vector store directory")
+    split_parser.add_argument('--num-shards', type=int, default=4, help="Number of shards")
+    split_parser.add_argument('--keep', type=int, default=3, help="Snapshots to keep after publishing")
+
+    serve_parser = subparsers.add_parser('serve', help="Serve one shard (e.g. on another host)")
+    serve_parser.add_argument('--vector-store', default='vector_store/', help="Vector store directory")
+    serve_parser.add_argument('--shard', type=int, required=True, help="Shard number")
+    serve_parser.add_argument('--address', required=True,
+                              help="'host:port' or 'unix:/path.sock' (other hosts need an explicit host, e.g. 10.0.0.5:7870)")
+    serve_parser.add_argument('--authkey-file', help="Owner-only key file (instead of RAG_INFERENCE_AUTHKEY)")
+
+    launch_parser = subparsers.add_parser('launch', help="Serve every shard from local processes")
+    launch_parser.add_argument('--vector-store', default='vector_store/', help="Vector store directory")
+    launch_parser.add_argument('--base-port', type=int, default=7870, help="Port of shard 0")
+    launch_parser.add_argument('--authkey-file', help="Owner-only key file (instead of RAG_INFERENCE_AUTHKEY)")
+
+    check_parser = subparsers.add_parser('check', help="Launch local shards and compare with the full index")
+    check_parser.add_argument('--vector-store', default='vector_store/', help="Vector store directory")
+    check_parser.add_argument('--queries', type=int, default=200, help="Number of test queries")
+    check_parser.add_argument('--k', type=int, default=5, help="Results per query")
+    check_parser.add_argument('--base-port', type=int, default=7870, help="Port of shard 0")
+    check_parser.add_argument('--timeout', type=float, default=2.0, help="Shard timeout in seconds")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    if args.command in ('serve', 'launch'):
+        try:
+            authkey = get_authkey(args.authkey_file)
+        except AuthKeyError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+
+    if args.command == 'split':
+        manifest, version = split_snapshot(args.vector_store, args.num_shards, keep=args.keep)
+        print(f"✅ Wrote {manifest['num_shards']} shards covering {manifest['total']:,} vectors")
+        if version is not None:
+            print(f"💾 Published snapshot {version}")
+    elif args.command == 'serve':
+        print(f"✅ Serving shard {args.shard} on {args.address}")
+        ShardServer(args.vector_store, args.shard, args.address, authkey).serve_forever()
+    elif args.command == 'launch':
+        processes, addresses = launch_local(args.vector_store, args.base_port, authkey=authkey)
+        print(f"✅ {len(addresses)} shard servers running")
+        print(f"   RAG_SHARD_ADDRESSES={','.join(addresses)}")
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            print("\n🛑 Shard servers stopped.")
+    elif args.command == 'check':
+        report = check(args.vector_store, args.queries, args.k, args.base_port, args.timeout)
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+Versioned vector store snapshots with an atomic CURRENT pointer.
+Every published build is copied to vector_store/snapshots/<version>/ with a
+manifest.json. vector_store/CURRENT names the live version and is switched
+with os.replace. A running RAGPipeline can load the new version in the
+background and swap to it between requests, and old versions are garbage
+collected.
+
+Usage:
+    python src/snapshots.py publish --vector-store vector_store/
+    python src/snapshots.py list --vector-store vector_store/
+    python src/snapshots.py rollback --vector-store vector_store/ --version 20250101-120000-000000
+    python src/snapshots.py gc --vector-store vector_store/ --keep 3
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from aggregate_cube import CUBE_FILE, AggregateCube
+from index_io import load_embeddings
+from time_shards import SHARD_MANIFEST, TimeShardIndex
+from topic_clusters import TOPICS_FILE, TopicClusters
+from vector_stores import (STORE_MANIFEST, FaissVectorStore, load_vector_store, store_backend,
+                           stored_vector_count)
+
+SNAPSHOT_DIR = 'snapshots'
+CURRENT_FILE = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+REQUIRED_FILES = ('metadata.csv',)
+EMBEDDINGS_FILE = 'embeddings.npy'
+BUILD_PREFIX = '.build-'
+
+
+def current_version(root):
+    """
+    Read the live snapshot version.
+
+    Args:
+        root: Vector store root directory
+
+    Returns:
+        Version name, or None if the store is not versioned
+    """
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def resolve_store_path(root):
+    """
+    Directory to load from: the CURRENT snapshot, or root itself for flat stores.
+
+    Returns:
+        (path, version); version is None for flat stores
+    """
+    version = current_version(root)
+    if version is None:
+        return root, None
+    return os.path.join(root, SNAPSHOT_DIR, version), version
+
+
+def set_current(root, version):
+    """Point CURRENT at a version atomically (readers see the old or new name, never half)."""
+    if not os.path.exists(os.path.join(root, SNAPSHOT_DIR, version, MANIFEST_FILE)):
+        raise FileNotFoundError(f"No snapshot named {version} in {root}")
+    temp_file = os.path.join(root, f".{CURRENT_FILE}.{os.getpid()}")
+    with open(temp_file, 'w') as f:
+        f.write(version + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_file, os.path.join(root, CURRENT_FILE))
+
+
+def list_snapshots(root):
+    """
+    Manifests of all published snapshots, oldest first.
+
+    Returns:
+        List of manifest dictionaries
+    """
+    snapshot_root = os.path.join(root, SNAPSHOT_DIR)
+    if not os.path.isdir(snapshot_root):
+        return []
+    manifests = []
+    for version in os.listdir(snapshot_root):
+        manifest_file = os.path.join(snapshot_root, version, MANIFEST_FILE)
+        if os.path.exists(manifest_file):
+            with open(manifest_file) as f:
+                manifests.append(json.load(f))
+    return sorted(manifests, key=lambda manifest: manifest['created_at'])
+
+
+def create_build_dir(root):
+    """
+    Fresh, empty staging directory for a build inside the vector store root.
+
+    Builds write here and publish it with publish_snapshot(root,
+    source_dir=...), so files left in root by earlier builds (old shards,
+    embeddings.npy, another backend's files) never end up in the snapshot.
+
+    Args:
+        root: Vector store root directory
+
+    Returns:
+        Path of the staging directory
+    """
+    os.makedirs(root, exist_ok=True)
+    return tempfile.mkdtemp(prefix=BUILD_PREFIX, dir=root)
+
+
+def stage_snapshot(root, version, exclude=()):
+    """
+    Staging directory holding a published snapshot's files as hard links.
+
+    For derived builds (topic clusters, search shards) that add files to the
+    live snapshot and publish the result as a new version: snapshots are
+    never modified in place, and the links cost no space. Files that will be
+    rewritten must be listed in exclude, since writing through a link would
+    change the published snapshot too.
+
+    Args:
+        root: Vector store root directory
+        version: Snapshot to stage
+        exclude: Top-level file or directory names left out
+
+    Returns:
+        Path of the staging directory (see create_build_dir())
+    """
+    source_dir = os.path.join(root, SNAPSHOT_DIR, version)
+    build_dir = create_build_dir(root)
+    for name in os.listdir(source_dir):
+        if name == MANIFEST_FILE or name in exclude:
+            continue
+        source = os.path.join(source_dir, name)
+        target = os.path.join(build_dir, name)
+        if os.path.isdir(source):
+            shutil.copytree(source, target, copy_function=os.link)
+        else:
+            os.link(source, target)
+    return build_dir
+
+
+def publish_snapshot(root, source_dir=None, version=None, make_current=True, keep=None, carry_over=(CUBE_FILE,)):
+    """
+    Copy a built vector store into a new snapshot and make it live.
+
+    The copy is written under a temporary name and renamed once complete, so
+    a half-copied snapshot is never visible.
+
+    Args:
+        root: Vector store root directory
+        source_dir: Directory holding the build (defaults to the flat files in root)
+        version: Snapshot name (defaults to a timestamp)
+        make_current: Also switch CURRENT to the new snapshot
+        keep: If set, garbage collect all but this many newest snapshots
+        carry_over: Files built independently of the chunks (the count cube
+            from aggregate_cube.py) copied from root when source_dir lacks them
+
+    Returns:
+        The new version name
+    """
+    source_dir = source_dir or root
+    for name in REQUIRED_FILES:
+        if not os.path.exists(os.path.join(source_dir, name)):
+            raise FileNotFoundError(f"{name} missing from {source_dir}")
+    if not any(os.path.exists(os.path.join(source_dir, name)) for name in (STORE_MANIFEST, 'faiss_index.bin')):
+        raise FileNotFoundError(f"No vector store in {source_dir}")
+
+    # Microseconds, so two publishes within the same second get distinct versions
+    version = version or datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    snapshot_root = os.path.join(root, SNAPSHOT_DIR)
+    target = os.path.join(snapshot_root, version)
+    if os.path.exists(target):
+        raise FileExistsError(f"Snapshot {version} already exists")
+
+    temp_target = os.path.join(snapshot_root, f".{version}.{os.getpid()}.partial")
+    shutil.rmtree(temp_target, ignore_errors=True)
+    shutil.copytree(source_dir, temp_target,
+                    ignore=shutil.ignore_patterns(SNAPSHOT_DIR, CURRENT_FILE, f".{CURRENT_FILE}.*", f"{BUILD_PREFIX}*"))
+    for name in carry_over:
+        if os.path.exists(os.path.join(root, name)) and not os.path.exists(os.path.join(temp_target, name)):
+            shutil.copy2(os.path.join(root, name), os.path.join(temp_target, name))
+
+    files = {}
+    for directory, _, names in os.walk(temp_target):
+        for name in names:
+            path = os.path.join(directory, name)
+            files[os.path.relpath(path, temp_target)] = os.path.getsize(path)
+    manifest = {
+        'version': version,
+        'created_at': datetime.now().isoformat(timespec='microseconds'),
+        'source': os.path.abspath(source_dir),
+        'num_vectors': int(stored_vector_count(temp_target)),
+        'files': files
+    }
+    with open(os.path.join(temp_target, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    os.replace(temp_target, target)
+    if make_current:
+        set_current(root, version)
+    if keep is not None:
+        gc_snapshots(root, keep=keep, in_use={version})
+    return version
+
+
+def gc_snapshots(root, keep=2, in_use=()):
+    """
+    Delete old snapshots, keeping the newest ones, CURRENT and any in use.
+
+    Processes that already loaded a deleted snapshot keep working: its data
+    is in memory (or in still-mapped files, which Linux keeps until unmapped).
+
+    Args:
+        root: Vector store root directory
+        keep: Number of newest snapshots to keep
+        in_use: Versions that must not be deleted
+
+    Returns:
+        List of deleted versions
+    """
+    protected = set(in_use) | {current_version(root)}
+    manifests = list_snapshots(root)
+    candidates = [m['version'] for m in manifests[:max(len(manifests) - keep, 0)]]
+
+    deleted = []
+    for version in candidates:
+        if version in protected:
+            continue
+        shutil.rmtree(os.path.join(root, SNAPSHOT_DIR, version), ignore_errors=True)
+        deleted.append(version)
+    return deleted
+
+
+class VectorStoreSnapshot:
+    def __init__(self, index, metadata, path=None, version=None, time_shards=None, cube=None,
+                 embeddings=None, index_mmapped=False, topics=None):
+        """
+        Everything one request reads from the vector store, loaded together.
+
+        RAGPipeline swaps the whole object at once, and each request keeps the
+        object it started with, so it never mixes an index with metadata from
+        another version.
+
+        Args:
+            index: VectorStore (or anything with ntotal and search(), like a
+                shard coordinator)
+            metadata: Chunk metadata in index row order
+            path: Directory the snapshot was loaded from
+            version: Snapshot version, None for flat stores
+            time_shards: Optional TimeShardIndex
+            cube: Optional AggregateCube
+            embeddings: Optional raw embedding matrix (memory-mapped when loaded)
+            index_mmapped: Whether the index is served from a memory-mapped file
+            topics: Optional TopicClusters for theme questions
+        """
+        self.index = index
+        self.metadata = metadata
+        self.path = path
+        self.version = version
+        self.time_shards = time_shards
+        self.cube = cube
+        self.embeddings = embeddings
+        self.index_mmapped = index_mmapped
+        self.topics = topics
+        self.complaint_ids = metadata['complaint_id'].to_numpy()
+        self.extra_columns = [c for c in ('issue', 'state', 'date_received') if c in metadata.columns]
+        self.loaded_at = time.time()
+
+    @classmethod
+    def load(cls, path, version=None, index=None, cube_path=None, mmap=True):
+        """
+        Load a snapshot directory (or flat store).
+
+        Args:
+            path: Directory with a vector store (any backend, see vector_stores.py)
+            version: Version name recorded on the snapshot
+            index: Use this index instead of the stored vectors (e.g. a shard coordinator)
+            cube_path: Cube file overriding the one in the directory
+            mmap: Memory-map the indexes and embeddings so processes loading
+                the same snapshot share their pages
+
+        Returns:
+            VectorStoreSnapshot
+        """
+        if index is None:
+            index = load_vector_store(path, mmap=mmap)
+            metadata = index.metadata
+        else:
+            metadata = pd.read_csv(os.path.join(path, 'metadata.csv'))
+        index_mmapped = getattr(index, 'mmapped', False)
+
+        embeddings = None
+        if os.path.exists(os.path.join(path, EMBEDDINGS_FILE)):
+            embeddings = load_embeddings(os.path.join(path, EMBEDDINGS_FILE), mmap=mmap)
+
+        time_shards = None
+        # Quarter row ranges follow the row order of FAISS builds only; they
+        # select rows of the loaded index, which shard coordinators do not have
+        if store_backend(path) == 'faiss' and os.path.exists(os.path.join(path, SHARD_MANIFEST)):
+            full_index = index.index if isinstance(index, FaissVectorStore) else None
+            time_shards = TimeShardIndex(path, metadata['date_received'], index=full_index, mmap=mmap)
+
+        cube_path = cube_path or os.path.join(path, CUBE_FILE)
+        cube = AggregateCube.load(cube_path) if os.path.exists(cube_path) else None
+
+        topics = TopicClusters.load(path) if os.path.exists(os.path.join(path, TOPICS_FILE)) else None
+
+        return cls(index, metadata, path=path, version=version, time_shards=time_shards, cube=cube,
+                   embeddings=embeddings, index_mmapped=index_mmapped, topics=topics)
+
+    def vector_lookup(self):
+        """
+        Function returning stored embeddings for row ids, for re-ranking.
+
+        Uses embeddings.npy when the snapshot has it, otherwise asks the
+        vector store (FAISS reconstructs them, approximately for reduced indexes).
+
+        Returns:
+            Callable taking an array of row ids, or None when neither is
+            available (e.g. remote shards)
+        """
+        if self.embeddings is not None:
+            return lambda rows: np.asarray(self.embeddings[rows], dtype=np.float32)
+        if hasattr(self.index, 'vectors'):
+            return self.index.vectors
+        return None
+
+    def chunks_from_hits(self, distances, indices):
+        """
+        Turn one row of FAISS search output into chunk dictionaries.
+
+        Args:
+            distances: Distances returned by the index for one query
+            indices: Row ids returned by the index for one query
+
+        Returns:
+            List of dictionaries with chunk text and metadata
+        """
+        # FAISS pads with -1 when fewer than k vectors are available
+        valid = indices >= 0
+        distances, indices = distances[valid], indices[valid]
+
+        rows = self.metadata.iloc[indices]
+        retrieved_chunks = []
+        for distance, chunk, complaint_id, product in zip(
+            distances, rows['chunk'], rows['complaint_id'], rows['product']
+        ):
+            retrieved_chunks.append({
+                'text': chunk,
+                'complaint_id': complaint_id,
+                'product': product,
+                'similarity_score': 1 - float(distance)
+            })
+
+        # Date, issue and state when the store was built with them
+        for column in self.extra_columns:
+            for chunk, value in zip(retrieved_chunks, rows[column]):
+                chunk[column] = None if pd.isna(value) else value
+
+        return retrieved_chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage versioned vector store snapshots")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    publish_parser = subparsers.add_parser('publish', help="Snapshot a built store and make it live")
+    publish_parser.add_argument('--source', help="Build directory (defaults to the flat files in --vector-store)")
+    publish_parser.add_argument('--version', help="Snapshot name (defaults to a timestamp)")
+    publish_parser.add_argument('--keep', type=int, default=3, help="Snapshots kept after publishing")
+
+    rollback_parser = subparsers.add_parser('rollback', help="Point CURRENT at an older snapshot")
+    rollback_parser.add_argument('--version', required=True, help="Snapshot to make live")
+
+    gc_parser = subparsers.add_parser('gc', help="Delete old snapshots")
+    gc_parser.add_argument('--keep', type=int, default=3, help="Snapshots to keep")
+
+    subparsers.add_parser('list', help="List snapshots")
+
+    for subparser in subparsers.choices.values():
+        subparser.add_argument('--vector-store', default='vector_store/', help="Vector store root")
+    args = parser.parse_args()
+
+    if args.command == 'publish':
+        version = publish_snapshot(args.vector_store, args.source, args.version, keep=args.keep)
+        print(f"✅ Published snapshot {version}; running pipelines pick it up on their next check")
+    elif args.command == 'rollback':
+        set_current(args.vector_store, args.version)
+        print(f"✅ CURRENT now points at {args.version}")
+    elif args.command == 'gc':
+        deleted = gc_snapshots(args.vector_store, keep=args.keep)
+        print(f"🗑️ Removed {len(deleted)} snapshots" + (f": {', '.join(deleted)}" if deleted else ""))
+    else:
+        live = current_version(args.vector_store)
+        for manifest in list_snapshots(args.vector_store):
+            marker = '*' if manifest['version'] == live else ' '
+            print(f"{marker} {manifest['version']}  {manifest['created_at']}  {manifest['num_vectors']:,} vectors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Startup time and memory of worker processes loading the vector store.
+Starts K processes that each load the same store, either memory-mapped or
+read into private memory. The run is done once with the store's files evicted
+from the page cache (cold) and once right after (warm). For each process it
+records the load time, the time of the first search (which faults in mapped
+pages) and its private vs file-backed resident memory.
+
+Usage:
+    python src/startup_report.py --vector-store vector_store/ --processes 4
+    python src/startup_report.py --vector-store vector_store_synthetic/ --processes 8 --modes mmap
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.append(os.path.dirname(__file__))
+
+from index_io import evict_from_page_cache, memory_usage
+from snapshots import VectorStoreSnapshot, resolve_store_path
+
+MODES = ('mmap', 'read')
+
+
+def store_files(path):
+    """All files of a vector store directory (snapshots excluded)."""
+    files = []
+    for directory, subdirectories, names in os.walk(path):
+        subdirectories[:] = [name for name in subdirectories if name != 'snapshots']
+        files.extend(os.path.join(directory, name) for name in names)
+    return files
+
+
+def _load_worker(path, mmap, num_queries, barrier, results):
+    """Load the store, run a few searches and report timings and memory."""
+    baseline = memory_usage()
+
+    start_time = time.perf_counter()
+    store = VectorStoreSnapshot.load(path, mmap=mmap)
+    load_seconds = time.perf_counter() - start_time
+
+    rng = np.random.default_rng(os.getpid())
+    queries = rng.standard_normal((num_queries, store.index.d)).astype(np.float32)
+    start_time = time.perf_counter()
+    store.index.search(queries[:1], 5)
+    first_search_seconds = time.perf_counter() - start_time
+    store.index.search(queries, 5)
+
+    # Measure while every worker holds the store, so shared pages are counted once per process
+    barrier.wait()
+    usage = memory_usage()
+    results.put({
+        'pid': os.getpid(),
+        'index_mmapped': store.index_mmapped,
+        'num_vectors': int(store.index.ntotal),
+        'load_seconds': round(load_seconds, 4),
+        'first_search_seconds': round(first_search_seconds, 4),
+        'baseline_rss_mb': baseline.get('rss_mb'),
+        **usage
+    })
+    barrier.wait()
+
+
+def run_startup(path, mode, processes, num_queries=32):
+    """
+    Start `processes` workers that load the store at the same time.
+
+    Args:
+        path: Directory with faiss_index.bin and metadata.csv
+        mode: 'mmap' or 'read'
+        processes: Number of worker processes
+        num_queries: Searches each worker runs after loading
+
+    Returns:
+        List of per-process result dictionaries
+    """
+    context = mp.get_context('spawn')
+    barrier = context.Barrier(processes)
+    results = context.Queue()
+    workers = [context.Process(target=_load_worker, args=(path, mode == 'mmap', num_queries, barrier, results))
+               for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    samples = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    return sorted(samples, key=lambda sample: sample['pid'])
+
+
+def summarize(samples):
+    """Aggregate per-process samples into one row of the report."""
+    def total(key):
+        return round(sum(sample.get(key) or 0 for sample in samples), 1)
+
+    return {
+        'processes': len(samples),
+        'index_mmapped': all(sample['index_mmapped'] for sample in samples),
+        'max_load_seconds': max(sample['load_seconds'] for sample in samples),
+        'max_first_search_seconds': max(sample['first_search_seconds'] for sample in samples),
+        'total_rss_mb': total('rss_mb'),
+        'total_private_mb': total('rss_private_mb'),
+        'total_file_mb': total('rss_file_mb')
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure vector store startup time and memory per process")
+    parser.add_argument('--vector-store', default='vector_store/', help="Vector store root")
+    parser.add_argument('--processes', type=int, default=4, help="Worker processes loading the store")
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES), help="Load modes to compare")
+    parser.add_argument('--output', default='reports/startup_report.json', help="Report file")
+    args = parser.parse_args()
+
+    path, version = resolve_store_path(args.vector_store)
+    files = store_files(path)
+    store_mb = sum(os.path.getsize(f) for f in files) / 1024 / 1024
+    print(f"📦 Store {path} ({store_mb:.0f} MB on disk), {args.processes} processes")
+
+    runs = []
+    for mode in args.modes:
+        for cache in ('cold', 'warm'):
+            if cache == 'cold':
+                evict_from_page_cache(files)
+            samples = run_startup(path, mode, args.processes)
+            summary = summarize(samples)
+            runs.append({'mode': mode, 'cache': cache, 'summary': summary, 'processes': samples})
+            print(f"   {mode:<5} {cache:<5} load {summary['max_load_seconds']:.2f}s, "
+                  f"first search {summary['max_first_search_seconds'] * 1000:.0f}ms, "
+                  f"private {summary['total_private_mb']:.0f} MB, file-backed {summary['total_file_mb']:.0f} MB")
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'vector_store': path,
+        'snapshot_version': version,
+        'store_mb': round(store_mb, 1),
+        'runs': runs
+    }
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
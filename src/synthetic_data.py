@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Synthetic complaint corpus generator for scale testing.
+Produces complaints with the same columns as filtered_complaints.csv
+(product mix, issue/sub-issue, state, dates and cleaned narratives with a
+long-tailed length distribution), and can write a matching vector store
+(metadata.csv, raw embeddings.npy and faiss_index.bin) with random or
+clustered embeddings, so build and query scaling can be measured offline.
+
+Usage:
+    python src/synthetic_data.py complaints --rows 1000000 --output data/synthetic/filtered_complaints.csv
+    python src/synthetic_data.py vector-store --chunks 5000000 --output vector_store_synthetic/ --embeddings clustered
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Product -> (share of complaints, {issue: [sub-issues]})
+PRODUCT_MIX = {
+    'Credit card or prepaid card': (0.38, {
+        'Problem with a purchase shown on your statement': ['Credit card company isn\'t resolving a dispute about a purchase on your statement', 'Card was charged for something you did not purchase with the card'],
+        'Fees or interest': ['Problem with fees', 'Charged too much interest'],
+        'Getting a credit card': ['Card opened without my consent or knowledge', 'Application denied'],
+        'Closing your account': ['Company closed your account', 'Can\'t close your account'],
+        'Problem when making payments': ['Problem during payment process', 'Payment not credited'],
+    }),
+    'Checking or savings account': (0.27, {
+        'Managing an account': ['Deposits and withdrawals', 'Banking errors', 'Funds not handled or disbursed as instructed'],
+        'Closing an account': ['Company closed your account', 'Funds not received from closed account'],
+        'Opening an account': ['Account opened without my consent or knowledge', 'Didn\'t receive terms that were advertised'],
+        'Problem with a lender or other company charging your account': ['Transaction was not authorized', 'Unauthorized debit'],
+    }),
+    'Money transfer, virtual currency, or money service': (0.17, {
+        'Fraud or scam': ['Scam', 'Unauthorized transaction'],
+        'Other transaction problem': ['Money was not available when promised', 'Wrong amount charged or received'],
+        'Managing, opening, or closing your mobile wallet account': ['Problem accessing account', 'Account restricted'],
+    }),
+    'Consumer Loan': (0.12, {
+        'Managing the loan or lease': ['Billing problem', 'Payment to acct not credited'],
+        'Problems when you are unable to pay': ['Debt collection practices', 'Loan modification'],
+        'Taking out the loan or lease': ['Charged fees or interest I didn\'t expect', 'Problem with the interest rate'],
+    }),
+    'Buy Now, Pay Later (BNPL)': (0.06, {
+        'Problem with installment payments': ['Installment charged twice', 'Pay later plan not honored'],
+        'Struggling to pay your installment loan': ['Late fees', 'Unable to change payment schedule'],
+    }),
+}
+
+STATES = ['CA', 'TX', 'FL', 'NY', 'GA', 'IL', 'PA', 'NC', 'OH', 'NJ', 'VA', 'MI', 'MD', 'AZ', 'WA',
+          'MA', 'TN', 'CO', 'SC', 'NV', 'LA', 'AL', 'MO', 'IN', 'MN', 'WI', 'KY', 'OR', 'CT', 'OK']
+# Roughly population-weighted so state filters have a realistic skew
+STATE_WEIGHTS = np.array([12, 9, 7, 6, 3.3, 3.8, 3.9, 3.2, 3.5, 2.8, 2.6, 3.0, 1.8, 2.2, 2.3,
+                          2.1, 2.1, 1.8, 1.6, 1.0, 1.4, 1.5, 1.8, 2.0, 1.7, 1.8, 1.3, 1.3, 1.1, 1.2])
+
+COMPANIES = ['Capital One', 'JPMorgan Chase', 'Bank of America', 'Wells Fargo', 'Citibank',
+             'Synchrony Financial', 'Paypal Holdings', 'Navy Federal Credit Union', 'Discover',
+             'American Express', 'Block Inc', 'Affirm', 'Klarna', 'US Bancorp', 'Ally Financial']
+
+OPENERS = [
+    'i have been a customer for {years} years and this has never happened before',
+    'on {month} i noticed a problem with my {product_word}',
+    'i contacted the company several times about my {product_word}',
+    'this is my {nth} complaint about the same {product_word} issue',
+]
+ISSUE_SENTENCES = [
+    'the issue is {issue}',
+    'specifically {subissue}',
+    'i was told the {issue} would be fixed within {days} days but nothing happened',
+    'they keep saying {subissue} is my fault',
+]
+FILLER = [
+    'i called customer service and was transferred {n} times',
+    'the representative hung up on me',
+    'i was charged a fee of {amount} dollars',
+    'they refused to provide a refund',
+    'i sent documents proving the transaction was unauthorized',
+    'my credit score dropped because of this',
+    'nobody could explain why my account was restricted',
+    'i waited on hold for over an hour',
+    'the payment was made on time but they reported it late',
+    'i asked for a supervisor and was denied',
+    'this has caused me a lot of stress and financial hardship',
+    'the online portal showed a different balance than my statement',
+    'they promised a callback that never came',
+    'i filed a dispute and it was closed without an investigation',
+]
+PRODUCT_WORDS = {
+    'Credit card or prepaid card': 'credit card',
+    'Checking or savings account': 'checking account',
+    'Money transfer, virtual currency, or money service': 'money transfer',
+    'Consumer Loan': 'personal loan',
+    'Buy Now, Pay Later (BNPL)': 'pay later plan',
+}
+MONTHS = ['january', 'february', 'march', 'april', 'may', 'june', 'july', 'august',
+          'september', 'october', 'november', 'december']
+
+
+def _clean(text):
+    """Match the notebook cleaning: lowercase letters, digits and spaces only."""
+    return ''.join(ch for ch in text.lower() if ch.isalnum() or ch == ' ')
+
+
+class SyntheticComplaintGenerator:
+    def __init__(self, seed=42, median_words=150, length_sigma=0.8,
+                 start_date='2015-01-01', end_date='2025-06-30'):
+        """
+        Initialize the generator.
+
+        Args:
+            seed: Random seed; the same seed always produces the same corpus
+            median_words: Median narrative length in words
+            length_sigma: Log-normal sigma of the narrative length (long right tail)
+            start_date: First possible 'Date received'
+            end_date: Last possible 'Date received'
+        """
+        self.rng = np.random.default_rng(seed)
+        self.median_words = median_words
+        self.length_sigma = length_sigma
+
+        self.products = list(PRODUCT_MIX)
+        weights = np.array([PRODUCT_MIX[p][0] for p in self.products])
+        self.product_weights = weights / weights.sum()
+        self.state_weights = STATE_WEIGHTS / STATE_WEIGHTS.sum()
+
+        # Complaint volume grows over time, so later months are more likely
+        self.months = pd.date_range(start_date, end_date, freq='MS')
+        growth = np.linspace(1.0, 3.0, len(self.months))
+        self.month_weights = growth / growth.sum()
+
+    def narrative_lengths(self, count):
+        """Sample narrative word counts."""
+        lengths = self.rng.lognormal(np.log(self.median_words), self.length_sigma, size=count)
+        return np.clip(lengths, 5, 6000).astype(int)
+
+    def narrative(self, product, issue, subissue, num_words):
+        """Compose one cleaned narrative of roughly num_words words."""
+        rng = self.rng
+        fields = {
+            'years': int(rng.integers(1, 25)), 'month': MONTHS[int(rng.integers(12))],
+            'product_word': PRODUCT_WORDS[product], 'nth': ['second', 'third', 'fourth'][int(rng.integers(3))],
+            'issue': issue.lower(), 'subissue': subissue.lower(), 'days': int(rng.integers(3, 60)),
+            'n': int(rng.integers(2, 9)), 'amount': int(rng.integers(5, 900)),
+        }
+        sentences = [OPENERS[int(rng.integers(len(OPENERS)))].format(**fields),
+                     ISSUE_SENTENCES[int(rng.integers(len(ISSUE_SENTENCES)))].format(**fields)]
+        words = sum(len(s.split()) for s in sentences)
+        while words < num_words:
+            pool = ISSUE_SENTENCES if rng.random() < 0.2 else FILLER
+            sentence = pool[int(rng.integers(len(pool)))].format(**fields)
+            sentences.append(sentence)
+            words += len(sentence.split())
+        return _clean(' '.join(sentences))
+
+    def complaints(self, count, start_id=1000000):
+        """
+        Generate a batch of complaints.
+
+        Args:
+            count: Number of complaints
+            start_id: First Complaint ID of the batch
+
+        Returns:
+            DataFrame with the filtered_complaints.csv columns
+        """
+        rng = self.rng
+        product_idx = rng.choice(len(self.products), size=count, p=self.product_weights)
+        month_idx = rng.choice(len(self.months), size=count, p=self.month_weights)
+        days = rng.integers(0, 28, size=count)
+        lengths = self.narrative_lengths(count)
+        state_idx = rng.choice(len(STATES), size=count, p=self.state_weights)
+
+        rows = []
+        for i in range(count):
+            product = self.products[product_idx[i]]
+            issues = PRODUCT_MIX[product][1]
+            issue = list(issues)[int(rng.integers(len(issues)))]
+            subissue = issues[issue][int(rng.integers(len(issues[issue])))]
+            date = self.months[month_idx[i]] + pd.Timedelta(days=int(days[i]))
+            rows.append({
+                'Date received': date.strftime('%Y-%m-%d'),
+                'Product': product,
+                'Sub-product': PRODUCT_WORDS[product].title(),
+                'Issue': issue,
+                'Sub-issue': subissue,
+                'Consumer complaint narrative': self.narrative(product, issue, subissue, lengths[i]),
+                'Company': COMPANIES[int(rng.integers(len(COMPANIES)))],
+                'State': STATES[state_idx[i]],
+                'Submitted via': 'Web',
+                'Complaint ID': start_id + i,
+            })
+        return pd.DataFrame(rows)
+
+
+def write_complaints_csv(output_file, rows, batch_rows=100000, seed=42):
+    """
+    Stream synthetic complaints to a CSV without holding them all in memory.
+
+    Args:
+        output_file: Destination CSV path
+        rows: Total number of complaints
+        batch_rows: Complaints generated per batch
+        seed: Random seed
+    """
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+    generator = SyntheticComplaintGenerator(seed)
+
+    for start in range(0, rows, batch_rows):
+        batch = generator.complaints(min(batch_rows, rows - start), start_id=1000000 + start)
+        batch.to_csv(output_file, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+        print(f"   Wrote {start + len(batch):,}/{rows:,} complaints...")
+
+
+def chunk_words(text, chunk_size=500, chunk_overlap=50):
+    """
+    Cheap word-window chunker approximating the recursive splitter's output
+    sizes; fast enough for tens of millions of synthetic chunks.
+    """
+    words = text.split()
+    if len(words) <= chunk_size:
+        return [text]
+    step = chunk_size - chunk_overlap
+    return [' '.join(words[i:i + chunk_size]) for i in range(0, len(words) - chunk_overlap, step)]
+
+
+class SyntheticEmbeddings:
+    def __init__(self, dimension=384, mode='clustered', clusters_per_product=50,
+                 noise=0.35, seed=42):
+        """
+        Generate unit-norm embedding rows.
+
+        Args:
+            dimension: Embedding dimension (384 matches all-MiniLM-L6-v2)
+            mode: 'random' (isotropic) or 'clustered' (mixture around per-product centers)
+            clusters_per_product: Number of cluster centers per product in clustered mode
+            noise: Spread of points around their center in clustered mode
+            seed: Random seed
+        """
+        self.dimension = dimension
+        self.mode = mode
+        self.noise = noise
+        self.clusters_per_product = clusters_per_product
+        self.rng = np.random.default_rng(seed)
+
+        centers = self.rng.standard_normal((len(PRODUCT_MIX) * clusters_per_product, dimension))
+        self.centers = (centers / np.linalg.norm(centers, axis=1, keepdims=True)).astype(np.float32)
+        self.product_index = {product: i for i, product in enumerate(PRODUCT_MIX)}
+
+    def generate(self, products):
+        """
+        Embeddings for a batch of chunks.
+
+        Args:
+            products: Product name of each chunk (selects its clusters)
+
+        Returns:
+            float32 array of shape (len(products), dimension)
+        """
+        count = len(products)
+        if self.mode == 'random':
+            vectors = self.rng.standard_normal((count, self.dimension), dtype=np.float32)
+        else:
+            base = np.array([self.product_index[p] for p in products]) * self.clusters_per_product
+            centers = self.centers[base + self.rng.integers(0, self.clusters_per_product, size=count)]
+            scale = self.noise / np.sqrt(self.dimension)
+            vectors = centers + scale * self.rng.standard_normal((count, self.dimension), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors.astype(np.float32, copy=False)
+
+
+def write_vector_store(output_dir, num_chunks, mode='clustered', dimension=384, build_index=True,
+                       batch_complaints=20000, text_words=None, seed=42):
+    """
+    Write a synthetic vector store in the layout RAGPipeline loads.
+
+    metadata.csv and embeddings.npy are streamed batch by batch; the flat
+    index, when requested, still needs num_chunks x dimension x 4 bytes of RAM.
+
+    Args:
+        output_dir: Destination directory
+        num_chunks: Number of chunks (vectors) to produce
+        mode: 'random' or 'clustered' embeddings
+        dimension: Embedding dimension
+        build_index: Also write faiss_index.bin (IndexFlatL2)
+        batch_complaints: Complaints generated per batch
+        text_words: Truncate stored chunk text to this many words to save disk
+        seed: Random seed
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    generator = SyntheticComplaintGenerator(seed)
+    embedder = SyntheticEmbeddings(dimension, mode, seed=seed + 1)
+
+    metadata_file = os.path.join(output_dir, 'metadata.csv')
+    embeddings_file = os.path.join(output_dir, 'embeddings.npy')
+    embeddings = np.lib.format.open_memmap(embeddings_file, mode='w+', dtype=np.float32,
+                                           shape=(num_chunks, dimension))
+
+    index = None
+    if build_index:
+        import faiss
+        index = faiss.IndexFlatL2(dimension)
+
+    written = 0
+    next_id = 1000000
+    start_time = time.time()
+    while written < num_chunks:
+        complaints = generator.complaints(batch_complaints, start_id=next_id)
+        next_id += len(complaints)
+
+        rows = []
+        for complaint_id, product, narrative in zip(complaints['Complaint ID'], complaints['Product'],
+                                                    complaints['Consumer complaint narrative']):
+            for chunk in chunk_words(narrative):
+                if text_words:
+                    chunk = ' '.join(chunk.split()[:text_words])
+                rows.append((complaint_id, product, chunk))
+        rows = rows[:num_chunks - written]
+
+        batch = pd.DataFrame(rows, columns=['complaint_id', 'product', 'chunk'])
+        vectors = embedder.generate(batch['product'].tolist())
+        embeddings[written:written + len(batch)] = vectors
+        if index is not None:
+            index.add(vectors)
+
+        batch.to_csv(metadata_file, mode='w' if written == 0 else 'a', header=written == 0, index=False)
+        written += len(batch)
+        print(f"   Wrote {written:,}/{num_chunks:,} chunks ({time.time() - start_time:.0f}s)...")
+
+    embeddings.flush()
+    del embeddings
+
+    if index is not None:
+        import faiss
+        faiss.write_index(index, os.path.join(output_dir, 'faiss_index.bin'))
+        print(f"✅ Saved FAISS index with {index.ntotal:,} vectors")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic complaint corpus generator")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    complaints_parser = subparsers.add_parser('complaints', help="Write a synthetic filtered_complaints.csv")
+    complaints_parser.add_argument('--rows', type=int, default=100000, help="Number of complaints")
+    complaints_parser.add_argument('--output', default='data/synthetic/filtered_complaints.csv', help="CSV path")
+    complaints_parser.add_argument('--batch-rows', type=int, default=100000, help="Complaints per batch")
+    complaints_parser.add_argument('--seed', type=int, default=42, help="Random seed")
+
+    store_parser = subparsers.add_parser('vector-store', help="Write a synthetic vector store")
+    store_parser.add_argument('--chunks', type=int, default=1000000, help="Number of chunks/vectors")
+    store_parser.add_argument('--output', default='vector_store_synthetic/', help="Output directory")
+    store_parser.add_argument('--embeddings', choices=['random', 'clustered'], default='clustered',
+                              help="Embedding distribution")
+    store_parser.add_argument('--dimension', type=int, default=384, help="Embedding dimension")
+    store_parser.add_argument('--no-index', action='store_true', help="Skip faiss_index.bin (embeddings only)")
+    store_parser.add_argument('--text-words', type=int, help="Truncate stored chunk text to N words")
+    store_parser.add_argument('--seed', type=int, default=42, help="Random seed")
+
+    args = parser.parse_args()
+    start_time = time.time()
+
+    if args.command == 'complaints':
+        print(f"🚀 Generating {args.rows:,} synthetic complaints...")
+        write_complaints_csv(args.output, args.rows, args.batch_rows, args.seed)
+        print(f"✅ Saved to {args.output}")
+    else:
+        print(f"🚀 Generating synthetic vector store with {args.chunks:,} {args.embeddings} vectors...")
+        write_vector_store(args.output, args.chunks, args.embeddings, args.dimension,
+                           build_index=not args.no_index, text_words=args.text_words, seed=args.seed)
+        print(f"✅ Vector store written to {args.output}")
+
+    print(f"⏱️ Finished in {time.time() - start_time:.1f} seconds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test that cancelled async requests give back their generation slot.
+Runs answer_question_async on a pipeline with one generation worker and
+stubbed retrieval/generation: one request holds the worker, a second one is
+admitted and queued behind it, then cancelled before its job starts. Both
+slots must be free afterwards, so later requests are not degraded to
+'queue_full'.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(__file__))
+
+from rag_pipeline import RAGPipeline
+
+
+def stub_pipeline(max_inflight_generations=2):
+    """A RAGPipeline without models: retrieval returns nothing, generation waits for release."""
+    rag = object.__new__(RAGPipeline)
+    rag.latency_budget = None
+    rag.max_inflight_generations = max_inflight_generations
+    rag.min_generation_seconds = 1.0
+    rag._inflight_generations = 0
+    rag._inflight_lock = threading.Lock()
+    rag._executor_lock = threading.Lock()
+    rag._retrieval_executor = ThreadPoolExecutor(max_workers=1)
+    rag._generation_executor = ThreadPoolExecutor(max_workers=1)
+
+    rag.release = threading.Event()
+    rag.generating = threading.Event()
+
+    def generate_answer(prompt, **kwargs):
+        rag.generating.set()
+        rag.release.wait(timeout=30)
+        return "stub answer"
+
+    rag.retrieve = lambda question, k=5, **kwargs: []
+    rag.generate_answer = generate_answer
+    rag.count_tokens = lambda text: len(text.split())
+    return rag
+
+
+async def _cancel_queued_request(rag):
+    first = asyncio.create_task(rag.answer_question_async("first", mode='rag'))
+    # Wait until the first request occupies the only generation worker
+    await asyncio.get_running_loop().run_in_executor(None, rag.generating.wait, 30)
+
+    queued = asyncio.create_task(rag.answer_question_async("queued", mode='rag'))
+    while rag._inflight_generations < 2:
+        await asyncio.sleep(0.01)
+    queued.cancel()
+    try:
+        await queued
+    except asyncio.CancelledError:
+        pass
+    assert rag._inflight_generations == 1, f"{rag._inflight_generations} slots held after cancelling"
+
+    rag.release.set()
+    result = await first
+    assert result['degraded'] is None
+    assert rag._inflight_generations == 0, f"{rag._inflight_generations} slots leaked"
+
+    # Later requests are admitted again
+    result = await rag.answer_question_async("later", mode='rag')
+    assert result['degraded'] is None, f"later request degraded: {result['degraded']}"
+    assert rag._inflight_generations == 0
+
+
+def test_cancelled_queued_request_releases_slot():
+    """A request cancelled while queued for generation frees its slot."""
+    rag = stub_pipeline()
+    try:
+        asyncio.run(_cancel_queued_request(rag))
+    finally:
+        rag.release.set()
+        rag._retrieval_executor.shutdown(wait=False)
+        rag._generation_executor.shutdown(wait=False)
+
+
+def main():
+    """Run the test."""
+    print("🧪 Testing generation slot release on cancellation...")
+    test_cancelled_queued_request_releases_slot()
+    print("✅ Cancelled requests release their generation slot")
+
+
+if __name__ == "__main__":
+    main()
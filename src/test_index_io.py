@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test that read_index() reports the real mapping state.
+Loads a flat index in a fresh process, touches every vector with a search and
+compares the growth of private (anonymous) and file-backed resident memory:
+an index reported as mapped must live in file-backed pages, one reported as
+read must live in private memory.
+"""
+
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+
+import faiss
+import numpy as np
+
+sys.path.append(os.path.dirname(__file__))
+
+from index_io import memory_usage, read_index
+
+
+def _load_and_touch(path, mmap, results):
+    """Load the index, scan all of it and report the memory it added."""
+    baseline = memory_usage()
+    index, mapped = read_index(path, mmap=mmap)
+    # A flat search reads every stored vector
+    index.search(np.zeros((1, index.d), dtype=np.float32), 1)
+    usage = memory_usage()
+    results.put({
+        'mapped': mapped,
+        'private_mb': usage['rss_private_mb'] - baseline['rss_private_mb'],
+        'file_mb': usage['rss_file_mb'] - baseline['rss_file_mb']
+    })
+
+
+def measure(path, mmap):
+    """Run _load_and_touch() in a spawned process, so earlier allocations do not interfere."""
+    context = mp.get_context('spawn')
+    results = context.Queue()
+    worker = context.Process(target=_load_and_touch, args=(path, mmap, results))
+    worker.start()
+    sample = results.get()
+    worker.join()
+    return sample
+
+
+def test_mapped_flag_matches_memory(num_vectors=100000, dimension=128):
+    """The mapped flag agrees with where the index's memory is accounted."""
+    if 'rss_file_mb' not in memory_usage():
+        print("⏭️  /proc/self/status has no RssFile; skipping")
+        return
+
+    index_mb = num_vectors * dimension * 4 / 1024 / 1024
+    rng = np.random.default_rng(0)
+    index = faiss.IndexFlatL2(dimension)
+    index.add(rng.standard_normal((num_vectors, dimension)).astype(np.float32))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'faiss_index.bin')
+        faiss.write_index(index, path)
+        del index
+
+        for mmap in (True, False):
+            sample = measure(path, mmap)
+            print(f"   mmap={mmap}: mapped={sample['mapped']}, private +{sample['private_mb']:.0f} MB, "
+                  f"file-backed +{sample['file_mb']:.0f} MB ({index_mb:.0f} MB index)")
+            if sample['mapped']:
+                assert sample['file_mb'] > 0.8 * index_mb, "mapped index is not in file-backed pages"
+                assert sample['private_mb'] < 0.2 * index_mb, "mapped index was copied into private memory"
+            else:
+                assert sample['private_mb'] > 0.8 * index_mb, "unmapped index should be in private memory"
+            if not mmap:
+                assert not sample['mapped']
+
+
+def main():
+    """Run the test."""
+    print("🧪 Testing index memory mapping...")
+    test_mapped_flag_matches_memory()
+    print("✅ Mapping state matches resident memory")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,7 @@ import pandas as pd
 # Add current directory to path
 sys.path.append(os.path.dirname(__file__))
 
-from rag_pipeline import RAGPipeline
+from inference_client import load_pipeline
 
 def test_rag_pipeline():
     """Test the RAG pipeline with a simple question."""
@@ -20,7 +20,7 @@ def test_rag_pipeline():
     try:
         # Initialize RAG pipeline
         print("1. Initializing RAG pipeline...")
-        rag = RAGPipeline()
+        rag = load_pipeline()
         print("✅ RAG pipeline initialized successfully")
         
         # Test retrieval
@@ -49,8 +49,14 @@ def test_vector_store():
     """Test if vector store files exist and are accessible."""
     print("\n🔍 Testing Vector Store...")
     
-    vector_store_path = '../vector_store/'
-    required_files = ['faiss_index.bin', 'metadata.csv']
+    # Builds are published as snapshots; CURRENT names the live one
+    from snapshots import resolve_store_path
+    from vector_stores import BACKENDS, store_backend
+    vector_store_path, version = resolve_store_path('../vector_store/')
+    # Each backend persists its vectors in a different file
+    backend = store_backend(vector_store_path)
+    print(f"   Backend: {backend}")
+    required_files = [BACKENDS[backend].index_file, 'metadata.csv']
     
     for file in required_files:
         file_path = os.path.join(vector_store_path, file)
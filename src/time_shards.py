@@ -0,0 +1,254 @@
+"""
+Time-partitioned FAISS search for date-filtered retrieval.
+The vector store rows are sorted by the date each complaint was received, so
+every date range is one contiguous row range; the quarters' ranges are listed
+in shards.json. A query with a date range finds its rows by bisecting the
+sorted dates and searches the full index restricted to them (an
+IDSelectorRange), so recent-window questions score a fraction of the vectors
+without a second copy of them.
+"""
+
+import json
+import os
+
+import faiss
+import numpy as np
+import pandas as pd
+
+from index_io import read_index
+from index_compression import build_index
+from vector_stores import FaissVectorStore, pad_results
+
+SHARD_MANIFEST = 'shards.json'
+UNDATED = 'undated'
+
+# Chunk metadata written by the Task 2 scripts; older stores only have the
+# first two columns plus 'chunk'
+METADATA_COLUMNS = ['complaint_id', 'product', 'issue', 'state', 'date_received', 'chunk']
+
+
+def normalize_dates(values):
+    """
+    Parse dates into 'YYYY-MM-DD' strings.
+
+    Args:
+        values: Series of date-like values
+
+    Returns:
+        Series of ISO date strings, None where the date is missing or invalid
+    """
+    dates = pd.to_datetime(values, errors='coerce')
+    return dates.dt.strftime('%Y-%m-%d').where(dates.notna(), None)
+
+
+def quarter_labels(dates):
+    """
+    Label each date with its quarter ('2023Q1'), or 'undated'.
+
+    Args:
+        dates: Series of ISO date strings (or None)
+
+    Returns:
+        Series of period labels
+    """
+    periods = pd.to_datetime(dates, errors='coerce').dt.to_period('Q')
+    return periods.astype(str).where(periods.notna(), UNDATED)
+
+
+def write_time_partitioned_store(embeddings, metadata, output_dir, transform=None):
+    """
+    Write the full index, the metadata and the row range of every quarter.
+
+    Rows are sorted by received date (undated rows last), so every date
+    range, and in particular every quarter, is one contiguous row range that
+    a date-filtered search selects in the full index.
+
+    Args:
+        embeddings: float32 array with one row per chunk
+        metadata: DataFrame of chunk metadata including 'date_received'
+        output_dir: Vector store directory
+        transform: Optional dimension-reducing transform (see
+            index_compression.train_transform) applied by every index
+
+    Returns:
+        The metadata DataFrame in its stored row order
+    """
+    periods = quarter_labels(metadata['date_received'])
+    # NaT sorts after every date, so undated rows end up last
+    dates = pd.to_datetime(metadata['date_received'], errors='coerce').to_numpy(dtype='datetime64[D]')
+    order = np.argsort(dates, kind='stable')
+    embeddings = np.ascontiguousarray(np.asarray(embeddings, dtype=np.float32)[order])
+    metadata = metadata.iloc[order].reset_index(drop=True)
+    periods = periods.iloc[order].reset_index(drop=True)
+
+    index = build_index(embeddings, transform)
+    FaissVectorStore(metadata=metadata, index=index).persist(output_dir)
+    # Full-dimension vectors too, memory-mapped at load time for re-indexing and analysis
+    np.save(os.path.join(output_dir, 'embeddings.npy'), embeddings)
+
+    shards = []
+    for period, rows in periods.groupby(periods, sort=True).groups.items():
+        offset, count = int(rows.min()), len(rows)
+        if period == UNDATED:
+            start, end = None, None
+        else:
+            quarter = pd.Period(period, freq='Q')
+            start, end = quarter.start_time.strftime('%Y-%m-%d'), quarter.end_time.strftime('%Y-%m-%d')
+        shards.append({'period': period, 'start': start, 'end': end,
+                       'offset': offset, 'count': count})
+
+    with open(os.path.join(output_dir, SHARD_MANIFEST), 'w') as f:
+        json.dump({'partition': 'quarter', 'order': 'date', 'total': int(index.ntotal), 'shards': shards},
+                  f, indent=2)
+
+    return metadata
+
+
+def range_search_params(index, low, high):
+    """
+    Search parameters restricting a FAISS index to the row ids [low, high).
+
+    The index's own nprobe / efSearch are carried over, since typed
+    parameters would otherwise reset them to their defaults.
+
+    Args:
+        index: FAISS index, optionally wrapped in an IndexPreTransform
+        low: First row id
+        high: Row id after the last one
+
+    Returns:
+        faiss.SearchParameters for index.search(..., params=...)
+    """
+    selector = faiss.IDSelectorRange(low, high)
+    outer = faiss.downcast_index(index)
+    inner = faiss.downcast_index(outer.index) if isinstance(outer, faiss.IndexPreTransform) else outer
+    if isinstance(inner, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=inner.nprobe)
+    elif isinstance(inner, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=inner.hnsw.efSearch)
+    else:
+        params = faiss.SearchParameters(sel=selector)
+    if isinstance(outer, faiss.IndexPreTransform):
+        return faiss.SearchParametersPreTransform(index_params=params)
+    return params
+
+
+class TimeShardIndex:
+    def __init__(self, vector_store_path, dates, index=None, mmap=True):
+        """
+        Load the quarter row ranges listed in the manifest.
+
+        Args:
+            vector_store_path: Vector store directory containing shards.json
+            dates: 'date_received' column of the metadata, in stored row order
+            index: The store's full FAISS index; read from faiss_index.bin when
+                None (e.g. when searches otherwise go to shard servers)
+            mmap: Memory-map the index if it has to be read
+        """
+        with open(os.path.join(vector_store_path, SHARD_MANIFEST)) as f:
+            manifest = json.load(f)
+
+        self.total = manifest['total']
+        # Stores written before the quarters shared the full index also list
+        # a per-quarter 'file'; only the row ranges are used
+        self.shards = [shard for shard in manifest['shards'] if shard['period'] != UNDATED]
+        if index is None:
+            index, _ = read_index(os.path.join(vector_store_path, 'faiss_index.bin'), mmap=mmap)
+        self.index = index
+        self.dates = pd.to_datetime(dates, errors='coerce').to_numpy(dtype='datetime64[D]')
+        # Stores written before rows were sorted by date are only grouped by quarter
+        self.date_sorted = manifest.get('order') == 'date'
+        self.num_dated = int(np.count_nonzero(~np.isnat(self.dates)))
+
+    def select(self, start=None, end=None):
+        """
+        Pick the quarters overlapping a date range.
+
+        Args:
+            start: First day of the range (inclusive), or None for open-ended
+            end: Last day of the range (inclusive), or None for open-ended
+
+        Returns:
+            List of shard positions; consecutive, since quarters are stored in order
+        """
+        selected = []
+        for position, shard in enumerate(self.shards):
+            if start is not None and shard['end'] < start:
+                continue
+            if end is not None and shard['start'] > end:
+                continue
+            selected.append(position)
+        return selected
+
+    def row_range(self, start=None, end=None):
+        """
+        Rows received in a date range, by bisecting the date-sorted rows.
+
+        Args:
+            start: First day of the range ('YYYY-MM-DD', inclusive), or None
+            end: Last day of the range ('YYYY-MM-DD', inclusive), or None
+
+        Returns:
+            (first row, row after the last); empty when first >= last
+        """
+        dated = self.dates[:self.num_dated]
+        low = 0 if start is None else int(np.searchsorted(dated, np.datetime64(start), side='left'))
+        high = self.num_dated if end is None else int(np.searchsorted(dated, np.datetime64(end), side='right'))
+        return low, high
+
+    def search(self, query_embeddings, k, date_range, overfetch=4):
+        """
+        Search the rows received in date_range.
+
+        Args:
+            query_embeddings: float32 array of query embeddings
+            k: Results per query
+            date_range: (start, end) dates; either end may be None
+            overfetch: Multiplier on k for stores that are only grouped by
+                quarter, so rows outside the exact range in the boundary
+                quarters can be dropped
+
+        Returns:
+            (distances, indices, vectors searched); indices are global row
+            ids, padded with -1 like FAISS
+        """
+        start, end = (None if value is None else pd.Timestamp(value).strftime('%Y-%m-%d')
+                      for value in date_range)
+        num_queries = len(query_embeddings)
+        empty = (np.full((num_queries, k), np.inf, dtype=np.float32),
+                 np.full((num_queries, k), -1, dtype=np.int64), 0)
+
+        if self.date_sorted:
+            # Every row in [low, high) is in range, so k is filled whenever k rows exist
+            low, high = self.row_range(start, end)
+            if high <= low:
+                return empty
+            distances, indices = self.index.search(query_embeddings, min(k, high - low),
+                                                   params=range_search_params(self.index, low, high))
+            distances, indices = pad_results(distances, indices, k)
+            return distances, indices, high - low
+
+        selected = self.select(start, end)
+        if not selected:
+            return empty
+
+        first, last = self.shards[selected[0]], self.shards[selected[-1]]
+        low, high = first['offset'], last['offset'] + last['count']
+        distances, indices = self.index.search(query_embeddings, min(k * overfetch, high - low),
+                                               params=range_search_params(self.index, low, high))
+        distances, indices = pad_results(distances, indices, k)
+
+        # Drop padding and rows outside the exact range
+        dates = self.dates[np.maximum(indices, 0)]
+        keep = indices >= 0
+        if start is not None:
+            keep &= dates >= np.datetime64(start)
+        if end is not None:
+            keep &= dates <= np.datetime64(end)
+        distances = np.where(keep, distances, np.inf)
+
+        top = np.argsort(distances, axis=1, kind='stable')[:, :k]
+        distances = np.take_along_axis(distances, top, axis=1)
+        indices = np.where(np.isfinite(distances), np.take_along_axis(indices, top, axis=1), -1)
+
+        return distances, indices, high - low
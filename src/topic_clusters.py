@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Precomputed topic clusters for corpus-level theme questions.
+Runs mini-batch k-means over the stored chunk embeddings of each product and
+keeps every cluster's centroid, size, representative chunks and top terms.
+Questions like "What are the most common issues with credit cards?" are then
+answered by matching the question against a few hundred centroids instead of
+summarizing the five nearest chunks.
+
+Usage:
+    cd src
+    python topic_clusters.py
+    python topic_clusters.py --vector-store ../vector_store_synthetic/ --max-clusters 30
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import shutil
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(__file__))
+
+from aggregate_cube import PRODUCT_FILTERS
+
+TOPICS_FILE = 'topic_clusters.json'
+CENTROIDS_FILE = 'topic_centroids.npy'
+
+# Theme questions explicitly ask for the recurring themes across the corpus
+# ("most common issues with ...", "top 5 complaints", "what themes ...");
+# anything narrower ("what billing issues ...", "why are customers ...") is
+# answered from the retrieved complaints
+THEME_PATTERN = re.compile(
+    r"\b(most (common|frequent)|top( \d+)?|biggest|recurring) (issues|problems|complaints|themes|topics)\b|"
+    r"\b(main|common) (themes|topics)\b|\bwhat (themes|topics)\b|"
+    r"\b(kinds|types|categories) of (issues|problems|complaints)\b"
+)
+# ...and these ask for the largest themes rather than the closest ones
+RANK_BY_SIZE_PATTERN = re.compile(r"\b(most common|main|top|biggest|most frequent)\b")
+
+TOKEN_PATTERN = re.compile(r"[a-z][a-z']{2,}")
+STOP_WORDS = frozenset("""
+the and for that this with was were have has had not but are you your they them their from
+been would could should will can did does doing done about after again all also any because
+before being between both each few further here how into its just more most other our out over
+same she some such than then there these those through too under until very what when where
+which while who whom why yet him his her hers myself ourselves itself themselves off only own
+xxxx xx told said called back get got even still one two since call asked received
+""".split())
+
+
+def minibatch_kmeans(vectors, num_clusters, batch_size=1024, iterations=100, seed=42):
+    """
+    Mini-batch k-means (Sculley, 2010) in NumPy.
+
+    Each step assigns one random batch to the nearest centroids and moves each
+    centroid towards the mean of its points with a per-centroid learning rate
+    of 1 / points seen, so the cost per step does not depend on the corpus size.
+
+    Args:
+        vectors: float32 array (may be memory-mapped)
+        num_clusters: Number of clusters
+        batch_size: Rows per step
+        iterations: Number of steps
+        seed: Random seed
+
+    Returns:
+        (centroids, labels, sizes) with labels from a final full assignment
+    """
+    rng = np.random.default_rng(seed)
+    num_clusters = min(num_clusters, len(vectors))
+
+    # k-means++ seeding on a sample
+    sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), size=min(len(vectors), 20 * num_clusters),
+                                                   replace=False))], dtype=np.float32)
+    centroids = [sample[rng.integers(len(sample))]]
+    closest = ((sample - centroids[0]) ** 2).sum(axis=1)
+    for _ in range(1, num_clusters):
+        probabilities = closest / closest.sum() if closest.sum() > 0 else None
+        centroids.append(sample[rng.choice(len(sample), p=probabilities)])
+        closest = np.minimum(closest, ((sample - centroids[-1]) ** 2).sum(axis=1))
+    centroids = np.array(centroids, dtype=np.float32)
+
+    counts = np.zeros(num_clusters)
+    for _ in range(iterations):
+        batch = np.asarray(vectors[np.sort(rng.choice(len(vectors), size=min(batch_size, len(vectors)),
+                                                      replace=False))], dtype=np.float32)
+        assignments = assign(batch, centroids)
+        batch_counts = np.bincount(assignments, minlength=num_clusters)
+        batch_sums = np.zeros_like(centroids)
+        np.add.at(batch_sums, assignments, batch)
+
+        updated = batch_counts > 0
+        counts[updated] += batch_counts[updated]
+        centroids[updated] += ((batch_sums[updated] - batch_counts[updated, None] * centroids[updated])
+                               / counts[updated, None]).astype(np.float32)
+
+    labels = np.concatenate([assign(np.asarray(vectors[start:start + 65536], dtype=np.float32), centroids)
+                             for start in range(0, len(vectors), 65536)])
+    return centroids, labels, np.bincount(labels, minlength=num_clusters)
+
+
+def assign(vectors, centroids):
+    """Index of the nearest centroid for each row."""
+    distances = (centroids ** 2).sum(axis=1) - 2 * vectors @ centroids.T
+    return distances.argmin(axis=1)
+
+
+def top_terms(cluster_texts, num_terms=8):
+    """
+    Terms that distinguish each cluster from its siblings (class-based TF-IDF).
+
+    Args:
+        cluster_texts: List with one list of chunk texts per cluster
+        num_terms: Terms kept per cluster
+
+    Returns:
+        List with one list of terms per cluster
+    """
+    term_counts = [Counter(token for text in texts for token in TOKEN_PATTERN.findall(str(text).lower())
+                           if token not in STOP_WORDS)
+                   for texts in cluster_texts]
+    document_frequency = Counter(term for counts in term_counts for term in counts)
+    num_clusters = len(term_counts)
+
+    terms = []
+    for counts in term_counts:
+        total = sum(counts.values()) or 1
+        scores = {term: count / total * math.log(1 + num_clusters / document_frequency[term])
+                  for term, count in counts.items()}
+        terms.append([term for term, _ in sorted(scores.items(), key=lambda item: -item[1])[:num_terms]])
+    return terms
+
+
+def build_topics(embeddings, metadata, max_clusters=20, min_cluster_size=20, representatives=3,
+                 texts_per_cluster=2000, seed=42):
+    """
+    Cluster the chunks of each product.
+
+    Args:
+        embeddings: Full-dimension chunk embeddings in metadata row order
+        metadata: Chunk metadata with 'complaint_id', 'product' and 'chunk'
+        max_clusters: Upper bound on clusters per product (about sqrt(n / 2) are used)
+        min_cluster_size: Clusters smaller than this are dropped as noise
+        representatives: Chunks closest to the centroid kept per cluster
+        texts_per_cluster: Chunks sampled per cluster for the top terms
+        seed: Random seed
+
+    Returns:
+        (centroids array, list of cluster dictionaries in centroid order)
+    """
+    rng = np.random.default_rng(seed)
+    all_centroids, clusters = [], []
+
+    for product, rows in metadata.groupby('product', sort=True).indices.items():
+        num_clusters = max(2, min(max_clusters, int(math.sqrt(len(rows) / 2))))
+        if len(rows) < num_clusters * min_cluster_size:
+            num_clusters = max(1, len(rows) // min_cluster_size)
+        if num_clusters == 0 or len(rows) < min_cluster_size:
+            continue
+
+        rows = np.sort(rows)
+        product_vectors = np.asarray(embeddings[rows], dtype=np.float32)
+        centroids, labels, sizes = minibatch_kmeans(product_vectors, num_clusters, seed=seed)
+
+        kept = [cluster for cluster in range(len(centroids)) if sizes[cluster] >= min_cluster_size]
+        texts = []
+        for cluster in kept:
+            members = np.flatnonzero(labels == cluster)
+            sampled = members if len(members) <= texts_per_cluster else rng.choice(members, texts_per_cluster,
+                                                                                  replace=False)
+            texts.append(metadata['chunk'].iloc[rows[sampled]].tolist())
+        terms = top_terms(texts)
+
+        for cluster, cluster_terms in zip(kept, terms):
+            members = np.flatnonzero(labels == cluster)
+            distances = ((product_vectors[members] - centroids[cluster]) ** 2).sum(axis=1)
+            nearest = np.argsort(distances)[:representatives * 10]
+            nearest_rows = metadata.iloc[rows[members[nearest]]]
+            examples, seen = [], set()
+            # One chunk per complaint, so the examples show different complaints
+            for complaint_id, chunk, distance in zip(nearest_rows['complaint_id'].tolist(),
+                                                     nearest_rows['chunk'].tolist(), distances[nearest]):
+                if complaint_id in seen:
+                    continue
+                seen.add(complaint_id)
+                examples.append({'complaint_id': complaint_id, 'chunk': chunk, 'distance': round(float(distance), 4)})
+                if len(examples) == representatives:
+                    break
+
+            all_centroids.append(centroids[cluster])
+            clusters.append({
+                'product': product,
+                'size': int(sizes[cluster]),
+                'share': round(int(sizes[cluster]) / len(rows), 4),
+                'top_terms': cluster_terms,
+                'representatives': examples
+            })
+
+    return np.array(all_centroids, dtype=np.float32), clusters
+
+
+def write_topics(centroids, clusters, output_dir):
+    """Save centroids (.npy) and cluster descriptions (.json) next to the index."""
+    os.makedirs(output_dir, exist_ok=True)
+    np.save(os.path.join(output_dir, CENTROIDS_FILE), centroids)
+    with open(os.path.join(output_dir, TOPICS_FILE), 'w') as f:
+        json.dump({'num_clusters': len(clusters), 'clusters': clusters}, f, indent=2)
+
+
+class TopicClusters:
+    def __init__(self, centroids, clusters):
+        """
+        Wrap stored clusters for question answering.
+
+        Args:
+            centroids: float32 array, one row per cluster
+            clusters: Cluster dictionaries from build_topics(), in the same order
+        """
+        self.centroids = centroids
+        self.clusters = clusters
+        self.products = np.array([cluster['product'] for cluster in clusters])
+        self.sizes = np.array([cluster['size'] for cluster in clusters])
+
+    @classmethod
+    def load(cls, path):
+        """Read clusters written by write_topics() from a vector store directory."""
+        with open(os.path.join(path, TOPICS_FILE)) as f:
+            clusters = json.load(f)['clusters']
+        return cls(np.load(os.path.join(path, CENTROIDS_FILE)), clusters)
+
+    def is_theme_question(self, question):
+        """Whether the question asks about themes across many complaints."""
+        return THEME_PATTERN.search(question.lower()) is not None
+
+    def match(self, question, query_embedding, top_n=5):
+        """
+        Pick the clusters that answer a theme question.
+
+        Clusters of the product named in the question (if any) are compared
+        with the question embedding. "Most common / top / main" questions take
+        the largest of the closest clusters, others the closest ones.
+
+        Args:
+            question: User's question
+            query_embedding: Embedding of the question
+            top_n: Clusters returned
+
+        Returns:
+            (list of (cluster position, similarity), product filter or None)
+        """
+        text = question.lower()
+        product_filter = next((value for phrase, value in PRODUCT_FILTERS.items() if phrase in text), None)
+        candidates = np.arange(len(self.clusters))
+        if product_filter:
+            in_product = np.char.find(np.char.lower(self.products.astype(str)), product_filter) >= 0
+            if in_product.any():
+                candidates = candidates[in_product]
+            else:
+                product_filter = None
+
+        distances = ((self.centroids[candidates] - query_embedding) ** 2).sum(axis=1)
+        order = np.argsort(distances)
+        if RANK_BY_SIZE_PATTERN.search(text):
+            closest = order[:top_n * 3]
+            order = closest[np.argsort(-self.sizes[candidates][closest], kind='stable')]
+        selected = order[:top_n]
+        return [(int(candidates[i]), 1 - float(distances[i])) for i in selected], product_filter
+
+    def answer(self, question, query_embedding, top_n=5):
+        """
+        Answer a theme question from the clusters.
+
+        Args:
+            question: User's question
+            query_embedding: Embedding of the question
+            top_n: Themes listed
+
+        Returns:
+            Dictionary with answer text, matched clusters and representative
+            chunks as sources, or None if this is not a theme question
+        """
+        if not self.clusters or not self.is_theme_question(question):
+            return None
+        matches, product_filter = self.match(question, query_embedding, top_n)
+        if not matches:
+            return None
+
+        scope = f" {product_filter}" if product_filter else ""
+        lines, sources = [], []
+        for position, similarity in matches:
+            cluster = self.clusters[position]
+            example = cluster['representatives'][0] if cluster['representatives'] else None
+            line = (f"- {', '.join(cluster['top_terms'][:5])} — {cluster['size']:,} complaint chunks "
+                    f"({cluster['share']:.1%} of {cluster['product']})")
+            if example:
+                snippet = ' '.join(str(example['chunk']).split()[:25])
+                line += f', e.g. "{snippet}…" [Complaint {example["complaint_id"]}]'
+            lines.append(line)
+            for representative in cluster['representatives']:
+                sources.append({
+                    'text': representative['chunk'],
+                    'complaint_id': representative['complaint_id'],
+                    'product': cluster['product'],
+                    'similarity_score': similarity
+                })
+
+        answer = f"Main themes in{scope} complaints, from clusters over all stored complaints:\n" + "\n".join(lines)
+        return {
+            'answer': answer,
+            'sources': sources,
+            'product_filter': product_filter,
+            'clusters': [dict(self.clusters[position], similarity=round(similarity, 4))
+                         for position, similarity in matches]
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster stored chunk embeddings into topics per product")
+    parser.add_argument('--vector-store', default='../vector_store/', help="Vector store root")
+    parser.add_argument('--output', help="Directory for the cluster files (defaults to a new snapshot "
+                                         "of --vector-store, or to --vector-store itself if it is not versioned)")
+    parser.add_argument('--keep', type=int, default=3, help="Snapshots kept after publishing")
+    parser.add_argument('--max-clusters', type=int, default=20, help="Upper bound on clusters per product")
+    parser.add_argument('--min-cluster-size', type=int, default=20, help="Smaller clusters are dropped")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+
+    from index_compression import load_store_embeddings
+    from snapshots import publish_snapshot, resolve_store_path, stage_snapshot
+    path, version = resolve_store_path(args.vector_store)
+
+    print(f"🧩 Clustering chunk embeddings in {path}...")
+    start_time = time.time()
+    metadata = pd.read_csv(os.path.join(path, 'metadata.csv'))
+    embeddings = load_store_embeddings(path)
+    centroids, clusters = build_topics(embeddings, metadata, args.max_clusters, args.min_cluster_size,
+                                       seed=args.seed)
+    print(f"✅ {len(clusters)} clusters over {metadata['product'].nunique()} products "
+          f"in {time.time() - start_time:.1f}s")
+    for cluster in sorted(clusters, key=lambda c: -c['size'])[:5]:
+        print(f"   {cluster['product']}: {', '.join(cluster['top_terms'][:5])} ({cluster['size']:,} chunks)")
+
+    if args.output or version is None:
+        output_dir = args.output or args.vector_store
+        write_topics(centroids, clusters, output_dir)
+        print(f"💾 Saved {TOPICS_FILE} and {CENTROIDS_FILE} to {output_dir}")
+        return
+
+    # Snapshots are never modified in place: stage the clustered snapshot plus
+    # the new cluster files and publish it as a new version
+    build_dir = stage_snapshot(args.vector_store, version, exclude=(TOPICS_FILE, CENTROIDS_FILE))
+    try:
+        write_topics(centroids, clusters, build_dir)
+        new_version = publish_snapshot(args.vector_store, source_dir=build_dir, keep=args.keep)
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+    print(f"💾 Published snapshot {new_version} (clusters of {version}) with {TOPICS_FILE} and {CENTROIDS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,454 @@
+"""
+Vector store backends behind one interface.
+Every backend stores chunk embeddings with their metadata rows and supports
+add, (filtered) search, get by row id and persist/load. Row ids are positions
+in the metadata, so hits map back to chunks the same way for all backends.
+Backends also expose ntotal, d and search() like a FAISS index, so
+RAGPipeline and the sharding code use them interchangeably.
+
+    faiss   IndexFlatL2 (or a reduced IndexPreTransform); the default layout
+            of faiss_index.bin + metadata.csv
+    numpy   Brute-force search over a (memory-mapped) embeddings.npy,
+            using nothing beyond NumPy for the search itself
+    chroma  Embedded chromadb collection (HNSW) persisted in the directory
+"""
+
+import json
+import os
+import shutil
+
+import faiss
+import numpy as np
+import pandas as pd
+
+from index_io import load_embeddings, read_index
+
+STORE_MANIFEST = 'store.json'
+METADATA_FILE = 'metadata.csv'
+CHROMA_COLLECTION = 'complaint_chunks'
+
+
+def filter_mask(metadata, where):
+    """
+    Rows of metadata matching a filter.
+
+    Args:
+        metadata: Chunk metadata DataFrame
+        where: Dictionary of column -> value, or column -> list of accepted values
+
+    Returns:
+        Boolean NumPy array
+    """
+    mask = np.ones(len(metadata), dtype=bool)
+    for column, value in where.items():
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        mask &= metadata[column].isin(values).to_numpy()
+    return mask
+
+
+def top_k(distances, k):
+    """Positions and values of the k smallest distances per row, in order."""
+    k = min(k, distances.shape[1])
+    if k == 0:
+        return np.zeros((len(distances), 0), dtype=np.int64), np.zeros((len(distances), 0), dtype=np.float32)
+    positions = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    values = np.take_along_axis(distances, positions, axis=1)
+    order = np.argsort(values, axis=1, kind='stable')
+    return np.take_along_axis(positions, order, axis=1), np.take_along_axis(values, order, axis=1)
+
+
+def pad_results(distances, indices, k):
+    """Pad search results to k columns with inf / -1, like FAISS."""
+    missing = k - distances.shape[1]
+    if missing <= 0:
+        return distances, indices
+    return (np.pad(distances, ((0, 0), (0, missing)), constant_values=np.inf),
+            np.pad(indices, ((0, 0), (0, missing)), constant_values=-1))
+
+
+class VectorStore:
+    backend = None
+    # File every persisted store of this backend has besides metadata.csv
+    index_file = None
+
+    def __init__(self, dimension, metadata=None):
+        """
+        Base class; subclasses implement the storage-specific methods.
+
+        Args:
+            dimension: Embedding dimension
+            metadata: Metadata rows already stored, in row id order
+        """
+        self.dimension = dimension
+        self.metadata = metadata if metadata is not None else pd.DataFrame()
+
+    @property
+    def d(self):
+        return self.dimension
+
+    @property
+    def ntotal(self):
+        return len(self.metadata)
+
+    def add(self, embeddings, metadata):
+        """
+        Append embeddings and their metadata rows.
+
+        Args:
+            embeddings: float32 array, one row per chunk
+            metadata: DataFrame with the same number of rows
+        """
+        if len(embeddings) != len(metadata):
+            raise ValueError(f"{len(embeddings)} embeddings but {len(metadata)} metadata rows")
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self._add_vectors(embeddings, len(self.metadata))
+        self.metadata = pd.concat([self.metadata, metadata.reset_index(drop=True)], ignore_index=True)
+
+    def search(self, query_embeddings, k, where=None):
+        """
+        Nearest chunks by L2 distance, optionally among rows matching a filter.
+
+        Args:
+            query_embeddings: float32 array (queries, dimension)
+            k: Results per query
+            where: Optional metadata filter, see filter_mask()
+
+        Returns:
+            (distances, row ids), padded with inf / -1 like FAISS
+        """
+        query_embeddings = np.ascontiguousarray(query_embeddings, dtype=np.float32)
+        if where is None:
+            return self._search(query_embeddings, k, None)
+        return self._filtered_search(query_embeddings, k, where)
+
+    def filter(self, where):
+        """Row ids matching a metadata filter."""
+        return np.flatnonzero(filter_mask(self.metadata, where))
+
+    def get(self, ids):
+        """Metadata rows for row ids."""
+        return self.metadata.iloc[np.asarray(ids, dtype=np.int64)]
+
+    def vectors(self, ids):
+        """Stored embeddings for row ids."""
+        raise NotImplementedError
+
+    def persist(self, path):
+        """Write the store to a directory loadable with load_vector_store()."""
+        os.makedirs(path, exist_ok=True)
+        self._persist_vectors(path)
+        self.metadata.to_csv(os.path.join(path, METADATA_FILE), index=False)
+        with open(os.path.join(path, STORE_MANIFEST), 'w') as f:
+            json.dump({'backend': self.backend, 'dimension': int(self.dimension), 'count': int(self.ntotal)},
+                      f, indent=2)
+
+    def _add_vectors(self, embeddings, first_id):
+        raise NotImplementedError
+
+    def _search(self, query_embeddings, k, rows):
+        raise NotImplementedError
+
+    def _filtered_search(self, query_embeddings, k, where):
+        rows = self.filter(where)
+        if len(rows) == 0:
+            return pad_results(np.zeros((len(query_embeddings), 0), dtype=np.float32),
+                               np.zeros((len(query_embeddings), 0), dtype=np.int64), k)
+        return self._search(query_embeddings, k, rows)
+
+    def _persist_vectors(self, path):
+        raise NotImplementedError
+
+
+class FaissVectorStore(VectorStore):
+    backend = 'faiss'
+    index_file = 'faiss_index.bin'
+
+    def __init__(self, dimension=None, metadata=None, index=None, mmapped=False):
+        """
+        Args:
+            dimension: Embedding dimension (taken from index when given)
+            metadata: Metadata rows already in the index
+            index: Existing FAISS index; defaults to an empty IndexFlatL2
+            mmapped: Whether index is served from a memory-mapped file
+        """
+        index = index if index is not None else faiss.IndexFlatL2(dimension)
+        super().__init__(index.d, metadata)
+        self.index = index
+        self.mmapped = mmapped
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        index, mapped = read_index(os.path.join(path, 'faiss_index.bin'), mmap=mmap)
+        return cls(metadata=pd.read_csv(os.path.join(path, METADATA_FILE)), index=index, mmapped=mapped)
+
+    def _add_vectors(self, embeddings, first_id):
+        self.index.add(embeddings)
+
+    def _search(self, query_embeddings, k, rows):
+        if rows is None:
+            return self.index.search(query_embeddings, k)
+        # Restrict the scan to the filtered rows
+        params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(rows.astype(np.int64)))
+        index = faiss.downcast_index(self.index)
+        if isinstance(index, faiss.IndexPreTransform):
+            params = faiss.SearchParametersPreTransform(index_params=params)
+        return self.index.search(query_embeddings, k, params=params)
+
+    def vectors(self, ids):
+        return self.index.reconstruct_batch(np.asarray(ids, dtype=np.int64))
+
+    def _persist_vectors(self, path):
+        faiss.write_index(self.index, os.path.join(path, 'faiss_index.bin'))
+
+
+class NumpyVectorStore(VectorStore):
+    backend = 'numpy'
+    index_file = 'embeddings.npy'
+
+    def __init__(self, dimension=None, metadata=None, embeddings=None, batch_size=65536):
+        """
+        Args:
+            dimension: Embedding dimension (taken from embeddings when given)
+            metadata: Metadata rows matching embeddings
+            embeddings: Existing float32 array (may be a read-only memmap)
+            batch_size: Rows scored per step, bounding the distance matrix
+        """
+        if embeddings is None:
+            embeddings = np.zeros((0, dimension), dtype=np.float32)
+        super().__init__(embeddings.shape[1], metadata)
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self._norms = None
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        return cls(metadata=pd.read_csv(os.path.join(path, METADATA_FILE)),
+                   embeddings=load_embeddings(os.path.join(path, 'embeddings.npy'), mmap=mmap))
+
+    def _add_vectors(self, embeddings, first_id):
+        self.embeddings = np.concatenate([np.asarray(self.embeddings), embeddings])
+        self._norms = None
+
+    def _squared_norms(self):
+        if self._norms is None:
+            self._norms = np.concatenate([(np.asarray(self.embeddings[start:start + self.batch_size]) ** 2).sum(axis=1)
+                                          for start in range(0, len(self.embeddings), self.batch_size)]
+                                         or [np.zeros(0, dtype=np.float32)])
+        return self._norms
+
+    def _search(self, query_embeddings, k, rows):
+        norms = self._squared_norms()
+        query_norms = (query_embeddings ** 2).sum(axis=1, keepdims=True)
+        row_ids = np.arange(len(self.embeddings)) if rows is None else rows
+
+        best_distances = np.zeros((len(query_embeddings), 0), dtype=np.float32)
+        best_indices = np.zeros((len(query_embeddings), 0), dtype=np.int64)
+        for start in range(0, len(row_ids), self.batch_size):
+            batch_ids = row_ids[start:start + self.batch_size]
+            vectors = np.asarray(self.embeddings[batch_ids] if rows is not None
+                                 else self.embeddings[start:start + self.batch_size])
+            distances = np.maximum(query_norms - 2 * query_embeddings @ vectors.T + norms[batch_ids], 0)
+
+            # Merge this batch's top-k with the best so far
+            distances = np.concatenate([best_distances, distances.astype(np.float32)], axis=1)
+            indices = np.concatenate([best_indices, np.broadcast_to(batch_ids, (len(query_embeddings), len(batch_ids)))],
+                                     axis=1)
+            positions, best_distances = top_k(distances, k)
+            best_indices = np.take_along_axis(indices, positions, axis=1)
+
+        return pad_results(best_distances, best_indices, k)
+
+    def vectors(self, ids):
+        return np.asarray(self.embeddings[np.asarray(ids, dtype=np.int64)], dtype=np.float32)
+
+    def _persist_vectors(self, path):
+        np.save(os.path.join(path, 'embeddings.npy'), np.asarray(self.embeddings, dtype=np.float32))
+
+
+class ChromaVectorStore(VectorStore):
+    backend = 'chroma'
+    index_file = 'chroma.sqlite3'
+
+    def __init__(self, dimension=None, metadata=None, path=None, filter_columns=('product', 'issue', 'state'),
+                 batch_size=5000, overwrite=False):
+        """
+        Args:
+            dimension: Embedding dimension
+            metadata: Metadata rows already in the collection
+            path: Directory for the embedded chromadb database; None keeps
+                it in memory until persist()
+            filter_columns: Metadata columns stored in chroma for where filters
+            batch_size: Rows per chroma add() call
+            overwrite: Drop an existing collection at path first (rebuilds)
+        """
+        import chromadb
+        super().__init__(dimension, metadata)
+        self.path = path
+        self.filter_columns = filter_columns
+        self.batch_size = batch_size
+        self.client = chromadb.PersistentClient(path=path) if path else chromadb.EphemeralClient()
+        if overwrite:
+            try:
+                self.client.delete_collection(CHROMA_COLLECTION)
+            except Exception:
+                # Missing collections raise ValueError or NotFoundError depending on the chromadb version
+                pass
+        self.collection = self.client.get_or_create_collection(CHROMA_COLLECTION, metadata={'hnsw:space': 'l2'})
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        with open(os.path.join(path, STORE_MANIFEST)) as f:
+            dimension = json.load(f)['dimension']
+        return cls(dimension, pd.read_csv(os.path.join(path, METADATA_FILE)), path=path)
+
+    def add(self, embeddings, metadata):
+        if len(embeddings) != len(metadata):
+            raise ValueError(f"{len(embeddings)} embeddings but {len(metadata)} metadata rows")
+        first_id = len(self.metadata)
+        metadata = metadata.reset_index(drop=True)
+        columns = [column for column in self.filter_columns if column in metadata.columns]
+        # Chroma metadata values cannot be None
+        filter_values = metadata[columns].fillna('').astype(str).to_dict('records') if columns else None
+        for start in range(0, len(metadata), self.batch_size):
+            end = min(start + self.batch_size, len(metadata))
+            self.collection.add(
+                ids=[str(first_id + row) for row in range(start, end)],
+                embeddings=np.asarray(embeddings[start:end], dtype=np.float32).tolist(),
+                metadatas=filter_values[start:end] if filter_values else None
+            )
+        self.metadata = pd.concat([self.metadata, metadata], ignore_index=True)
+
+    def _filtered_search(self, query_embeddings, k, where):
+        # Filter inside chroma; values were stored as strings
+        clauses = [{column: {'$in': [str(v) for v in value]} if isinstance(value, (list, tuple, set)) else str(value)}
+                   for column, value in where.items()]
+        return self._search(query_embeddings, k, None, clauses[0] if len(clauses) == 1 else {'$and': clauses})
+
+    def _search(self, query_embeddings, k, rows, where=None):
+        results = self.collection.query(query_embeddings=query_embeddings.tolist(), n_results=min(k, self.ntotal),
+                                        where=where, include=['distances'])
+        distances = np.full((len(query_embeddings), k), np.inf, dtype=np.float32)
+        indices = np.full((len(query_embeddings), k), -1, dtype=np.int64)
+        for row, (ids, row_distances) in enumerate(zip(results['ids'], results['distances'])):
+            indices[row, :len(ids)] = [int(i) for i in ids]
+            distances[row, :len(ids)] = row_distances
+        return distances, indices
+
+    def vectors(self, ids):
+        ids = [str(int(i)) for i in ids]
+        result = self.collection.get(ids=ids, include=['embeddings'])
+        by_id = dict(zip(result['ids'], result['embeddings']))
+        return np.asarray([by_id[i] for i in ids], dtype=np.float32)
+
+    def persist(self, path):
+        if self.path is None or os.path.abspath(path) != os.path.abspath(self.path):
+            # Copy the in-memory (or other) collection into a database at path
+            target = ChromaVectorStore(self.dimension, path=path, filter_columns=self.filter_columns,
+                                       batch_size=self.batch_size, overwrite=True)
+            for start in range(0, self.ntotal, self.batch_size):
+                rows = np.arange(start, min(start + self.batch_size, self.ntotal))
+                target.add(self.vectors(rows), self.metadata.iloc[rows])
+            target.persist(path)
+            return
+        # PersistentClient writes through; only the metadata and manifest are left
+        super().persist(path)
+
+    def _persist_vectors(self, path):
+        pass
+
+
+BACKENDS = {
+    'faiss': FaissVectorStore,
+    'numpy': NumpyVectorStore,
+    'chroma': ChromaVectorStore
+}
+
+
+def create_vector_store(backend, dimension, **kwargs):
+    """
+    Empty store of the given backend.
+
+    Args:
+        backend: 'faiss', 'numpy' or 'chroma'
+        dimension: Embedding dimension
+        **kwargs: Backend-specific options
+
+    Returns:
+        VectorStore
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown vector store backend: {backend}")
+    return BACKENDS[backend](dimension, **kwargs)
+
+
+def reset_store_dir(path):
+    """
+    Empty a store directory; a store owns its whole directory, so no file of
+    an earlier build (another backend's index, an old store.json) survives.
+
+    Args:
+        path: Store directory (created if missing)
+
+    Raises:
+        ValueError: If path is a snapshot root (see snapshots.py)
+    """
+    if os.path.exists(os.path.join(path, 'CURRENT')) or os.path.isdir(os.path.join(path, 'snapshots')):
+        raise ValueError(f"{path} holds published snapshots; write to snapshots.create_build_dir() instead")
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+
+
+def write_vector_store(backend, embeddings, metadata, output_dir, **kwargs):
+    """
+    Build a store from embeddings and metadata and persist it, replacing
+    everything in output_dir.
+
+    Args:
+        backend: 'faiss', 'numpy' or 'chroma'
+        embeddings: float32 array, one row per chunk
+        metadata: Chunk metadata DataFrame
+        output_dir: Store directory, emptied first
+        **kwargs: Backend-specific options
+
+    Returns:
+        The VectorStore
+    """
+    reset_store_dir(output_dir)
+    if backend == 'chroma':
+        kwargs.update(path=output_dir, overwrite=True)
+    store = create_vector_store(backend, embeddings.shape[1], **kwargs)
+    store.add(embeddings, metadata)
+    store.persist(output_dir)
+    return store
+
+
+def store_backend(path):
+    """Backend recorded in store.json; stores from before the manifest are FAISS."""
+    try:
+        with open(os.path.join(path, STORE_MANIFEST)) as f:
+            return json.load(f)['backend']
+    except FileNotFoundError:
+        return 'faiss'
+
+
+def load_vector_store(path, mmap=True):
+    """
+    Load a persisted store with the backend it was written with.
+
+    Args:
+        path: Store directory
+        mmap: Memory-map FAISS indexes and NumPy embeddings
+
+    Returns:
+        VectorStore
+    """
+    return BACKENDS[store_backend(path)].load(path, mmap=mmap)
+
+
+def stored_vector_count(path):
+    """Number of vectors in a persisted store, without loading it."""
+    try:
+        with open(os.path.join(path, STORE_MANIFEST)) as f:
+            return json.load(f)['count']
+    except FileNotFoundError:
+        return int(read_index(os.path.join(path, 'faiss_index.bin'))[0].ntotal)
@@ -7,7 +7,6 @@ import sys
 import os
 sys.path.append('src')
 
-from rag_pipeline import RAGPipeline
 from app import ComplaintChatInterface
 
 def test_task4():